@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: src.boxes (vectorized) vs the per-box Python loops it replaces.
+
+    python -m benchmarks.bench_boxes --n 10 100 500 --repeat 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src import boxes as bx
+
+
+# ---- 기존 per-box 구현 (notebook/extract_code.py, detected_image_crop 기준) ----
+def loop_to_pixel(norm_boxes, width, height):
+    out = []
+    for x1, y1, x2, y2 in norm_boxes:
+        out.append([int(x1 * width), int(y1 * height), int(x2 * width), int(y2 * height)])
+    return out
+
+
+def loop_iou(a, b):
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def loop_pairwise_iou(a, b):
+    return [[loop_iou(p, q) for q in b] for p in a]
+
+
+def loop_nms(boxes, scores, thr):
+    order = sorted(range(len(boxes)), key=lambda i: -scores[i])
+    keep = []
+    while order:
+        i = order.pop(0)
+        keep.append(i)
+        order = [j for j in order if loop_iou(boxes[i], boxes[j]) <= thr]
+    return keep
+
+
+def loop_crop(image, px_boxes):
+    h, w = image.shape[:2]
+    crops = []
+    for x1, y1, x2, y2 in px_boxes:
+        x1, x2 = max(0, min(x1, w)), max(0, min(x2, w))
+        y1, y2 = max(0, min(y1, h)), max(0, min(y2, h))
+        crops.append(image[y1:y2, x1:x2].copy())
+    return crops
+
+
+def make_boxes(n, rng):
+    xy = rng.uniform(0.0, 0.9, size=(n, 2))
+    wh = rng.uniform(0.01, 0.1, size=(n, 2))
+    return np.concatenate([xy, np.minimum(xy + wh, 1.0)], axis=1)
+
+
+def timeit(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e3
+
+
+def run(ns, repeat, size=(3024, 4032)):
+    rng = np.random.default_rng(0)
+    h, w = size
+    image = np.zeros((h, w, 3), dtype=np.uint8)
+    rows = []
+    for n in ns:
+        norm = make_boxes(n, rng)
+        norm_list = norm.tolist()
+        px = bx.to_pixel(norm, size)
+        px_list = px.tolist()
+        px_int = loop_to_pixel(norm_list, w, h)
+        scores = rng.uniform(size=n)
+        score_list = scores.tolist()
+
+        cases = [
+            ("to_pixel", lambda: loop_to_pixel(norm_list, w, h), lambda: bx.to_int_pixels(norm, size, "xyxy_norm")),
+            ("pairwise_iou", lambda: loop_pairwise_iou(px_list, px_list), lambda: bx.pairwise_iou(px, px)),
+            ("nms", lambda: loop_nms(px_list, score_list, 0.5), lambda: bx.nms(px, scores, 0.5)),
+            ("crop", lambda: loop_crop(image, px_int), lambda: bx.crop(image, px)),
+        ]
+        for name, loop_fn, vec_fn in cases:
+            # O(N^2) loop 버전은 반복 횟수를 줄인다
+            r = max(1, repeat // 10) if name in ("pairwise_iou", "nms") and n > 100 else repeat
+            t_loop, t_vec = timeit(loop_fn, r), timeit(vec_fn, r)
+            rows.append((name, n, t_loop, t_vec))
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, nargs="+", default=[10, 100, 500])
+    p.add_argument("--repeat", type=int, default=50)
+    args = p.parse_args()
+
+    print(f"{'op':<14}{'N':>6}{'loop ms':>12}{'vec ms':>12}{'speedup':>10}")
+    for name, n, t_loop, t_vec in run(args.n, args.repeat):
+        print(f"{name:<14}{n:>6}{t_loop:>12.3f}{t_vec:>12.3f}{t_loop / max(t_vec, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
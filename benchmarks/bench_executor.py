@@ -0,0 +1,44 @@
+"""execute_plan with N synthetic tool calls against fake tools."""
+import base64
+import copy
+from io import BytesIO
+
+from PIL import Image
+
+from src.executor import execute_plan
+from src.types import AgentState
+
+from .fakes import FAKE_TOOLS, synthetic_image
+from .harness import Benchmark
+
+
+def _img_b64(w: int = 1024, h: int = 768) -> str:
+    buf = BytesIO()
+    Image.fromarray(synthetic_image(w, h)).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def _plan(n: int, tool: str):
+    return {"mode": "tool_calls", "tool_calls": [
+        {"id": i + 1, "tool": tool, "parameters": {"prompt": "semi-ripe tomato, red.", "image": "image"}}
+        for i in range(n)
+    ]}
+
+
+def _execute(n: int, tool: str = "agentic_object_detection"):
+    def setup():
+        img_b64 = _img_b64()
+        plan = _plan(n, tool)
+
+        def fn():
+            state = AgentState(user_request="count", img_b64=img_b64, tool_registry=FAKE_TOOLS)
+            execute_plan(state, copy.deepcopy(plan))
+        return fn
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("executor.detect.calls1", _execute(1), repeat=20),
+    Benchmark("executor.detect.calls10", _execute(10), repeat=10, items=10),
+    Benchmark("executor.segment.calls3", _execute(3, "agentic_sam2_instance_segmentation"), repeat=5, items=3),
+]
@@ -0,0 +1,63 @@
+"""encode_media / b64_to_np / load_image (full vs draft decode) across image sizes and formats."""
+import base64
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from src.media import b64_to_np, encode_media, load_image
+
+from .fakes import synthetic_image
+from .harness import Benchmark
+
+SIZES = [(640, 480), (1920, 1080), (4032, 3024)]
+FORMATS = ["png", "jpeg"]
+
+_TMP = Path(tempfile.mkdtemp(prefix="va-bench-"))
+
+
+def _image_file(w: int, h: int, fmt: str) -> Path:
+    path = _TMP / f"img_{w}x{h}.{fmt}"
+    if not path.exists():
+        Image.fromarray(synthetic_image(w, h)).save(path, format=fmt.upper(), quality=90)
+    return path
+
+
+def _encode_file(w, h, fmt):
+    def setup():
+        path = _image_file(w, h, fmt)
+        return lambda: encode_media(path, resize=768)
+    return setup
+
+
+def _encode_array(w, h):
+    def setup():
+        arr = synthetic_image(w, h)
+        return lambda: encode_media(arr, resize=768)
+    return setup
+
+
+def _decode_b64(w, h, fmt):
+    def setup():
+        b64 = base64.b64encode(_image_file(w, h, fmt).read_bytes()).decode()
+        return lambda: b64_to_np(b64)
+    return setup
+
+
+def _load_file(w, h, fmt, max_side):
+    def setup():
+        path = _image_file(w, h, fmt)
+        return lambda: load_image(path, max_side)
+    return setup
+
+
+BENCHMARKS = []
+for _w, _h in SIZES:
+    _big = _w * _h > 4_000_000
+    for _fmt in FORMATS:
+        BENCHMARKS.append(Benchmark(f"media.encode_file.{_fmt}.{_w}x{_h}", _encode_file(_w, _h, _fmt), repeat=5 if _big else 15))
+        BENCHMARKS.append(Benchmark(f"media.b64_to_np.{_fmt}.{_w}x{_h}", _decode_b64(_w, _h, _fmt), repeat=5 if _big else 15))
+        BENCHMARKS.append(Benchmark(f"media.load_image.full.{_fmt}.{_w}x{_h}", _load_file(_w, _h, _fmt, None), repeat=5 if _big else 15))
+        BENCHMARKS.append(Benchmark(f"media.load_image.768.{_fmt}.{_w}x{_h}", _load_file(_w, _h, _fmt, 768), repeat=5 if _big else 15))
+    BENCHMARKS.append(Benchmark(f"media.encode_array.{_w}x{_h}", _encode_array(_w, _h), repeat=5 if _big else 15))
@@ -0,0 +1,48 @@
+"""render_prompt and tag extraction / json.loads on realistic planner responses."""
+import json
+
+from src.planner import _extract_tag, render_prompt
+
+from .fakes import final_plan_response, plan_response
+from .harness import Benchmark
+
+TOOL_DESC = "\n".join(
+    f"- tool_{i}(image: np.ndarray, prompt: str) -> list[dict]: detects objects and returns bboxes" for i in range(40)
+)
+
+
+def _observations(n: int):
+    return [{"tool": "agentic_object_detection", "ok": True, "error": None,
+             "result": [{"label": "tomato", "score": 0.9, "bbox": [0.1, 0.2, 0.3, 0.4]}] * 20}
+            for _ in range(n)]
+
+
+def _render(n_obs):
+    def setup():
+        obs = _observations(n_obs)
+        vqa = {"task_type": "detection", "target": "semi-ripe tomato"}
+        return lambda: render_prompt("반숙 토마토 개수를 세어줘", "VQA analysis completed", vqa, TOOL_DESC, obs)
+    return setup
+
+
+def _parse_plan(n_calls):
+    def setup():
+        raw = plan_response(n_calls)
+        return lambda: (_extract_tag(raw, "analysis_log"), json.loads(_extract_tag(raw, "plan_json")))
+    return setup
+
+
+def _parse_final(n_steps):
+    def setup():
+        raw = final_plan_response(n_steps)
+        return lambda: (_extract_tag(raw, "final_answer"), json.loads(_extract_tag(raw, "code_plan")))
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("parse.render_prompt.obs0", _render(0), repeat=200),
+    Benchmark("parse.render_prompt.obs10", _render(10), repeat=100),
+    Benchmark("parse.plan_json.calls3", _parse_plan(3), repeat=500),
+    Benchmark("parse.plan_json.calls30", _parse_plan(30), repeat=200),
+    Benchmark("parse.code_plan.steps8", _parse_final(8), repeat=500),
+]
@@ -0,0 +1,41 @@
+"""Full run_agent + run_coder_after_final_plan pass with fake LMMs (no network)."""
+import base64
+import contextlib
+import io
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from src import pipeline
+from src.config import Config
+from src.types import AgentState
+
+from .fakes import FAKE_TOOLS, FakeLMM, synthetic_image
+from .harness import Benchmark
+
+
+def _end_to_end(w: int, h: int):
+    def setup():
+        cfg = Config(vqa=FakeLMM, vqa_kwargs={}, planner=FakeLMM, planner_kwargs={}, coder=FakeLMM, coder_kwargs={})
+        pipeline.set_config(cfg)
+        buf = BytesIO()
+        Image.fromarray(synthetic_image(w, h)).save(buf, format="JPEG", quality=90)
+        img_b64 = base64.b64encode(buf.getvalue()).decode()
+        out = Path(tempfile.mkdtemp(prefix="va-bench-")) / "extract_code.py"
+
+        def fn():
+            state = AgentState(user_request="반숙 토마토 개수를 세고 bbox를 그려줘", img_b64=img_b64)
+            # print_code_plan 출력은 측정 대상이지만 터미널에는 쓰지 않는다
+            with contextlib.redirect_stdout(io.StringIO()):
+                state = pipeline.run_agent(state, None, tool_desc="", tool_registry=FAKE_TOOLS)
+                pipeline.run_coder_after_final_plan(state, None, out_filename=str(out))
+        return fn
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("pipeline.end_to_end.1024x768", _end_to_end(1024, 768), repeat=10),
+    Benchmark("pipeline.end_to_end.4032x3024", _end_to_end(4032, 3024), repeat=3, warmup=1),
+]
@@ -0,0 +1,59 @@
+"""
+LocalLMM prefix KV 재사용 확인: 이미지를 넘기는 실제 plan_once 호출이 PROMPT_PLAN_TEMPLATE의 prefix cache를 쓰는지.
+
+    python -m benchmarks.check_local_prefix
+    python -m benchmarks.check_local_prefix --model Qwen/Qwen2-VL-2B-Instruct --calls 4 --concurrency 2
+
+torch/transformers와 model weight가 필요하다 (첫 실행 때 download).
+`--concurrency` > 1이면 같은 batch에 묶인 요청들도 prefix를 재사용하는지 함께 확인한다.
+plan_once 호출 수만큼 LocalLMM.stats["prefix_hits"]가 늘지 않으면 exit 1.
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from src import pipeline
+from src.config import Config, use_local_lmm
+from src.planner import plan_once
+
+from .fakes import synthetic_image
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--model", default="Qwen/Qwen2-VL-2B-Instruct")
+    p.add_argument("--calls", type=int, default=2, help="plan_once 호출 수")
+    p.add_argument("--concurrency", type=int, default=2, help="동시에 보낼 호출 수 (batching 확인)")
+    p.add_argument("--max-new-tokens", type=int, default=32, help="생성 길이 (plan 품질이 아니라 cache 사용만 본다)")
+    args = p.parse_args(argv)
+
+    cfg = use_local_lmm(Config(), args.model, roles=("planner",), max_new_tokens=args.max_new_tokens)
+    pipeline.set_config(cfg)
+    planner = cfg.create_planner()
+    img = Path(tempfile.mkdtemp(prefix="va-check-")) / "image.jpg"
+    Image.fromarray(synthetic_image(640, 480)).save(img, quality=90)
+
+    def call(i: int) -> None:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                plan_once(f"Count the red objects #{i}", "", {}, "", None, img_path=str(img))
+        except ValueError as e:
+            # 짧은 생성이라 plan JSON이 깨지는 것은 정상: 확인 대상은 planner 호출의 cache 사용
+            print(f"call {i}: plan not parsed ({type(e).__name__})")
+
+    before = dict(planner.stats)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(call, range(args.calls)))
+    hits = planner.stats["prefix_hits"] - before["prefix_hits"]
+    requests = planner.stats["requests"] - before["requests"]
+    print(f"requests {requests}, prefix_hits {hits} (expected >= {args.calls})")
+    return 0 if hits >= args.calls else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
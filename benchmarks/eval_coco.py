@@ -0,0 +1,271 @@
+"""
+Accuracy vs. latency sweep over a COCO-format dataset (pycocotools mAP).
+
+    python -m benchmarks.eval_coco --ann instances_val.json --images val/ --limit 50
+    python -m benchmarks.eval_coco --ann a.json --images imgs/ --sweep sweep.json --json out.json
+    python -m benchmarks.eval_coco --ann a.json --images imgs/ --mode tools --tool local_object_detection
+
+sweep.json: [{"name": "planner-512", "config": {"planner_kwargs": {"image_size": 512}}}, ...]
+  config는 Config field override. *_kwargs는 기본값에 merge된다.
+
+mode
+  - agent: 이미지마다 plan_once → execute_plan을 `--rounds`까지 반복 (planner가 tool/prompt를 고른다).
+           Config(image_size, model, ...)의 영향이 여기서 드러난다.
+  - tools: planner 없이 `--tool`을 category 목록 prompt로 바로 호출 (tool 자체의 정확도/속도 기준선).
+
+결과(observations)의 {"label", "score", "bbox"} detection을 COCO category로 매핑해 bbox mAP를 계산하고,
+이미지별 wall latency(p50/p90/p99)와 trace span에서 모은 bytes_uploaded / prompt_tokens / response_tokens를 함께 보고한다.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pycocotools.coco import COCO
+from pycocotools.cocoeval import COCOeval
+
+from src import boxes as bx
+from src import pipeline, trace
+from src.config import Config
+from src.executor import execute_plan
+from src.planner import plan_once
+from src.types import AgentState
+
+from .harness import percentile
+
+DEFAULT_SWEEP = [
+    {"name": f"planner-{size}", "config": {"planner_kwargs": {"image_size": size}}} for size in (512, 768, 1024)
+]
+USAGE_ATTRS = ("bytes_uploaded", "prompt_tokens", "response_tokens")
+
+
+@dataclass
+class EvalResult:
+    name: str
+    images: int
+    errors: int
+    mAP: float
+    AP50: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    bytes_uploaded: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    detections: int = 0
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    def row(self) -> str:
+        return (f"{self.name:<24}{self.mAP:>8.3f}{self.AP50:>8.3f}{self.p50_ms:>10.0f}{self.p90_ms:>10.0f}"
+                f"{self.p99_ms:>10.0f}{self.bytes_uploaded / 1024:>12.0f}{self.prompt_tokens:>10}{self.response_tokens:>10}"
+                f"{self.errors:>7}")
+
+
+HEADER = (f"{'setting':<24}{'mAP':>8}{'AP50':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'upload KB':>12}"
+          f"{'in tok':>10}{'out tok':>10}{'errors':>7}")
+
+
+def build_config(overrides: Dict[str, Any], base: Optional[Config] = None) -> Config:
+    base = base or Config()
+    data = {}
+    for key, value in overrides.items():
+        if key.endswith("_kwargs") and isinstance(value, dict):
+            value = {**getattr(base, key), **value}
+        data[key] = value
+    return base.model_copy(update=data)
+
+
+def _norm_name(name: str) -> str:
+    name = name.strip().lower()
+    for suffix in ("es", "s"):
+        if name.endswith(suffix) and len(name) > len(suffix) + 2:
+            return name[:-len(suffix)]
+    return name
+
+
+class CategoryMap:
+    def __init__(self, coco: COCO, cat_ids: Sequence[int]):
+        self.ids = list(cat_ids)
+        self.names = [c["name"] for c in coco.loadCats(self.ids)]
+        self._by_name = {_norm_name(n): i for n, i in zip(self.names, self.ids)}
+
+    def lookup(self, label: Optional[str]) -> Optional[int]:
+        if label is None:
+            return self.ids[0] if len(self.ids) == 1 else None
+        cid = self._by_name.get(_norm_name(str(label)))
+        if cid is None and len(self.ids) == 1:
+            return self.ids[0]  # 한 category만 평가할 때는 tool이 붙인 label과 무관하게 그 category로 본다
+        return cid
+
+
+def detections_from_execs(execs: Sequence[dict], image_id: int, size: tuple, cats: CategoryMap) -> List[dict]:
+    """COCO result entries (xywh pixel) from tool results shaped like [{"label", "score", "bbox"}]."""
+    out = []
+    for ex in execs:
+        result = ex.get("result") if ex.get("ok") else None
+        if not isinstance(result, list):
+            continue
+        dets = [d for d in result if isinstance(d, dict) and isinstance(d.get("bbox"), (list, tuple))
+                and len(d["bbox"]) == 4]
+        if not dets:
+            continue
+        arr = bx.as_boxes([d["bbox"] for d in dets])
+        xywh = bx.convert(arr, bx.infer_format(arr), "xywh", size)
+        for d, box in zip(dets, xywh.tolist()):
+            cid = cats.lookup(d.get("label"))
+            if cid is not None:
+                out.append({"image_id": image_id, "category_id": cid, "bbox": [round(v, 2) for v in box],
+                            "score": float(d.get("score", 1.0))})
+    return out
+
+
+def coco_map(gt: COCO, dets: List[dict], img_ids: Sequence[int], cat_ids: Sequence[int]) -> tuple:
+    if not dets:
+        return 0.0, 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        dt = gt.loadRes(dets)
+        ev = COCOeval(gt, dt, "bbox")
+        ev.params.imgIds = list(img_ids)
+        ev.params.catIds = list(cat_ids)
+        ev.evaluate()
+        ev.accumulate()
+        ev.summarize()
+    return max(float(ev.stats[0]), 0.0), max(float(ev.stats[1]), 0.0)
+
+
+def _run_agent_detection(state: AgentState, tools_meta: Optional[List[dict]], rounds: int) -> None:
+    pipeline.run_vqa(state)
+    for _ in range(rounds):
+        _, plan = plan_once(state.user_request, state.vqa_log, state.vqa_struct, state.tool_desc, state.img_b64,
+                            state.observations, tools_meta, img_path=state.img_path)
+        if plan.get("mode") != "tool_calls" or not plan.get("tool_calls"):
+            return
+        execute_plan(state, plan)
+
+
+def _run_tool_detection(state: AgentState, tool: str, prompt: str) -> None:
+    execute_plan(state, {"mode": "tool_calls",
+                         "tool_calls": [{"id": 1, "tool": tool, "parameters": {"prompt": prompt, "image": "image"}}]})
+
+
+def evaluate(
+    gt: COCO,
+    image_dir: Path,
+    name: str,
+    config: Config,
+    tool_registry: Dict[str, Any],
+    tool_desc: str = "",
+    tools_meta: Optional[List[dict]] = None,
+    mode: str = "agent",
+    tool: str = "agentic_object_detection",
+    img_ids: Optional[Sequence[int]] = None,
+    cat_ids: Optional[Sequence[int]] = None,
+    rounds: int = 2,
+) -> EvalResult:
+    pipeline.set_config(config)
+    img_ids = list(img_ids or gt.getImgIds())
+    cats = CategoryMap(gt, cat_ids or gt.getCatIds())
+    prompt = ", ".join(cats.names)
+    request = f"Detect every {prompt} in the image and return their bounding boxes."
+
+    latencies, dets = [], []
+    usage = dict.fromkeys(USAGE_ATTRS, 0)
+    errors = 0
+    prev_tracer = trace.get_tracer()
+    try:
+        for img_id in img_ids:
+            info = gt.loadImgs(img_id)[0]
+            state = AgentState(user_request=request, img_path=str((image_dir / info["file_name"]).absolute()),
+                               tool_desc=tool_desc, tool_registry=dict(tool_registry))
+            tracer = trace.enable(trace.Tracer())
+            t0 = time.perf_counter()
+            try:
+                if mode == "agent":
+                    _run_agent_detection(state, tools_meta, rounds)
+                else:
+                    _run_tool_detection(state, tool, prompt)
+            except Exception as e:
+                errors += 1
+                print(f"[{name}] image {img_id}: {e!r}")
+            latencies.append((time.perf_counter() - t0) * 1e3)
+            for row in tracer.summary().values():
+                for k in USAGE_ATTRS:
+                    usage[k] += int(row.get(k, 0))
+            errors += sum(1 for ex in state.all_execs if not ex.get("ok"))
+            dets += detections_from_execs(state.all_execs, img_id, (info["height"], info["width"]), cats)
+    finally:
+        if prev_tracer is not None:
+            trace.enable(prev_tracer)
+        else:
+            trace.disable()
+
+    latencies.sort()
+    m, ap50 = coco_map(gt, dets, img_ids, cats.ids)
+    return EvalResult(
+        name=name, images=len(img_ids), errors=errors, mAP=m, AP50=ap50,
+        p50_ms=percentile(latencies, 0.50) if latencies else 0.0,
+        p90_ms=percentile(latencies, 0.90) if latencies else 0.0,
+        p99_ms=percentile(latencies, 0.99) if latencies else 0.0,
+        detections=len(dets), **usage,
+    )
+
+
+def _load_registry(spec: Optional[str]) -> Callable[[], tuple]:
+    """'module:function' → function() returning (registry, tool_desc[, tools_meta]). 기본: local tools."""
+    if spec:
+        module, _, attr = spec.partition(":")
+        return getattr(importlib.import_module(module), attr or "register")
+    from src import local_tools
+
+    return lambda: (local_tools.register_local_tools({}), local_tools.LOCAL_TOOL_DESC, local_tools.LOCAL_TOOLS_META)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--ann", type=Path, required=True, help="COCO instances json")
+    p.add_argument("--images", type=Path, required=True, help="image directory")
+    p.add_argument("--sweep", type=Path, help="sweep json (기본: planner image_size 512/768/1024)")
+    p.add_argument("--mode", choices=("agent", "tools"), default="agent")
+    p.add_argument("--tool", default="local_object_detection", help="--mode tools에서 호출할 tool")
+    p.add_argument("--registry", help="'module:function' returning (tool_registry, tool_desc[, tools_meta])")
+    p.add_argument("--categories", help="평가할 category 이름 (comma-separated, 기본: 전부)")
+    p.add_argument("--limit", type=int, help="평가할 이미지 수")
+    p.add_argument("--rounds", type=int, default=2, help="agent mode에서 plan → execute 반복 횟수")
+    p.add_argument("--json", type=Path, help="write results as JSON")
+    args = p.parse_args(argv)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        gt = COCO(str(args.ann))
+    cat_ids = gt.getCatIds(catNms=[c.strip() for c in args.categories.split(",")]) if args.categories else gt.getCatIds()
+    img_ids = sorted({i for c in cat_ids for i in gt.getImgIds(catIds=[c])}) if args.categories else gt.getImgIds()
+    img_ids = img_ids[:args.limit] if args.limit else img_ids
+
+    registry, tool_desc, *rest = _load_registry(args.registry)()
+    tools_meta = rest[0] if rest else None
+    sweep = json.loads(args.sweep.read_text(encoding="utf-8")) if args.sweep else DEFAULT_SWEEP
+    if args.mode == "tools":
+        sweep = [{"name": f"tool:{args.tool}", "config": {}}]  # planner 설정은 tools mode 결과에 영향이 없다
+
+    print(f"{len(img_ids)} images, {len(cat_ids)} categories, mode={args.mode}\n")
+    print(HEADER)
+    results = []
+    for setting in sweep:
+        r = evaluate(gt, args.images, setting["name"], build_config(setting.get("config", {})), registry,
+                     tool_desc=tool_desc, tools_meta=tools_meta, mode=args.mode, tool=args.tool,
+                     img_ids=img_ids, cat_ids=cat_ids, rounds=args.rounds)
+        r.config = setting.get("config", {})
+        results.append(r)
+        print(r.row(), flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps([asdict(r) for r in results], indent=2, default=str), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
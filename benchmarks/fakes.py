@@ -0,0 +1,104 @@
+"""
+Offline stand-ins for LMMs and vision tools used by the benchmarks.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+from src.llm import LMM
+from src.media import encode_media
+
+SAMPLE_CODE = (Path(__file__).resolve().parent.parent / "notebook" / "extract_code.py").read_text(encoding="utf-8")
+
+
+def plan_response(n_calls: int = 3) -> str:
+    calls = [
+        {"id": i + 1, "tool": "agentic_object_detection",
+         "parameters": {"prompt": "semi-ripe tomato", "image": "image"},
+         "expected_result": "bounding boxes of semi-ripe tomatoes"}
+        for i in range(n_calls)
+    ]
+    plan = {"language": "ko", "mode": "tool_calls", "selected_tools": ["agentic_object_detection"],
+            "tool_calls": calls, "open_questions": []}
+    log = "\n".join(f"Step {i + 1}: 반숙 토마토 후보를 검출하고 bbox를 검증한다." for i in range(5))
+    return f"<analysis_log>\n{log}\n</analysis_log>\n<plan_json>\n{json.dumps(plan, ensure_ascii=False, indent=2)}\n</plan_json>"
+
+
+def final_plan_response(n_steps: int = 8) -> str:
+    steps = [
+        {"step": i + 1,
+         "instruction": f"Step {i + 1}: use agentic_object_detection with prompt 'semi-ripe tomato' --- collect bboxes",
+         "code_snippet": "dets = agentic_object_detection('semi-ripe tomato', image)",
+         "explanation": "반숙 토마토 위치를 얻기 위해 필요"}
+        for i in range(n_steps)
+    ]
+    return (f"<final_answer>\n반숙 토마토를 검출하고 개수를 세는 코드를 작성합니다.\n</final_answer>\n"
+            f"<code_plan>\n{json.dumps(steps, ensure_ascii=False, indent=2)}\n</code_plan>")
+
+
+class FakeLMM(LMM):
+    """
+    Returns canned responses based on the prompt shape. Encodes media like the real
+    clients so media handling cost is included; `latency_s` simulates network time.
+    """
+
+    def __init__(self, latency_s: float = 0.0, image_size: int = 768, n_calls: int = 3, n_steps: int = 8, **kwargs: Any):
+        self.latency_s = latency_s
+        self.image_size = image_size
+        self.n_calls = n_calls
+        self.n_steps = n_steps
+        self.calls = 0
+
+    def generate(self, prompt: str, media: Optional[Sequence[Any]] = None, **kwargs: Any) -> str:
+        return self.chat([{"role": "user", "content": prompt, "media": media or []}], **kwargs)
+
+    def chat(self, chat, **kwargs: Any) -> str:
+        self.calls += 1
+        for msg in chat:
+            for m in msg.get("media", []) or []:
+                encode_media(m, resize=self.image_size)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        prompt = chat[-1]["content"]
+        if "<code_plan>" in prompt:
+            return final_plan_response(self.n_steps)
+        if "<plan_json>" in prompt:
+            return plan_response(self.n_calls)
+        return "```python\n" + SAMPLE_CODE + "\n```"
+
+
+def fake_detection(prompt: str, image: np.ndarray, n: int = 50, seed: int = 0) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0.0, 0.9, size=(n, 2))
+    boxes = np.concatenate([xy, np.minimum(xy + 0.05, 1.0)], axis=1)
+    return [{"label": prompt, "score": float(s), "bbox": b} for b, s in zip(boxes.tolist(), rng.uniform(size=n).tolist())]
+
+
+def fake_segmentation(prompt: str, image: np.ndarray, n: int = 10) -> List[dict]:
+    h, w = image.shape[:2]
+    out = []
+    for i, det in enumerate(fake_detection(prompt, image, n=n)):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        x1, y1, x2, y2 = (np.asarray(det["bbox"]) * [w, h, w, h]).astype(int)
+        mask[y1:y2, x1:x2] = 1
+        out.append({**det, "mask": mask})
+    return out
+
+
+FAKE_TOOLS = {
+    "agentic_object_detection": fake_detection,
+    "countgd_object_detection": fake_detection,
+    "agentic_sam2_instance_segmentation": fake_segmentation,
+}
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Gradient + noise RGB image; compresses roughly like a photo, unlike pure noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = np.stack([xx * 255 // max(width - 1, 1), yy * 255 // max(height - 1, 1), (xx + yy) % 256], axis=-1)
+    noise = rng.integers(-12, 12, size=(height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
@@ -0,0 +1,123 @@
+"""
+Benchmark harness: latency percentiles, throughput, peak memory, baseline comparison.
+
+peak memory는 tracemalloc 기준이라 Python/numpy 할당만 잡힌다 (PIL 내부 버퍼는 제외).
+"""
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # setup() -> fn, fn()은 측정 대상 1회 실행
+    setup: Callable[[], Callable[[], object]]
+    repeat: int = 20
+    warmup: int = 2
+    # 1회 실행이 처리하는 item 수 (throughput 계산용)
+    items: int = 1
+
+
+@dataclass
+class Result:
+    name: str
+    repeat: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    throughput: float  # items / s
+    peak_kb: float
+
+    def row(self) -> str:
+        return (f"{self.name:<40}{self.p50_ms:>10.3f}{self.p90_ms:>10.3f}{self.p99_ms:>10.3f}"
+                f"{self.throughput:>12.1f}{self.peak_kb:>12.1f}")
+
+
+HEADER = f"{'benchmark':<40}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'items/s':>12}{'peak KB':>12}"
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if len(sorted_vals) == 1:
+        return sorted_vals[0]
+    k = (len(sorted_vals) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def run_benchmark(bench: Benchmark, repeat: Optional[int] = None) -> Result:
+    fn = bench.setup()
+    n = repeat or bench.repeat
+    for _ in range(bench.warmup):
+        fn()
+
+    # timing: tracemalloc 없이 측정
+    gc.collect()
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+
+    # peak memory: 별도 1회 실행
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return Result(
+        name=bench.name,
+        repeat=n,
+        mean_ms=mean,
+        p50_ms=percentile(samples, 0.50),
+        p90_ms=percentile(samples, 0.90),
+        p99_ms=percentile(samples, 0.99),
+        throughput=bench.items / (mean / 1e3) if mean > 0 else float("inf"),
+        peak_kb=peak / 1024,
+    )
+
+
+def save_baseline(results: List[Result], path: Path = BASELINE_PATH) -> Path:
+    data = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor()},
+        "results": {r.name: asdict(r) for r in results},
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("results", {})
+
+
+def compare(results: List[Result], baseline: Dict[str, dict], threshold: float) -> List[Tuple[str, str, float, float]]:
+    """
+    Regressions where p50 latency or peak memory grew by more than `threshold` (0.2 = +20%).
+    Returns (name, metric, baseline, current) tuples.
+    """
+    regressions = []
+    for r in results:
+        base = baseline.get(r.name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "peak_kb"):
+            old, new = base[metric], getattr(r, metric)
+            if old > 0 and new > old * (1 + threshold):
+                regressions.append((r.name, metric, old, new))
+    return regressions
@@ -0,0 +1,62 @@
+"""
+Run the offline benchmark suite.
+
+    python -m benchmarks.run                      # run all, compare with baseline.json
+    python -m benchmarks.run -k media -k parse    # subset by name substring
+    python -m benchmarks.run --save-baseline      # overwrite baseline.json
+    python -m benchmarks.run --threshold 0.3      # fail on >30% p50/peak regressions
+
+bbox 연산 micro-benchmark는 별도: python -m benchmarks.bench_boxes
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from . import bench_executor, bench_media, bench_parsing, bench_pipeline
+from .harness import BASELINE_PATH, HEADER, Result, compare, load_baseline, run_benchmark, save_baseline
+
+SUITES = [bench_media, bench_parsing, bench_executor, bench_pipeline]
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("-k", dest="filters", action="append", default=[], help="name substring filter (repeatable)")
+    p.add_argument("--repeat", type=int, help="override per-benchmark repeat count")
+    p.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    p.add_argument("--json", type=Path, help="write results as JSON")
+    args = p.parse_args(argv)
+
+    benches = [b for suite in SUITES for b in suite.BENCHMARKS
+               if not args.filters or any(f in b.name for f in args.filters)]
+
+    print(HEADER)
+    results = []
+    for bench in benches:
+        r = run_benchmark(bench, repeat=args.repeat)
+        results.append(r)
+        print(r.row(), flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps([r.__dict__ for r in results], indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        # 일부만 돌린 경우 기존 baseline의 나머지 항목은 유지
+        merged = {**load_baseline(args.baseline), **{r.name: r.__dict__ for r in results}}
+        save_baseline([Result(**v) for v in merged.values()], args.baseline)
+        print(f"\nbaseline saved: {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.threshold:.0%}):")
+        for name, metric, old, new in regressions:
+            print(f"  {name:<40}{metric:>10}: {old:.3f} -> {new:.3f} ({new / old - 1:+.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,26 +7,24 @@ def visualize_bbox(
     label: str = "semi-ripe tomato",
     conf: float = 1.0,
 ):
+    """
+    bbox 하나([x1,y1,x2,y2]) 또는 여러 개([[...], ...])를 한 번에 그려서 저장.
+    label/conf도 bbox 개수만큼 list로 넘길 수 있다.
+    """
     import cv2
+    from src.boxes import as_boxes
+    from src.render import render_detections
 
     img = cv2.imread(image_path)
     if img is None:
         raise FileNotFoundError(f"Failed to read image: {image_path}")
 
-    x1, y1, x2, y2 = map(int, bbox)
+    boxes = as_boxes(bbox)
+    labels = label if isinstance(label, (list, tuple)) else [label] * len(boxes)
+    confs = conf if isinstance(conf, (list, tuple)) else [conf] * len(boxes)
 
-    # bbox 그리기
-    cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 4)
-
-    # 라벨 텍스트
-    text = f"{label} ({conf:.3f})"
-    (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
-
-    # 텍스트 배경 박스 (이미지 밖으로 나가지 않게)
-    tx = x1
-    ty = max(y1 - 10, th + 10)
-    cv2.rectangle(img, (tx, ty - th - baseline), (tx + tw + 10, ty + baseline), (0, 255, 0), -1)
-    cv2.putText(img, text, (tx + 5, ty - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+    # 모든 bbox + 라벨을 한 번에 그리기 (decode/encode 1회)
+    img = render_detections(img, boxes, labels, confs, thickness=4, bgr=True)
 
     # 저장
     cv2.imwrite(out_path, img)
@@ -0,0 +1,42 @@
+import argparse
+import os
+from dotenv import load_dotenv
+from src.bulk import BulkRunner
+
+def main():
+    load_dotenv()
+
+    p = argparse.ArgumentParser(description="offline bulk mode (provider batch API)")
+    p.add_argument("--job-dir", required=True, help="job 상태/checkpoint/결과 저장 위치 (같은 값으로 다시 실행하면 이어서)")
+    p.add_argument("--manifest", help='JSONL: {"id", "request", "image"} per line (처음 한 번, 또는 item 추가 시)')
+    p.add_argument("--poll", type=float, default=60.0, help="batch 상태 확인 주기 (초)")
+    p.add_argument("--once", action="store_true", help="한 번만 collect/submit 하고 종료")
+    p.add_argument("--timeout", type=float, help="이 시간(초)이 지나면 종료 (job은 나중에 이어서 가능)")
+    p.add_argument("--stand-in", action="store_true", help="로컬 stand-in batch 서버로 실행 (테스트용)")
+    p.add_argument("--stand-in-delay", type=float, default=2.0, help="stand-in 서버의 batch 완료 지연 (초)")
+    args = p.parse_args()
+
+    server = None
+    if args.stand_in:
+        from src.batchserver import StandInBatchServer
+        server = StandInBatchServer(delay_s=args.stand_in_delay).start()
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ.setdefault("ANTHROPIC_API_KEY", "stand-in")
+        os.environ.setdefault("OPENAI_API_KEY", "stand-in")
+        print("stand-in batch server:", server.url)
+
+    try:
+        runner = BulkRunner(args.job_dir)
+        if args.manifest:
+            print("added:", runner.init(args.manifest))
+        if args.once:
+            print(runner.step())
+        else:
+            print(runner.run(poll_s=args.poll if not args.stand_in else min(args.poll, 1.0), timeout_s=args.timeout))
+    finally:
+        if server:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from src.config import LOCAL_MODEL, Config, use_local_lmm
+from src.server import ServerConfig, serve
+
+def main():
+    load_dotenv()
+
+    p = argparse.ArgumentParser(description="vision agent HTTP service")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--workers", type=int, default=4, help="동시에 실행할 pipeline 수")
+    p.add_argument("--queue-size", type=int, default=32, help="대기열 크기 (넘치면 429)")
+    p.add_argument("--deadline", type=float, default=300.0, help="기본 요청 deadline (초)")
+    p.add_argument("--workdir", default=".agent_jobs", help="요청별 생성 코드 저장 위치")
+    p.add_argument("--image-root", help="요청의 image_path를 허용할 디렉터리 (없으면 image_b64만 받음)")
+    p.add_argument("--local-lmm", nargs="?", const=LOCAL_MODEL, metavar="MODEL",
+                   help=f"모든 LMM role을 CPU 로컬 모델로 (load test용 stand-in, 기본: {LOCAL_MODEL})")
+    args = p.parse_args()
+
+    agent_config = Config(reuse_clients=True, coalesce_calls=True)
+    if args.local_lmm:
+        agent_config = use_local_lmm(agent_config, args.local_lmm)
+    serve(ServerConfig(host=args.host, port=args.port, workers=args.workers, queue_size=args.queue_size,
+                       default_deadline_s=args.deadline, workdir=Path(args.workdir),
+                       image_root=Path(args.image_root) if args.image_root else None),
+          agent_config=agent_config)
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,136 @@ import argparse
 import os
 from dotenv import load_dotenv
 from src.llm import AnthropicLMM
+from src import pipeline
 from src.pipeline import AgentState, run_agent, run_coder_after_final_plan
+from src.checkpoint import Checkpointer, default_checkpoint_path
+from src import cpuprof, memprof, trace
+from src.reuse import ReuseIndex
+from src.codecache import CodeCache
+from src import local_tools
+from src.config import LOCAL_MODEL, use_local_lmm
 
 def main():
     load_dotenv()
 
     p = argparse.ArgumentParser()
-    p.add_argument("--request", required=True, help="사용자 요청")
+    p.add_argument("--request", help="사용자 요청 (--resume에 --checkpoint를 주면 생략 가능)")
     p.add_argument("--image", help="이미지 base64 문자열 또는 파일 경로")
     p.add_argument("--out", default="extract_code.py")
+    p.add_argument("--checkpoint", default=None,
+                   help="단계별 state checkpoint 경로 (기본: .checkpoints/<request+image digest>.ckpt, "
+                        "빈 문자열이면 저장 안 함)")
+    p.add_argument("--resume", action="store_true", help="checkpoint에서 이어서 실행")
+    p.add_argument("--reuse-index", metavar="PATH",
+                   help="near-duplicate 이미지의 VQA/plan 결과를 재사용할 perceptual-hash index 파일")
+    p.add_argument("--reuse-distance", type=int, default=6, help="near-duplicate로 볼 Hamming 거리 (64bit 중)")
+    p.add_argument("--code-cache", metavar="DIR",
+                   help="정규화한 code plan 기준으로 생성된 스크립트를 재사용하는 캐시 디렉터리")
+    p.add_argument("--candidates", type=int, default=1,
+                   help="codegen 후보 수. 1보다 크면 병렬 생성 후 입력 이미지로 실행해 처음 통과한 스크립트를 사용")
+    p.add_argument("--live", action="store_true",
+                   help="planner 응답을 stream으로 받아 plan step을 도착하는 대로 출력 (TTY가 아니면 NDJSON event)")
+    p.add_argument("--local-lmm", nargs="?", const=LOCAL_MODEL, metavar="MODEL",
+                   help=f"LMM role을 CPU 로컬 모델(LocalLMM)로 실행 (기본 model: {LOCAL_MODEL}, torch/transformers 필요)")
+    p.add_argument("--local-roles", default="vqa,planner,coder",
+                   help="--local-lmm을 적용할 role (comma-separated)")
+    p.add_argument("--local-tools", action="store_true",
+                   help="torchvision CPU detector(local_object_detection)를 tool로 등록 (torch 필요)")
+    p.add_argument("--intra-op-threads", type=int, default=None, help="local detector의 torch thread 수 (기본: CPU 수)")
+    p.add_argument("--trace", metavar="PREFIX",
+                   help="단계별 timing을 PREFIX.jsonl / PREFIX.trace.json(Chrome trace)으로 저장")
+    p.add_argument("--memprof", metavar="PATH",
+                   help="단계별 메모리(tracemalloc peak/RSS, 상위 할당 위치)를 PATH(JSON)로 저장하고 요약 출력")
+    p.add_argument("--profile", metavar="PREFIX",
+                   help="단계별 CPU sampling profile을 PREFIX.speedscope.json / PREFIX.collapsed로 저장 (네트워크 대기 제외)")
     args = p.parse_args()
 
-    img_b64 = None
-    if args.image and not args.image.strip().startswith("data:"):
-        import base64, pathlib
-        img_b64 = base64.b64encode(pathlib.Path(args.image).read_bytes()).decode()
-    elif args.image:
-        img_b64 = args.image
+    if args.resume and args.checkpoint is None and not args.request:
+        p.error("--resume needs --request (and the same --image) or an explicit --checkpoint")
+    if args.checkpoint is None and args.request:
+        # 요청마다 다른 파일: 다른 요청으로 돌린 run이 이전 checkpoint를 덮어쓰지 않는다
+        args.checkpoint = str(default_checkpoint_path(args.request, _image_key(args.image)))
+    checkpointer = Checkpointer(args.checkpoint) if args.checkpoint else None
+    if args.resume and not (checkpointer and checkpointer.exists()):
+        p.error(f"checkpoint not found: {args.checkpoint}")
+    if not args.resume and not args.request:
+        p.error("--request is required")
 
-    # API 키 확인
+    if args.local_lmm:
+        roles = [r.strip() for r in args.local_roles.split(",") if r.strip()]
+        try:
+            pipeline.cfg = use_local_lmm(pipeline.cfg, args.local_lmm, roles)
+        except ValueError as e:
+            p.error(str(e))
+
+    # API 키 확인 (planner/coder를 모두 로컬로 돌리면 필요 없음)
+    remote = not (args.local_lmm and {"planner", "coder"} <= set(roles))
     api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    if remote and not api_key:
         print("Error: ANTHROPIC_API_KEY not found in environment variables")
         return
     
-    llm = AnthropicLMM()  # AnthropicLLMClient() → AnthropicLMM()
-    state = AgentState(user_request=args.request, img_b64=img_b64)
-    state = run_agent(state, llm, tool_desc="", tool_registry={})
-    coder_result = run_coder_after_final_plan(state, llm, out_filename=args.out)
-    print("saved:", coder_result["file"])
+    llm = AnthropicLMM() if remote else None  # AnthropicLLMClient() → AnthropicLMM()
+    pipeline.cfg.codegen_candidates = args.candidates
+    pipeline.cfg.live_display = args.live
+    pipeline.set_config(pipeline.cfg)  # planner도 같은 Config를 보게
+    tracer = trace.enable() if args.trace else None
+    mem = memprof.MemoryProfiler().start() if args.memprof else None
+    cpu = cpuprof.CpuProfiler().start() if args.profile else None
+    try:
+        run(args, llm, checkpointer)
+    finally:
+        if cpu:
+            cpu.stop()
+            print(cpu.report_text())
+            print("profile:", cpu.to_speedscope(f"{args.profile}.speedscope.json"), cpu.to_collapsed(f"{args.profile}.collapsed"))
+        if mem:
+            mem.stop()
+            print(mem.report_text())
+            print("memprof:", mem.to_json(args.memprof))
+        if tracer:
+            print("trace:", tracer.to_jsonl(f"{args.trace}.jsonl"), tracer.to_chrome_trace(f"{args.trace}.trace.json"))
+        if checkpointer:
+            checkpointer.prune_blobs()
+
+def _image_key(image):
+    if image and not image.strip().startswith("data:"):
+        import pathlib
+        return str(pathlib.Path(image).absolute())
+    return image
+
+def run(args, llm, checkpointer):
+    if args.resume:
+        state, stage = checkpointer.load(tool_registry={})
+        print(f"resumed from stage '{stage}': {args.checkpoint}")
+        if stage == "code" and state.code_result:
+            print("saved:", state.code_result["file"])
+            return
+    else:
+        img_b64 = img_path = None
+        if args.image and not args.image.strip().startswith("data:"):
+            # 파일은 base64로 바꾸지 않고 경로만 넘긴다 (필요한 해상도로 바로 decode)
+            import pathlib
+            img_path = str(pathlib.Path(args.image).absolute())
+        elif args.image:
+            img_b64 = args.image
+        state = AgentState(user_request=args.request, img_b64=img_b64, img_path=img_path)
+
+    tool_registry, tool_desc = {}, ""
+    if args.local_tools:
+        local_tools.register_local_tools(tool_registry, intra_op_threads=args.intra_op_threads)
+        tool_desc = local_tools.LOCAL_TOOL_DESC
+    reuse_index = ReuseIndex(max_distance=args.reuse_distance, path=args.reuse_index) if args.reuse_index else None
+    state = run_agent(state, llm, tool_desc=tool_desc, tool_registry=tool_registry, checkpointer=checkpointer,
+                      reuse_index=reuse_index)
+    if reuse_index:
+        reuse_index.save()
+    code_cache = CodeCache(args.code_cache) if args.code_cache else None
+    coder_result = run_coder_after_final_plan(state, llm, out_filename=args.out, checkpointer=checkpointer,
+                                              code_cache=code_cache)
+    if code_cache:
+        code_cache.save()
+    print("saved:", coder_result["file"], "(cached)" if coder_result.get("cached") else "")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,114 @@
+# src/vision_agent/batching.py
+"""
+Dynamic batching: 여러 thread에서 동시에 들어온 submit()을 모아서 `fn(items) -> results` 한 번으로 처리.
+
+    batcher = DynamicBatcher(model_forward, max_batch=8, max_wait_s=0.01)
+    out = batcher(item)                      # 또는 batcher.submit(item).result()
+
+- 첫 요청이 들어온 뒤 `max_wait_s`까지 또는 `max_batch`개가 찰 때까지 기다린다.
+- `group_key`가 있으면 한 batch 안에서 key가 같은 item끼리만 fn에 넘긴다 (generation 설정 등).
+- worker thread는 첫 submit 때 시작한다.
+- fn이 돌려준 결과가 item보다 적으면 남은 future는 RuntimeError로 실패시킨다 (영원히 기다리지 않도록).
+
+LocalLMM(src.llm)과 local detection tool(src.local_tools)이 같이 쓴다.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, Hashable, List, Optional, Sequence, TypeVar
+
+from src import trace
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class DynamicBatcher(Generic[T, R]):
+    """Groups concurrent submit() calls into one `fn(items) -> results` call."""
+
+    def __init__(self, fn: Callable[[List[T]], Sequence[R]], max_batch: int = 8, max_wait_s: float = 0.01,
+                 name: str = "batcher", group_key: Optional[Callable[[T], Hashable]] = None):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self.name = name
+        self.group_key = group_key
+        self.stats = {"batches": 0, "items": 0, "max_batch": 0}
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, item: T) -> "Future[R]":
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+        fut: "Future[R]" = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item: T) -> R:
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _collect(self) -> Optional[List[tuple]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # 남은 것을 처리한 뒤 종료
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            groups: dict = {}
+            for entry in batch:
+                key = self.group_key(entry[0]) if self.group_key else None
+                groups.setdefault(key, []).append(entry)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, group: List[tuple]) -> None:
+        try:
+            with trace.span("batcher.run", n=len(group)):
+                results = list(self.fn([item for item, _ in group]))
+        except Exception as e:
+            for _, fut in group:
+                fut.set_exception(e)
+            return
+        for (_, fut), res in zip(group, results):
+            fut.set_result(res)
+        if len(results) < len(group):
+            err = RuntimeError(f"{self.name}: batch function returned {len(results)} results for {len(group)} items")
+            for _, fut in group[len(results):]:
+                fut.set_exception(err)
@@ -0,0 +1,225 @@
+# src/vision_agent/batchserver.py
+"""
+Local stand-in for the provider batch endpoints (테스트/리허설용, stdlib만 사용).
+
+  Anthropic: POST /v1/messages/batches, GET /v1/messages/batches/{id}, GET /v1/messages/batches/{id}/results
+  OpenAI:    POST /v1/files (multipart), POST /v1/batches, GET /v1/batches/{id}, GET /v1/files/{id}/content
+
+    server = StandInBatchServer(delay_s=1.0).start()
+    os.environ["ANTHROPIC_BASE_URL"] = server.url      # OpenAI는 f"{server.url}/v1"
+    ...
+    server.stop()
+
+batch는 생성 후 `delay_s`가 지나면 끝난 것으로 보고, 각 request의 응답은 `responder(provider, params)`가 만든다.
+기본 responder는 final plan prompt에는 한 단계짜리 code plan을, 그 외(codegen)에는 짧은 스크립트를 돌려준다.
+"""
+import email.parser
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+Responder = Callable[[str, Dict[str, Any]], str]
+
+_DEFAULT_PLAN = (
+    "<final_answer>이미지에서 대상을 검출하고 개수를 센다.</final_answer>\n"
+    '<code_plan>[{"step": 1, "instruction": "Load the image using load_image()", '
+    '"code_snippet": "image = load_image(image_path)", "explanation": ""}]</code_plan>'
+)
+_DEFAULT_CODE = "```python\nimport sys\nprint('image:', sys.argv[1] if len(sys.argv) > 1 else None)\n```"
+
+
+def _prompt_text(params: Dict[str, Any]) -> str:
+    parts = []
+    for msg in params.get("messages", []):
+        content = msg.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        parts += [c.get("text", "") for c in content or [] if isinstance(c, dict)]
+    return "\n".join(parts)
+
+
+def default_responder(provider: str, params: Dict[str, Any]) -> str:
+    return _DEFAULT_PLAN if "<code_plan>" in _prompt_text(params) else _DEFAULT_CODE
+
+
+class StandInBatchServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_s: float = 0.5,
+                 responder: Optional[Responder] = None):
+        self.delay_s = delay_s
+        self.responder = responder or default_responder
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInBatchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="batch-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):06d}"
+
+    def ended(self, batch: Dict[str, Any]) -> bool:
+        return time.time() - batch["created"] >= self.delay_s
+
+    # ---- Anthropic ----
+    def anthropic_create(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        batch = {"id": self.new_id("msgbatch"), "provider": "anthropic", "created": time.time(),
+                 "requests": body.get("requests", [])}
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        return self.anthropic_view(batch)
+
+    def anthropic_view(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        ended = self.ended(batch)
+        n = len(batch["requests"])
+        iso = lambda t: time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))  # noqa: E731
+        return {
+            "id": batch["id"], "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else n, "succeeded": n if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": iso(batch["created"]), "expires_at": iso(batch["created"] + 86400),
+            "ended_at": iso(time.time()) if ended else None, "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def anthropic_results(self, batch: Dict[str, Any]) -> bytes:
+        lines = []
+        for req in batch["requests"]:
+            params = req.get("params", {})
+            text = self.responder("anthropic", params)
+            message = {"id": self.new_id("msg"), "type": "message", "role": "assistant",
+                       "model": params.get("model", "stand-in"), "content": [{"type": "text", "text": text}],
+                       "stop_reason": "end_turn", "stop_sequence": None,
+                       "usage": {"input_tokens": len(_prompt_text(params)) // 4, "output_tokens": len(text) // 4}}
+            lines.append({"custom_id": req["custom_id"], "result": {"type": "succeeded", "message": message}})
+        return "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+
+    # ---- OpenAI ----
+    def openai_file(self, data: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = self.new_id("file")
+        with self._lock:
+            self.files[file_id] = data
+        return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def openai_create(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        raw = self.files.get(body.get("input_file_id"), b"")
+        requests = [json.loads(l) for l in raw.decode("utf-8").splitlines() if l.strip()]
+        batch = {"id": self.new_id("batch"), "provider": "openai", "created": time.time(), "requests": requests,
+                 "endpoint": body.get("endpoint"), "input_file_id": body.get("input_file_id")}
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        return self.openai_view(batch)
+
+    def openai_view(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        ended = self.ended(batch)
+        if ended and "output_file_id" not in batch:
+            lines = []
+            for req in batch["requests"]:
+                text = self.responder("openai", req.get("body", {}))
+                body = {"id": self.new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+                        "model": req.get("body", {}).get("model", "stand-in"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": text}}]}
+                lines.append({"id": self.new_id("req"), "custom_id": req["custom_id"],
+                              "response": {"status_code": 200, "body": body}, "error": None})
+            data = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+            batch["output_file_id"] = self.openai_file(data, f"{batch['id']}_output.jsonl", "batch_output")["id"]
+        n = len(batch["requests"])
+        return {
+            "id": batch["id"], "object": "batch", "endpoint": batch["endpoint"], "errors": None,
+            "input_file_id": batch["input_file_id"], "completion_window": "24h",
+            "status": "completed" if ended else "in_progress",
+            "output_file_id": batch.get("output_file_id"), "error_file_id": None,
+            "created_at": int(batch["created"]),
+            "request_counts": {"total": n, "completed": n if ended else 0, "failed": 0},
+        }
+
+
+def _make_handler(server: StandInBatchServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # 조용히
+            pass
+
+        def _send(self, status: int, body: Any, content_type: str = "application/json") -> None:
+            data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+            batch = server.batches.get(batch_id)
+            if batch is None:
+                self._send(404, {"error": {"type": "not_found_error", "message": batch_id}})
+            return batch
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/v1/messages/batches":
+                return self._send(200, server.anthropic_create(json.loads(self._body() or b"{}")))
+            if path == "/v1/batches":
+                return self._send(200, server.openai_create(json.loads(self._body() or b"{}")))
+            if path == "/v1/files":
+                fields = _parse_multipart(self.headers.get("Content-Type", ""), self._body())
+                file_part = fields.get("file", {})
+                return self._send(200, server.openai_file(file_part.get("data", b""), file_part.get("filename", "upload"),
+                                                          fields.get("purpose", {}).get("data", b"batch").decode()))
+            self._send(404, {"error": {"message": f"no route: {path}"}})
+
+        def do_GET(self):
+            parts = self.path.split("?", 1)[0].strip("/").split("/")
+            if parts[:3] == ["v1", "messages", "batches"] and len(parts) in (4, 5):
+                batch = self._batch(parts[3])
+                if batch is None:
+                    return
+                if len(parts) == 5 and parts[4] == "results":
+                    return self._send(200, server.anthropic_results(batch), "application/x-jsonl")
+                return self._send(200, server.anthropic_view(batch))
+            if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+                batch = self._batch(parts[2])
+                if batch is not None:
+                    self._send(200, server.openai_view(batch))
+                return
+            if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+                data = server.files.get(parts[2])
+                if data is None:
+                    return self._send(404, {"error": {"message": parts[2]}})
+                return self._send(200, data, "application/octet-stream")
+            self._send(404, {"error": {"message": f"no route: {self.path}"}})
+
+    return Handler
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Dict[str, Any]]:
+    msg = email.parser.BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    fields: Dict[str, Dict[str, Any]] = {}
+    for part in msg.get_payload() if msg.is_multipart() else []:
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = {"data": part.get_payload(decode=True) or b"", "filename": part.get_filename()}
+    return fields
@@ -0,0 +1,162 @@
+# src/vision_agent/boxes.py
+"""
+(N, 4) 배열 단위로 동작하는 bbox 유틸.
+
+Supported formats:
+  - "xyxy"       : pixel [x1, y1, x2, y2]
+  - "xywh"       : pixel [x, y, w, h]
+  - "xyxy_norm"  : [0, 1] normalized [x1, y1, x2, y2]
+  - "xywh_norm"  : [0, 1] normalized [x, y, w, h]
+
+Functions that need the image size take `size=(height, width)`, i.e. `image.shape[:2]`.
+"""
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+BOX_FORMATS = ("xyxy", "xywh", "xyxy_norm", "xywh_norm")
+# detected_image_crop 등 tool 쪽에서 쓰는 이름
+_FORMAT_ALIASES = {"xyxy_pixel": "xyxy", "xywh_pixel": "xywh"}
+
+
+def as_boxes(boxes) -> np.ndarray:
+    """Coerce a list of boxes (or a single box) to a float64 (N, 4) array."""
+    arr = np.asarray(boxes, dtype=np.float64)
+    if arr.size == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr[None, :]
+    if arr.ndim != 2 or arr.shape[1] != 4:
+        raise ValueError(f"Expected boxes of shape (N, 4), got {arr.shape}")
+    return arr
+
+
+def infer_format(boxes) -> str:
+    """Guess "xyxy_norm" vs "xyxy" from the coordinate range."""
+    arr = as_boxes(boxes)
+    if len(arr) and arr.min() >= 0.0 and arr.max() <= 1.0:
+        return "xyxy_norm"
+    return "xyxy"
+
+
+def _check_format(fmt: str) -> str:
+    fmt = _FORMAT_ALIASES.get(fmt, fmt)
+    if fmt not in BOX_FORMATS:
+        raise ValueError(f"Unknown bbox format: {fmt}")
+    return fmt
+
+
+def convert(boxes, src: str, dst: str, size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Convert boxes between formats.
+
+    `size` (height, width) is required whenever the conversion crosses the
+    pixel/normalized boundary.
+    """
+    src, dst = _check_format(src), _check_format(dst)
+    out = as_boxes(boxes).copy()
+    if src == dst:
+        return out
+
+    if src.startswith("xywh"):
+        out[:, 2:] += out[:, :2]
+
+    src_norm, dst_norm = src.endswith("_norm"), dst.endswith("_norm")
+    if src_norm != dst_norm:
+        if size is None:
+            raise ValueError(f"size=(height, width) is required to convert {src} -> {dst}")
+        h, w = size[:2]
+        scale = np.array([w, h, w, h], dtype=np.float64)
+        if src_norm:
+            out *= scale
+        else:
+            out /= scale
+
+    if dst.startswith("xywh"):
+        out[:, 2:] -= out[:, :2]
+    return out
+
+
+def to_pixel(boxes, size: Tuple[int, int], src: str = "xyxy_norm") -> np.ndarray:
+    return convert(boxes, src, "xyxy", size)
+
+
+def to_norm(boxes, size: Tuple[int, int], src: str = "xyxy") -> np.ndarray:
+    return convert(boxes, src, "xyxy_norm", size)
+
+
+def clip(boxes, size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """Clip xyxy boxes to the image; without `size` clips normalized boxes to [0, 1]."""
+    out = as_boxes(boxes).copy()
+    if size is None:
+        return np.clip(out, 0.0, 1.0, out=out)
+    h, w = size[:2]
+    np.clip(out[:, 0::2], 0, w, out=out[:, 0::2])
+    np.clip(out[:, 1::2], 0, h, out=out[:, 1::2])
+    return out
+
+
+def area(boxes) -> np.ndarray:
+    arr = as_boxes(boxes)
+    return np.clip(arr[:, 2] - arr[:, 0], 0, None) * np.clip(arr[:, 3] - arr[:, 1], 0, None)
+
+
+def pairwise_iou(a, b) -> np.ndarray:
+    """IoU matrix of shape (len(a), len(b)) for xyxy boxes (pixel or normalized)."""
+    a, b = as_boxes(a), as_boxes(b)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    union = area(a)[:, None] + area(b)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def nms(boxes, scores, iou_threshold: float = 0.5, max_det: Optional[int] = None) -> np.ndarray:
+    """
+    Greedy non-maximum suppression on xyxy boxes.
+    Returns the indices of kept boxes, highest score first.
+    """
+    arr = as_boxes(boxes)
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    if len(arr) != len(scores):
+        raise ValueError(f"boxes/scores length mismatch: {len(arr)} != {len(scores)}")
+
+    order = np.argsort(-scores, kind="stable")
+    areas = area(arr)
+    keep: List[int] = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        if max_det is not None and len(keep) >= max_det:
+            break
+        rest = order[1:]
+        lt = np.maximum(arr[i, :2], arr[rest, :2])
+        rb = np.minimum(arr[i, 2:], arr[rest, 2:])
+        wh = np.clip(rb - lt, 0, None)
+        inter = wh[:, 0] * wh[:, 1]
+        union = areas[i] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def to_int_pixels(boxes, size: Tuple[int, int], src: str = "xyxy") -> np.ndarray:
+    """Pixel xyxy boxes rounded outward and clipped to the image, as int32."""
+    px = clip(convert(boxes, src, "xyxy", size), size)
+    px[:, :2] = np.floor(px[:, :2])
+    px[:, 2:] = np.ceil(px[:, 2:])
+    return px.astype(np.int32)
+
+
+def crop(image: np.ndarray, boxes, src: str = "xyxy") -> List[np.ndarray]:
+    """
+    Crop every box out of `image`.
+    Crops are numpy views (no copy); empty boxes yield zero-size views.
+    """
+    px = to_int_pixels(boxes, image.shape[:2], src)
+    return [image[y1:y2, x1:x2] for x1, y1, x2, y2 in px.tolist()]
+
+
+def boxes_from_detections(detections: Sequence[dict], key: str = "bbox") -> np.ndarray:
+    """Stack the `bbox` field of a tool's detection list into an (N, 4) array."""
+    return as_boxes([d[key] for d in detections])
@@ -0,0 +1,287 @@
+# src/vision_agent/bulk.py
+"""
+Offline bulk mode: manifest 전체의 planner/coder 호출을 provider batch API로 보낸다.
+
+    runner = BulkRunner("jobs/night1")
+    runner.init("manifest.jsonl")     # {"id": str, "request": str, "image": path} per line
+    runner.run()                       # submit → poll → 결과가 오면 item별로 다음 단계 진행
+
+- item마다 AgentState checkpoint(src.checkpoint)를 `<job_dir>/items/<id>.ckpt`에 남기고,
+  job 상태(각 item의 단계, 제출된 batch id)는 `<job_dir>/job.json`에 원자적으로 저장한다.
+  프로세스가 죽어도 같은 job_dir로 다시 run()하면 열린 batch를 계속 poll한다.
+- 단계: vqa(로컬) → plan(planner batch) → code(coder batch) → done
+- 생성된 스크립트는 `<job_dir>/out/<id>.py`
+"""
+import json
+import os
+import re
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from src import pipeline, trace
+from src.checkpoint import Checkpointer
+from src.codegen import save_code_to_file, strip_code_fences
+from src.llm import LMM, AnthropicLMM, OpenAILMM
+from src.planner import parse_final_plan, render_final_plan_prompt
+from src.prompt import build_codegen_prompt
+from src.types import AgentState
+
+STAGES = ("vqa", "plan", "code", "done", "failed")
+
+
+class BulkError(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# provider batch backends
+# ---------------------------------------------------------------------------
+
+def _unwrap(lmm: LMM) -> LMM:
+    return getattr(lmm, "inner", lmm)  # CoalescingLMM
+
+
+class AnthropicBatchBackend:
+    """Message Batches API."""
+
+    def __init__(self, lmm: AnthropicLMM):
+        self.lmm = lmm
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any]]]) -> str:
+        batch = self.lmm.client.messages.batches.create(
+            requests=[{"custom_id": cid, "params": params} for cid, params in requests])
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.lmm.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        out: Dict[str, Union[str, Exception]] = {}
+        for entry in self.lmm.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                out[entry.custom_id] = "".join(b.text for b in entry.result.message.content if hasattr(b, "text"))
+            else:
+                out[entry.custom_id] = BulkError(f"{entry.result.type}: {getattr(entry.result, 'error', '')}")
+        return out
+
+
+class OpenAIBatchBackend:
+    """Batch API (JSONL upload → /v1/chat/completions batch)."""
+
+    def __init__(self, lmm: OpenAILMM):
+        self.lmm = lmm
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any]]]) -> str:
+        lines = [{"custom_id": cid, "method": "POST", "url": "/v1/chat/completions", "body": body}
+                 for cid, body in requests]
+        data = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+        file = self.lmm.client.files.create(file=("batch.jsonl", BytesIO(data)), purpose="batch")
+        batch = self.lmm.client.batches.create(input_file_id=file.id, endpoint="/v1/chat/completions",
+                                               completion_window="24h")
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.lmm.client.batches.retrieve(batch_id).status in ("completed", "failed", "expired", "cancelled")
+
+    def results(self, batch_id: str) -> Dict[str, Union[str, Exception]]:
+        batch = self.lmm.client.batches.retrieve(batch_id)
+        out: Dict[str, Union[str, Exception]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.lmm.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                resp = row.get("response") or {}
+                if row.get("error") or resp.get("status_code") != 200:
+                    out[row["custom_id"]] = BulkError(str(row.get("error") or resp.get("body")))
+                else:
+                    out[row["custom_id"]] = resp["body"]["choices"][0]["message"]["content"]
+        return out
+
+
+def backend_for(lmm: LMM):
+    lmm = _unwrap(lmm)
+    if isinstance(lmm, AnthropicLMM):
+        return AnthropicBatchBackend(lmm)
+    if isinstance(lmm, OpenAILMM):
+        return OpenAIBatchBackend(lmm)
+    raise BulkError(f"No batch API for {type(lmm).__name__}")
+
+
+# ---------------------------------------------------------------------------
+# runner
+# ---------------------------------------------------------------------------
+
+def read_manifest(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    items, seen = [], set()
+    for n, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not row.get("request"):
+            raise BulkError(f"manifest line {n}: 'request' is required")
+        row["id"] = re.sub(r"[^A-Za-z0-9_-]", "_", str(row.get("id") or n))
+        if row["id"] in seen:
+            raise BulkError(f"manifest line {n}: duplicate id {row['id']}")
+        seen.add(row["id"])
+        items.append(row)
+    return items
+
+
+class BulkRunner:
+    def __init__(self, job_dir: Union[str, Path], tool_desc: str = "", max_retries: int = 2,
+                 max_batch_size: int = 1000):
+        self.job_dir = Path(job_dir)
+        self.tool_desc = tool_desc
+        self.max_retries = max_retries
+        self.max_batch_size = max_batch_size
+        self.job: Dict[str, Any] = {"items": {}, "batches": {}}
+        self._planner: Optional[LMM] = None
+        self._coder: Optional[LMM] = None
+        if self.job_path.exists():
+            self.job = json.loads(self.job_path.read_text(encoding="utf-8"))
+
+    @property
+    def job_path(self) -> Path:
+        return self.job_dir / "job.json"
+
+    def _save_job(self) -> None:
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.job_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.job, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.job_path)
+
+    def _checkpointer(self, item_id: str) -> Checkpointer:
+        return Checkpointer(self.job_dir / "items" / f"{item_id}.ckpt", self.job_dir / "blobs")
+
+    def _lmm(self, role: str) -> LMM:
+        if role == "plan":
+            self._planner = self._planner or pipeline.cfg.create_planner()
+            return self._planner
+        self._coder = self._coder or pipeline.cfg.create_coder()
+        return self._coder
+
+    # ---- setup ----
+    def init(self, manifest: Union[str, Path, Iterable[Dict[str, Any]]]) -> int:
+        """Register manifest items (이미 있는 id는 건너뜀). Runs the local VQA stage."""
+        rows = read_manifest(manifest) if isinstance(manifest, (str, Path)) else list(manifest)
+        added = 0
+        for row in rows:
+            if row["id"] in self.job["items"]:
+                continue
+            image = row.get("image")
+            state = AgentState(user_request=row["request"],
+                               img_path=str(Path(image).absolute()) if image else None,
+                               tool_desc=self.tool_desc)
+            pipeline.run_vqa(state)
+            self._checkpointer(row["id"]).save(state, "vqa")
+            self.job["items"][row["id"]] = {"stage": "vqa", "batch": None, "attempts": 0, "error": None}
+            added += 1
+        self._save_job()
+        return added
+
+    # ---- one round ----
+    def step(self) -> Dict[str, int]:
+        """Collect finished batches, then submit everything that is ready. Returns stage counts."""
+        with trace.span("bulk.step"):
+            self._collect()
+            for stage in ("vqa", "plan"):
+                self._submit(stage)
+        return self.counts()
+
+    def counts(self) -> Dict[str, int]:
+        out = {s: 0 for s in STAGES}
+        for item in self.job["items"].values():
+            out[item["stage"]] += 1
+        out["in_flight"] = sum(1 for i in self.job["items"].values() if i["batch"])
+        return out
+
+    def done(self) -> bool:
+        return all(i["stage"] in ("done", "failed") for i in self.job["items"].values())
+
+    def run(self, poll_s: float = 30.0, timeout_s: Optional[float] = None, verbose: bool = True) -> Dict[str, int]:
+        t0 = time.monotonic()
+        while True:
+            counts = self.step()
+            if verbose:
+                print("[bulk]", " ".join(f"{k}={v}" for k, v in counts.items() if v))
+            if self.done():
+                return counts
+            if timeout_s is not None and time.monotonic() - t0 > timeout_s:
+                return counts
+            time.sleep(poll_s)
+
+    # ---- submit ----
+    def _request_for(self, stage: str, state: AgentState) -> Dict[str, Any]:
+        """stage 'vqa' 다음은 plan 요청, 'plan' 다음은 codegen 요청."""
+        if stage == "vqa":
+            prompt, media = render_final_plan_prompt(state)
+            chat = [{"role": "user", "content": prompt, **({"media": media} if media else {})}]
+            return self._lmm("plan").batch_request(chat)
+        prompt = build_codegen_prompt(state.user_request, tool_desc="", has_image=bool(state.img_b64 or state.img_path))
+        return self._lmm("code").batch_request([{"role": "user", "content": prompt}])
+
+    def _submit(self, stage: str) -> None:
+        ready = [iid for iid, item in self.job["items"].items() if item["stage"] == stage and not item["batch"]]
+        role = "plan" if stage == "vqa" else "code"
+        for start in range(0, len(ready), self.max_batch_size):
+            chunk = ready[start:start + self.max_batch_size]
+            requests = []
+            for iid in chunk:
+                state, _ = self._checkpointer(iid).load()
+                requests.append((f"{role}-{iid}", self._request_for(stage, state)))
+            with trace.span("bulk.submit", role=role, n=len(requests)):
+                batch_id = backend_for(self._lmm(role)).submit(requests)
+            self.job["batches"][batch_id] = {"role": role, "items": chunk, "submitted": time.time()}
+            for iid in chunk:
+                self.job["items"][iid]["batch"] = batch_id
+                self.job["items"][iid]["attempts"] += 1
+            self._save_job()
+
+    # ---- collect ----
+    def _collect(self) -> None:
+        for batch_id, info in list(self.job["batches"].items()):
+            backend = backend_for(self._lmm(info["role"]))
+            if not backend.is_done(batch_id):
+                continue
+            with trace.span("bulk.collect", role=info["role"], n=len(info["items"])):
+                results = backend.results(batch_id)
+                for iid in info["items"]:
+                    self._apply(iid, info["role"], results.get(f"{info['role']}-{iid}",
+                                                               BulkError("missing from batch results")))
+            del self.job["batches"][batch_id]
+            self._save_job()
+
+    def _apply(self, item_id: str, role: str, result: Union[str, Exception]) -> None:
+        item = self.job["items"][item_id]
+        item["batch"] = None
+        ckpt = self._checkpointer(item_id)
+        try:
+            if isinstance(result, Exception):
+                raise result
+            state, _ = ckpt.load()
+            if role == "plan":
+                state.code_plan = parse_final_plan(result, self._lmm("plan"))["code_plan"]
+                ckpt.save(state, "plan")
+                item["stage"] = "plan"
+            else:
+                path = save_code_to_file(strip_code_fences(result), self._out_file(item_id))
+                state.code_result = {"status": "success", "file": str(path)}
+                ckpt.save(state, "code")
+                item["stage"] = "done"
+            item["error"] = None
+            item["attempts"] = 0
+        except Exception as e:
+            # 같은 단계로 남겨두면 다음 step에서 다시 제출된다
+            item["error"] = repr(e)
+            if item["attempts"] > self.max_retries:
+                item["stage"] = "failed"
+
+    def _out_file(self, item_id: str) -> Path:
+        out = self.job_dir / "out"
+        out.mkdir(parents=True, exist_ok=True)
+        return out / f"{item_id}.py"
@@ -0,0 +1,245 @@
+# src/vision_agent/checkpoint.py
+"""
+AgentState checkpoint.
+
+파일 포맷: MAGIC(6) + version(1) + zlib(JSON)
+  - 이미지/큰 ndarray는 content-addressed BlobStore에 sha256 digest로 한 번만 저장하고
+    checkpoint에는 digest만 남긴다.
+  - observations 안의 mask는 src.masks의 compact 표현(RLE/packed)으로 저장.
+  - img_path 입력은 파일을 복사하지 않고 sha256 digest만 기록한다. load 시 파일이 없거나 내용이
+    바뀌었으면 CheckpointError.
+  - tool_registry(함수)는 저장하지 않는다. resume 시 다시 넣어준다.
+  - observations와 all_execs가 같은 exec_result 객체를 공유하면 observations에는 all_execs index만 남긴다.
+  - 어떤 checkpoint도 참조하지 않는 blob은 Checkpointer.prune_blobs()로 지운다.
+
+Stage 순서: "vqa" → "plan" → "code"
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from src.masks import PackedMask, RLEMask, mask_from_json
+from src.types import AgentState
+
+MAGIC = b"VACKPT"
+VERSION = 1
+STAGES = ("vqa", "plan", "code")
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+class BlobStore:
+    """Content-addressed blob store: <root>/<digest[:2]>/<digest>."""
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        path = self._path(digest)
+        if not path.exists():
+            raise CheckpointError(f"Missing blob: {digest}")
+        return path.read_bytes()
+
+    def __contains__(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def prune(self, keep: Iterable[str], min_age_s: float = 3600.0) -> int:
+        """
+        Delete blobs not in `keep`. Blobs younger than `min_age_s` are kept, because a concurrent
+        run may have written them before its checkpoint exists. Returns the number removed.
+        """
+        keep = set(keep)
+        cutoff = time.time() - min_age_s
+        removed = 0
+        for path in self.root.glob("??/*"):
+            if path.name in keep or ".tmp" in path.name:
+                continue
+            try:
+                if path.stat().st_mtime <= cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def _file_digest(path: Union[str, Path]) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _pack(obj: Any, store: BlobStore) -> Any:
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if isinstance(obj, dict):
+        return {str(k): _pack(v, store) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_pack(v, store) for v in obj]
+    if isinstance(obj, (RLEMask, PackedMask)):
+        return {"__mask__": obj.to_json()}
+    if isinstance(obj, np.ndarray):
+        arr = np.ascontiguousarray(obj)
+        return {"__ndarray__": {"blob": store.put(arr.tobytes()), "dtype": arr.dtype.str, "shape": list(arr.shape)}}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    # 복원 불가능한 객체는 repr만 남긴다
+    return {"__repr__": repr(obj)}
+
+
+def _unpack(obj: Any, store: BlobStore) -> Any:
+    if isinstance(obj, list):
+        return [_unpack(v, store) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if len(obj) == 1:
+        (key, val), = obj.items()
+        if key == "__mask__":
+            return mask_from_json(val)
+        if key == "__ndarray__":
+            data = store.get(val["blob"])
+            return np.frombuffer(data, dtype=np.dtype(val["dtype"])).reshape(val["shape"]).copy()
+        if key == "__repr__":
+            return val
+    return {k: _unpack(v, store) for k, v in obj.items()}
+
+
+def _blob_refs(obj: Any, out: Set[str]) -> Set[str]:
+    if isinstance(obj, list):
+        for v in obj:
+            _blob_refs(v, out)
+    elif isinstance(obj, dict):
+        nd = obj.get("__ndarray__")
+        if len(obj) == 1 and isinstance(nd, dict):
+            out.add(nd["blob"])
+        else:
+            for v in obj.values():
+                _blob_refs(v, out)
+    return out
+
+
+def _read_payload(data: bytes) -> Dict[str, Any]:
+    if not data.startswith(MAGIC):
+        raise CheckpointError("Not an AgentState checkpoint")
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version: {version}")
+    return json.loads(zlib.decompress(data[len(MAGIC) + 1:]).decode("utf-8"))
+
+
+def referenced_blobs(data: bytes) -> Set[str]:
+    """Digests of all blobs a checkpoint refers to."""
+    payload = _read_payload(data)
+    refs = {payload["image"]} if payload.get("image") else set()
+    return _blob_refs(payload, refs)
+
+
+def dump_state(state: AgentState, store: BlobStore, stage: str) -> bytes:
+    if stage not in STAGES:
+        raise CheckpointError(f"Unknown stage: {stage}")
+    payload: Dict[str, Any] = {"stage": stage, "image": None, "image_path_digest": None}
+    if state.img_b64:
+        payload["image"] = store.put(base64.b64decode(state.img_b64))
+    if state.img_path:
+        payload["image_path_digest"] = _file_digest(state.img_path)
+    # observations는 보통 all_execs와 같은 dict를 담고 있으므로 index로만 저장
+    exec_index = {id(ex): i for i, ex in enumerate(state.all_execs)}
+    for name in AgentState.__slots__:
+        if name in ("img_b64", "tool_registry"):
+            continue
+        if name == "observations":
+            payload[name] = [{"__exec__": exec_index[id(o)]} if id(o) in exec_index else _pack(o, store)
+                             for o in state.observations]
+            continue
+        payload[name] = _pack(getattr(state, name), store)
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return MAGIC + bytes([VERSION]) + zlib.compress(body, 6)
+
+
+def load_state(data: bytes, store: BlobStore, tool_registry: Optional[Dict[str, Any]] = None) -> Tuple[AgentState, str]:
+    payload = _read_payload(data)
+
+    stage = payload.pop("stage")
+    digest = payload.pop("image")
+    path_digest = payload.pop("image_path_digest", None)
+    img_path = payload.get("img_path")
+    if path_digest:
+        try:
+            current = _file_digest(img_path)
+        except OSError as e:
+            raise CheckpointError(f"Checkpoint image is not readable: {img_path} ({e})") from e
+        if current != path_digest:
+            raise CheckpointError(f"Checkpoint image changed since it was saved: {img_path}")
+    observations = payload.pop("observations", [])
+    fields = {k: _unpack(v, store) for k, v in payload.items() if k in AgentState.__slots__}
+    execs = fields.get("all_execs") or []
+    fields["observations"] = [execs[o["__exec__"]] if isinstance(o, dict) and set(o) == {"__exec__"}
+                              else _unpack(o, store) for o in observations]
+    state = AgentState(**fields)
+    if digest:
+        state.img_b64 = base64.b64encode(store.get(digest)).decode()
+    if tool_registry is not None:
+        state.tool_registry = tool_registry
+    return state, stage
+
+
+class Checkpointer:
+    """
+    Writes `path` after each pipeline stage; blobs go to `<path.parent>/blobs` by default.
+    """
+
+    def __init__(self, path: Union[str, Path], blob_dir: Optional[Union[str, Path]] = None):
+        self.path = Path(path)
+        self.store = BlobStore(blob_dir or self.path.parent / "blobs")
+
+    def save(self, state: AgentState, stage: str) -> Path:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_bytes(dump_state(state, self.store, stage))
+        os.replace(tmp, self.path)
+        return self.path
+
+    def load(self, tool_registry: Optional[Dict[str, Any]] = None) -> Tuple[AgentState, str]:
+        return load_state(self.path.read_bytes(), self.store, tool_registry)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def prune_blobs(self, min_age_s: float = 3600.0) -> int:
+        """Remove blobs not referenced by any `*.ckpt` next to this checkpoint (see BlobStore.prune)."""
+        keep: Set[str] = set()
+        for path in self.path.parent.glob("*.ckpt"):
+            try:
+                keep |= referenced_blobs(path.read_bytes())
+            except (OSError, CheckpointError, ValueError, zlib.error):
+                continue
+        return self.store.prune(keep, min_age_s)
+
+
+def default_checkpoint_path(user_request: str, image: Optional[str] = None,
+                            root: Union[str, Path] = ".checkpoints") -> Path:
+    """Per-request checkpoint path: `<root>/<digest of request + image>.ckpt`."""
+    h = hashlib.sha256(user_request.encode("utf-8"))
+    h.update(b"\0" + (image or "").encode("utf-8"))
+    return Path(root) / f"{h.hexdigest()[:16]}.ckpt"
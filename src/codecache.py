@@ -0,0 +1,195 @@
+# src/vision_agent/codecache.py
+"""
+생성된 스크립트 캐시.
+
+Key = 정규화한 사용자 요청 + code_plan (instruction만, 소문자/공백 정리, 따옴표 literal과 detection
+target은 slot placeholder로 치환) + tool 집합. code_plan이 같아도 요청이 다르면 다른 entry. 그래서 "count tomatoes and draw boxes"와
+"count apples and draw boxes"는 같은 entry를 쓰고, 저장된 코드 template의 slot만 바꿔 끼운다.
+
+- 코드 template은 content-addressed(sha256)로 저장하고 entry는 digest만 가진다.
+- 코드 안에서 따옴표 literal로 찾지 못한 slot 값은 entry에 고정값으로 남기고, 값이 같을 때만 hit.
+- validation: 저장 시 compile 여부, 실행 결과는 mark()로 기록. 실행 실패한 entry는 쓰지 않는다.
+- LRU eviction (max_entries).
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# 단어 안의 apostrophe("don't", "kid's")는 따옴표로 보지 않는다
+_QUOTED = re.compile(r"""(?<!\w)(['"])([^'"\\\n]{1,80})\1(?!\w)""")
+_UNSAFE = re.compile(r"""['"\\\n]""")
+
+
+def _marker(name: str) -> str:
+    return f"__SLOT_{name}__"
+
+
+def normalize_code_plan(code_plan: List[Any], target: Optional[str] = None) -> Tuple[List[str], Dict[str, str]]:
+    """Returns (normalized step instructions, slots {name: value})."""
+    slots: Dict[str, str] = {}
+    names: Dict[str, str] = {}
+    if target:
+        slots["target"] = target
+        names[target.lower()] = "target"
+    # 복수형("tomatoes")까지 같은 slot으로 본다
+    target_re = re.compile(rf"\b{re.escape(target)}(?:e?s)?\b", re.IGNORECASE) if target else None
+
+    def to_slot(m: re.Match) -> str:
+        value = m.group(2)
+        name = names.get(value.lower())
+        if name is None:
+            name = f"slot{len(slots)}"
+            names[value.lower()] = name
+            slots[name] = value
+        return "{" + name + "}"
+
+    steps = []
+    for step in code_plan or []:
+        text = step.get("instruction", "") if isinstance(step, dict) else str(step)
+        text = _QUOTED.sub(to_slot, text)
+        if target_re is not None:
+            text = target_re.sub("{target}", text)
+        steps.append(re.sub(r"\s+", " ", text.strip().lower()))
+    return steps, slots
+
+
+def make_code_key(code_plan: List[Any], tools: Iterable[str] = (), target: Optional[str] = None,
+                  instruction: str = "") -> Tuple[str, Dict[str, str]]:
+    # 요청도 같은 slot 치환을 거치므로 "count tomatoes"와 "count apples"는 여전히 같은 key
+    texts, slots = normalize_code_plan([*(code_plan or []), instruction], target)
+    *steps, request = texts
+    payload = json.dumps({"request": request, "steps": steps, "tools": sorted(set(tools)), "slots": sorted(slots)},
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest(), slots
+
+
+def _template(code: str, slots: Dict[str, str]) -> Tuple[str, List[str], Dict[str, str]]:
+    """Replace quoted slot values in `code` by markers. Returns (template, parameterized, fixed)."""
+    params, fixed = [], {}
+    # 긴 값부터 치환해야 "red tomato" 안의 "tomato"가 먼저 잡히지 않는다
+    for name, value in sorted(slots.items(), key=lambda kv: -len(kv[1])):
+        pattern = re.compile(rf"""(['"]){re.escape(value)}\1""")
+        if _UNSAFE.search(value) or not pattern.search(code):
+            fixed[name] = value
+            continue
+        code = pattern.sub(lambda m: m.group(1) + _marker(name) + m.group(1), code)
+        params.append(name)
+    return code, sorted(params), fixed
+
+
+def _compiles(code: str) -> bool:
+    try:
+        compile(code, "<cached>", "exec")
+        return True
+    except SyntaxError:
+        return False
+
+
+class CodeCache:
+    def __init__(self, root: Optional[Union[str, Path]] = None, max_entries: int = 128):
+        self.root = Path(root) if root else None
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._scripts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if self.root and (self.root / "index.json").exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, slots: Dict[str, str]) -> Optional[str]:
+        """Filled-in script for `key`, or None (miss / failed validation / fixed slot mismatch)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            usable = (
+                entry is not None
+                and entry["compiled"] and entry["ran"] is not False
+                and all(slots.get(k) == v for k, v in entry["fixed"].items())
+                and not any(_UNSAFE.search(slots.get(k, "")) or k not in slots for k in entry["slots"])
+            )
+            if not usable:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            self.stats["hits"] += 1
+            code = self._read_script(entry["digest"])
+        for name in entry["slots"]:
+            code = code.replace(_marker(name), slots[name])
+        return code
+
+    def put(self, key: str, slots: Dict[str, str], code: str) -> Dict[str, Any]:
+        template, params, fixed = _template(code, slots)
+        digest = hashlib.sha256(template.encode("utf-8")).hexdigest()
+        entry = {"digest": digest, "slots": params, "fixed": fixed, "compiled": _compiles(code),
+                 "ran": None, "hits": 0, "created": time.time(), "last_used": time.time()}
+        with self._lock:
+            self._write_script(digest, template)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+                self._drop_script(old["digest"])
+        return entry
+
+    def mark(self, key: str, ran: bool) -> None:
+        """Record whether the script for `key` actually ran successfully."""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["ran"] = ran
+
+    # ---- scripts (content-addressed) ----
+    def _script_path(self, digest: str) -> Path:
+        return self.root / "scripts" / f"{digest}.py"
+
+    def _write_script(self, digest: str, template: str) -> None:
+        self._scripts[digest] = template
+        if self.root:
+            path = self._script_path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(template, encoding="utf-8")
+
+    def _read_script(self, digest: str) -> str:
+        if digest not in self._scripts:
+            self._scripts[digest] = self._script_path(digest).read_text(encoding="utf-8")
+        return self._scripts[digest]
+
+    def _drop_script(self, digest: str) -> None:
+        if any(e["digest"] == digest for e in self._entries.values()):
+            return
+        self._scripts.pop(digest, None)
+        if self.root:
+            self._script_path(digest).unlink(missing_ok=True)
+
+    # ---- persistence ----
+    def save(self) -> Path:
+        if not self.root:
+            raise ValueError("CodeCache has no root directory")
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {"entries": [{"key": k, **e} for k, e in self._entries.items()]}
+        path = self.root / "index.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+    def load(self) -> None:
+        data = json.loads((self.root / "index.json").read_text(encoding="utf-8"))
+        with self._lock:
+            for row in data["entries"]:  # LRU 순서로 저장되어 있음
+                key = row.pop("key")
+                if self._script_path(row["digest"]).exists():
+                    self._entries[key] = row
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
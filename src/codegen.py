@@ -1,5 +1,22 @@
+import base64
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 from .prompt import build_codegen_prompt
+from . import trace
+from .codecache import CodeCache, make_code_key
+from .scriptrun import run_script, static_check
+
+# 후보별 prompt 변형 (temperature와 함께 돌아가며 사용)
+_VARIANTS = (
+    "",
+    "\nPrefer the simplest implementation that satisfies the instruction.\n",
+    "\nBe defensive: validate inputs and handle empty results without crashing.\n",
+)
 
 def strip_code_fences(text: str) -> str:
     lines = text.strip().splitlines()
@@ -14,10 +31,145 @@ def save_code_to_file(code: str, filename: str = "extract_code.py") -> Path:
     path.write_text(code, encoding="utf-8")
     return path
 
-def generate_code(llm, instruction: str, *, img_b64: str | None = None,
-                  tool_desc: str = "", out_filename: str = "extract_code.py"):
-    prompt = build_codegen_prompt(instruction, tool_desc=tool_desc, has_image=bool(img_b64))
-    raw = llm.generate(prompt)
-    code = strip_code_fences(raw)
-    path = save_code_to_file(code, out_filename)
-    return {"status": "success", "file": str(path)}
+def _write_input_image(img_b64: str, workdir: Path) -> Path:
+    data = base64.b64decode(img_b64)
+    suffix = ".jpg" if data[:2] == b"\xff\xd8" else ".png" if data[:4] == b"\x89PNG" else ".img"
+    path = workdir / f"input{suffix}"
+    path.write_bytes(data)
+    return path
+
+
+def check_script_output(stdout: str) -> Optional[str]:
+    """None if the last stdout line is a JSON object without an "error" key, otherwise the reason."""
+    lines = [l for l in stdout.strip().splitlines() if l.strip()]
+    if not lines:
+        return "no output"
+    try:
+        result = json.loads(lines[-1])
+    except ValueError:
+        return "last stdout line is not JSON"
+    if not isinstance(result, dict):
+        return "result is not a JSON object"
+    if result.get("error"):
+        return f"run() error: {str(result['error'])[:200]}"
+    return None
+
+
+def generate_code_candidates(llm, prompt: str, *, img_b64: str | None = None,
+                             img_path: str | None = None, k: int = 3,
+                             temperatures: Sequence[float] = (0.0, 0.4, 0.8),
+                             timeout_s: float = 60.0) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    K개 후보를 병렬로 생성 → static check → 각자 임시 디렉터리에서 입력 이미지로 실행.
+    exit 0이고 마지막 stdout 줄이 "error" key 없는 JSON 결과일 때만 통과로 본다
+    (prompt는 build_codegen_prompt(image_arg=True)로 만들어야 한다).
+    처음 통과한 후보의 코드를 돌려주고 나머지는 취소한다 (실행 중인 프로세스는 kill,
+    아직 시작 안 한 작업은 cancel; 이미 나간 LLM 요청은 결과만 버린다).
+    Returns (code or None, per-candidate reports).
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="codegen_"))
+    image_path = Path(img_path).absolute() if img_path else _write_input_image(img_b64, workdir) if img_b64 else None
+    cancel = threading.Event()
+
+    def attempt(i: int) -> Optional[Dict[str, Any]]:
+        if cancel.is_set():
+            return None
+        temperature = temperatures[i % len(temperatures)]
+        with trace.span("codegen.candidate", candidate=i, temperature=temperature) as sp:
+            raw = llm.generate(prompt + _VARIANTS[i % len(_VARIANTS)], temperature=temperature)
+            if cancel.is_set():
+                return None
+            code = strip_code_fences(raw)
+            report: Dict[str, Any] = {"candidate": i, "temperature": temperature, "code": code}
+            error = static_check(code)
+            if error is None:
+                path = workdir / f"cand{i}" / "script.py"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(code, encoding="utf-8")
+                res = run_script(path, image_path, timeout_s=timeout_s, cancel=cancel)
+                report.update(elapsed_s=round(res.elapsed_s, 3), cancelled=res.cancelled)
+                if not res.ok:
+                    lines = res.stderr.strip().splitlines()
+                    error = "timeout" if res.timed_out else (lines[-1] if lines else f"exit {res.returncode}")
+                else:
+                    error = check_script_output(res.stdout)
+            report.update(ok=error is None, error=error)
+            sp.set("ok", error is None)
+            return report
+
+    winner: Optional[str] = None
+    reports: List[Dict[str, Any]] = []
+    pool = ThreadPoolExecutor(max_workers=k, thread_name_prefix="codegen")
+    try:
+        futures = [pool.submit(attempt, i) for i in range(k)]
+        for fut in as_completed(futures):
+            try:
+                report = fut.result()
+            except Exception as e:
+                # LLM 오류(rate limit 등)는 그 후보만 실패로 두고 나머지를 기다린다
+                reports.append({"candidate": futures.index(fut), "code": None, "ok": False, "error": repr(e)})
+                continue
+            if report is None:
+                continue
+            reports.append(report)
+            if report["ok"]:
+                winner = report["code"]
+                cancel.set()
+                break
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return winner, reports
+
+
+def generate_code(llm, instruction: str, *, img_b64: str | None = None, img_path: str | None = None,
+                  tool_desc: str = "", out_filename: str = "extract_code.py",
+                  code_plan: Optional[List[Any]] = None, tools: Iterable[str] = (),
+                  target: Optional[str] = None, cache: Optional[CodeCache] = None,
+                  candidates: int = 1, timeout_s: float = 60.0):
+    """
+    cache와 code_plan이 주어지면 정규화한 instruction + code_plan + tool 집합으로 캐시를 먼저 찾고,
+    hit이면 slot(detection target 등)만 바꿔 끼운 스크립트를 저장하고 LLM 호출을 건너뛴다.
+    candidates > 1이면 generate_code_candidates로 여러 후보를 병렬 생성/검증하고 처음 통과한 것을 쓴다.
+    """
+    with trace.stage("generate_code") as sp:
+        key = None
+        if cache is not None and code_plan:
+            key, slots = make_code_key(code_plan, tools, target, instruction=instruction)
+            code = cache.get(key, slots)
+            sp.set("cache_hit", code is not None)
+            if code is not None:
+                with trace.span("save_code", bytes_in=len(code)):
+                    path = save_code_to_file(code, out_filename)
+                return {"status": "success", "file": str(path), "cached": True, "cache_key": key}
+
+        with trace.span("render_prompt"):
+            prompt = build_codegen_prompt(instruction, tool_desc=tool_desc, has_image=bool(img_b64 or img_path),
+                                          image_arg=candidates > 1)
+
+        verified = None
+        reports: List[Dict[str, Any]] = []
+        if candidates > 1:
+            code, reports = generate_code_candidates(llm, prompt, img_b64=img_b64, img_path=img_path,
+                                                     k=candidates, timeout_s=timeout_s)
+            verified = code is not None
+            if code is None:
+                # 모두 실패: 첫 후보라도 저장 (기존 동작과 동일하게 검증 없이)
+                codes = [r["code"] for r in reports if r.get("code")]
+                code = codes[0] if codes else strip_code_fences(llm.generate(prompt))
+            sp.set("candidates_tried", len(reports))
+        else:
+            code = strip_code_fences(llm.generate(prompt))
+        with trace.span("save_code", bytes_in=len(code)):
+            path = save_code_to_file(code, out_filename)
+        if key is not None:
+            cache.put(key, slots, code)
+            if verified is not None:
+                cache.mark(key, verified)
+
+    result = {"status": "success", "file": str(path), "cached": False, "cache_key": key}
+    if candidates > 1:
+        result["verified"] = verified
+        result["candidates"] = [{k: v for k, v in r.items() if k != "code"} for r in reports]
+    return result
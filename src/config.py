@@ -1,7 +1,9 @@
 # src/vision_agent/config.py
-from typing import Type
-from pydantic import BaseModel, Field
-from src.llm import LMM, AnthropicLMM, OpenAILMM
+from typing import Any, Sequence, Type
+import threading
+from pydantic import BaseModel, Field, PrivateAttr
+from src.llm import LMM, AnthropicLMM, LocalLMM, OpenAILMM, shared_local_lmm
+from src.singleflight import CoalescingLMM, SingleFlight
 
 class Config(BaseModel):
     vqa: Type[LMM] = Field(default=OpenAILMM)
@@ -19,6 +21,50 @@ class Config(BaseModel):
         "model_name": "claude-sonnet-4-5-20250929", "temperature": 0.0, "image_size": 768,
     })
 
-    def create_vqa(self) -> LMM: return self.vqa(**self.vqa_kwargs)
-    def create_planner(self) -> LMM: return self.planner(**self.planner_kwargs)
-    def create_coder(self) -> LMM: return self.coder(**self.coder_kwargs)
+    # True면 create_*가 role별로 같은 client를 재사용 (장기 실행 서비스에서 warm client 유지)
+    reuse_clients: bool = False
+    # True면 동시에 들어온 동일한 LMM 호출을 하나로 합친다 (src.singleflight)
+    coalesce_calls: bool = False
+    # 1보다 크면 codegen 후보를 병렬로 생성해 입력 이미지로 실행했을 때 처음 결과를 낸 것을 쓴다
+    codegen_candidates: int = 1
+    codegen_timeout_s: float = 60.0
+    # True면 planner 응답을 stream으로 받아 plan step/analysis log를 도착하는 대로 그린다 (src.display.LivePlanDisplay)
+    live_display: bool = False
+    _clients: dict = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _flight: SingleFlight = PrivateAttr(default_factory=SingleFlight)
+
+    def _build(self, role: str) -> LMM:
+        cls, kwargs = getattr(self, role), getattr(self, f"{role}_kwargs")
+        # LocalLMM은 reuse_clients와 무관하게 설정별로 process에 하나 (model load 1회, batcher 공유)
+        lmm = shared_local_lmm(**kwargs) if issubclass(cls, LocalLMM) else cls(**kwargs)
+        return CoalescingLMM(lmm, self._flight) if self.coalesce_calls else lmm
+
+    def _create(self, role: str) -> LMM:
+        if not self.reuse_clients:
+            return self._build(role)
+        with self._lock:
+            if role not in self._clients:
+                self._clients[role] = self._build(role)
+            return self._clients[role]
+
+    def create_vqa(self) -> LMM: return self._create("vqa")
+    def create_planner(self) -> LMM: return self._create("planner")
+    def create_coder(self) -> LMM: return self._create("coder")
+
+
+LOCAL_MODEL = "Qwen/Qwen2-VL-2B-Instruct"
+
+
+def use_local_lmm(cfg: Config, model_name: str = LOCAL_MODEL, roles: Sequence[str] = ("vqa", "planner", "coder"),
+                  **kwargs: Any) -> Config:
+    """`roles`를 LocalLMM(CPU, network 없음)으로 바꾼 Config 사본. 같은 설정의 role끼리 model 하나를 공유한다."""
+    update: dict = {}
+    for role in roles:
+        if role not in ("vqa", "planner", "coder"):
+            raise ValueError(f"Unknown LMM role: {role}")
+        update[role] = LocalLMM
+        update[f"{role}_kwargs"] = {"model_name": model_name, **kwargs}
+    new = cfg.model_copy(update=update)
+    new._clients = {}  # 원본에서 만든 client를 넘겨받지 않도록
+    return new
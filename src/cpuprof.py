@@ -0,0 +1,224 @@
+# src/vision_agent/cpuprof.py
+"""
+Opt-in CPU sampling profiler per pipeline stage (flamegraph output).
+
+    from src import cpuprof
+    with cpuprof.profiling() as prof:
+        run_agent(...)
+    print(prof.report_text())
+    prof.to_speedscope("run.speedscope.json")   # https://www.speedscope.app
+    prof.to_collapsed("run.collapsed")          # flamegraph.pl / inferno
+
+별도 thread가 `interval_s`마다 모든 thread의 stack을 읽는다 (sys._current_frames).
+각 sample의 weight는 그 thread가 지난 sample 이후 실제로 쓴 CPU 시간(pthread CPU clock)이라
+LLM 응답/HTTP를 기다리며 block된 thread는 자연히 0이 되어 집계에서 빠진다.
+CPU clock을 못 읽는 플랫폼에서는 leaf frame이 socket/ssl/select/lock 대기인 sample을 버리고 wall 간격으로 센다.
+
+stage는 trace.stage() hook으로 구분한다. stage를 연 thread는 자기 stage로, 그 밖의 thread(tool worker 등)는
+가장 안쪽에 열린 stage로 집계한다. 어떤 stage에도 속하지 않은 sample은 "(other)".
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from src import trace
+
+OTHER = "(other)"
+
+# CPU clock이 없을 때 block된 것으로 보는 leaf (module 파일명, 함수명)
+_BLOCKING_LEAVES = {
+    ("socket.py", "readinto"), ("socket.py", "recv_into"), ("socket.py", "create_connection"),
+    ("ssl.py", "read"), ("ssl.py", "recv_into"), ("ssl.py", "do_handshake"),
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("subprocess.py", "_communicate"), ("time", "sleep"),
+}
+
+Frame = Tuple[str, str, int]  # (qualname, filename, firstlineno)
+
+
+def _thread_cpu_s(ident: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def _stack(frame) -> List[Frame]:
+    out = []
+    while frame is not None:
+        code = frame.f_code
+        out.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+
+def _blocked(stack: List[Frame]) -> bool:
+    name, filename, _ = stack[-1]
+    return (os.path.basename(filename), name.rsplit(".", 1)[-1]) in _BLOCKING_LEAVES
+
+
+def frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class CpuProfiler:
+    def __init__(self, interval_s: float = 0.005, max_depth: int = 128):
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        # stage → (stack tuple → CPU seconds)
+        self.samples: Dict[str, Counter] = defaultdict(Counter)
+        self.sample_count = 0
+        self.wall_s = 0.0
+        self._stages: Dict[int, List[str]] = {}
+        self._open: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._cpu_last: Dict[int, float] = {}
+        self._t0 = 0.0
+
+    # ---- lifecycle ----
+    def start(self) -> "CpuProfiler":
+        self._stop.clear()
+        self._t0 = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="cpuprof-sampler", daemon=True)
+        self._sampler.start()
+        trace.add_stage_hook(self.stage)
+        return self
+
+    def stop(self) -> None:
+        trace.remove_stage_hook(self.stage)
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        self.wall_s = time.perf_counter() - self._t0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        ident = threading.get_ident()
+        with self._lock:
+            self._stages.setdefault(ident, []).append(name)
+            self._open.append(name)
+        try:
+            yield
+        finally:
+            with self._lock:
+                stack = self._stages[ident]
+                stack.pop()
+                if not stack:
+                    del self._stages[ident]
+                self._open.remove(name)
+
+    # ---- sampling ----
+    def _run(self) -> None:
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            self._sample(me, now - last)
+            last = now
+
+    def _sample(self, me: int, wall_dt: float) -> None:
+        frames = sys._current_frames()
+        with self._lock:
+            stages = {ident: s[-1] for ident, s in self._stages.items()}
+            fallback = self._open[-1] if self._open else OTHER
+        for ident, frame in frames.items():
+            if ident == me:
+                continue
+            cpu = _thread_cpu_s(ident)
+            if cpu is not None:
+                prev = self._cpu_last.get(ident)
+                self._cpu_last[ident] = cpu
+                weight = cpu - prev if prev is not None else 0.0
+                if weight <= 0:
+                    continue
+            else:
+                weight = wall_dt
+            stack = _stack(frame)[-self.max_depth:]
+            if not stack or (cpu is None and _blocked(stack)):
+                continue
+            self.samples[stages.get(ident, fallback)][tuple(stack)] += weight
+            self.sample_count += 1
+        self._cpu_last = {i: t for i, t in self._cpu_last.items() if i in frames}
+
+    # ---- report ----
+    def stage_totals(self) -> Dict[str, float]:
+        return {name: sum(c.values()) for name, c in self.samples.items()}
+
+    def top_functions(self, stage: str, n: int = 10) -> List[Tuple[str, float]]:
+        """Self CPU seconds by leaf frame."""
+        self_s: Counter = Counter()
+        for stack, s in self.samples.get(stage, Counter()).items():
+            self_s[frame_label(stack[-1])] += s
+        return self_s.most_common(n)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "wall_s": round(self.wall_s, 3),
+            "samples": self.sample_count,
+            "stages": {name: {"cpu_s": round(total, 4),
+                              "top": [{"frame": f, "self_s": round(s, 4)} for f, s in self.top_functions(name)]}
+                       for name, total in self.stage_totals().items()},
+        }
+
+    def report_text(self, n: int = 8) -> str:
+        totals = self.stage_totals()
+        lines = [f"wall {self.wall_s:.2f}s, CPU sampled {sum(totals.values()):.2f}s ({self.sample_count} samples)"]
+        for name, total in sorted(totals.items(), key=lambda kv: -kv[1]):
+            lines.append(f"\n[{name}] {total * 1e3:.1f} ms CPU")
+            lines += [f"  {s * 1e3:8.1f} ms  {f}" for f, s in self.top_functions(name, n)]
+        return "\n".join(lines)
+
+    def to_collapsed(self, path: Union[str, Path]) -> Path:
+        """Brendan Gregg collapsed stacks; stage is the root frame, values are CPU microseconds."""
+        path = Path(path)
+        lines = []
+        for name, counter in self.samples.items():
+            for stack, s in counter.items():
+                frames = ";".join(frame_label(f).replace(";", ":") for f in stack)
+                lines.append(f"{name};{frames} {max(1, round(s * 1e6))}")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
+    def to_speedscope(self, path: Union[str, Path]) -> Path:
+        """speedscope file with one sampled profile per stage (unit: seconds of CPU)."""
+        path = Path(path)
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        profiles = []
+        for name, counter in sorted(self.samples.items(), key=lambda kv: -sum(kv[1].values())):
+            samples, weights = [], []
+            for stack, s in counter.items():
+                ids = []
+                for f in stack:
+                    if f not in index:
+                        index[f] = len(frames)
+                        frames.append({"name": f[0], "file": f[1], "line": f[2]})
+                    ids.append(index[f])
+                samples.append(ids)
+                weights.append(s)
+            profiles.append({"type": "sampled", "name": name, "unit": "seconds", "startValue": 0,
+                             "endValue": sum(weights), "samples": samples, "weights": weights})
+        doc = {"$schema": "https://www.speedscope.app/file-format-schema.json",
+               "shared": {"frames": frames}, "profiles": profiles, "activeProfileIndex": 0,
+               "name": "vision_agent", "exporter": "src.cpuprof"}
+        path.write_text(json.dumps(doc), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def profiling(**kwargs: Any) -> Iterator[CpuProfiler]:
+    prof = CpuProfiler(**kwargs).start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
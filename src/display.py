@@ -1,4 +1,8 @@
-from typing import List, Dict, Any
+import json
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
 
 def format_code_plan_display(
     code_plan: List[Dict[str, Any]],
@@ -124,4 +128,168 @@ def print_code_plan(
             table.add_row(instruction)
 
     # 출력
-    console.print(table)
\ No newline at end of file
+    console.print(table)
+
+# ---------------------------------------------------------------------------
+# live display (streaming planner 응답)
+# ---------------------------------------------------------------------------
+
+_TEXT_TAGS = {"code_plan": "final_answer", "tool_calls": "analysis_log"}
+
+
+def _partial_tag(text: str, tag: str) -> str:
+    """Content of <tag> so far (닫는 태그가 아직 안 왔으면 끝까지)."""
+    m = re.search(rf"<{tag}>(.*?)(</{tag}>|\Z)", text, re.DOTALL | re.IGNORECASE)
+    if not m:
+        return ""
+    content = m.group(1)
+    if not m.group(2):
+        # chunk가 닫는 태그 중간에서 끝났으면 그 조각은 아직 내용으로 보지 않는다
+        close = f"</{tag}>"
+        for k in range(min(len(close) - 1, len(content)), 0, -1):
+            if content[-k:].lower() == close[:k]:
+                content = content[:-k]
+                break
+    return content.strip()
+
+
+def _step_lines(step: Dict[str, Any], separator_token: str = "---") -> List[str]:
+    if "tool" in step:
+        params = ", ".join(str(k) for k in (step.get("parameters") or {}))
+        line = f"{step['tool']}({params})"
+        if step.get("expected_result"):
+            line += f" → {step['expected_result']}"
+        return [line]
+    inst = str(step.get("instruction", "")).strip()
+    return [p.strip() for p in inst.split(separator_token) if p.strip()]
+
+
+class LivePlanDisplay:
+    """
+    Planner 응답 stream을 받으면서 plan step과 analysis log(또는 final answer)를 점진적으로 그린다.
+
+        with LivePlanDisplay(kind="code_plan") as live:
+            raw = "".join(live.tee(chunks))
+
+    - TTY: rich Live로 다시 그리되 `refresh_per_second`를 넘지 않는다 (step이 완성될 때만 즉시).
+    - TTY가 아니면(파이프, 로그 수집) 한 줄에 하나씩 JSON event를 쓴다:
+        {"event": "start", "kind": ...}
+        {"event": "text", "section": "analysis_log", "delta": "..."}   (같은 refresh 간격으로 묶음)
+        {"event": "step", "index": 0, "step": {...}}
+        {"event": "end", "steps": N, "elapsed_ms": ...}
+    """
+
+    def __init__(self, kind: str = "code_plan", title: str = "Plan", width: int = 100,
+                 refresh_per_second: float = 8.0, file: Optional[TextIO] = None, ndjson: Optional[bool] = None,
+                 log_lines: int = 12):
+        from src.streamjson import CodePlanStream, ToolCallStream
+
+        self.kind = kind
+        self.title = title
+        self.width = width
+        self.interval_s = 1.0 / refresh_per_second if refresh_per_second > 0 else 0.0
+        self.file = file or sys.stdout
+        self.ndjson = (not self.file.isatty()) if ndjson is None else ndjson
+        self.log_lines = log_lines
+        self.steps: List[Dict[str, Any]] = []
+        self._text_tag = _TEXT_TAGS.get(kind, "analysis_log")
+        self._stream = CodePlanStream() if kind == "code_plan" else ToolCallStream()
+        self._text_sent = 0
+        self._last = 0.0
+        self._t0 = 0.0
+        self._live = None
+        self._final = False
+
+    # ---- lifecycle ----
+    def __enter__(self) -> "LivePlanDisplay":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def start(self) -> "LivePlanDisplay":
+        self._t0 = time.monotonic()
+        if self.ndjson:
+            self._emit({"event": "start", "kind": self.kind})
+        else:
+            from rich.console import Console
+            from rich.live import Live
+
+            console = Console(file=self.file, width=self.width)
+            self._live = Live(console=console, auto_refresh=False, vertical_overflow="visible")
+            self._live.start()
+        return self
+
+    def close(self) -> None:
+        self._final = True
+        self._flush()
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+        elif self.ndjson:
+            self._emit({"event": "end", "steps": len(self.steps),
+                        "elapsed_ms": round((time.monotonic() - self._t0) * 1e3, 1)})
+
+    # ---- input ----
+    @property
+    def text(self) -> str:
+        return self._stream.text
+
+    def feed(self, chunk: Optional[str]) -> None:
+        new = self._stream.feed(chunk)
+        for step in new:
+            self.steps.append(step)
+            if self.ndjson:
+                self._emit({"event": "step", "index": len(self.steps) - 1, "step": step})
+        if new or time.monotonic() - self._last >= self.interval_s:
+            self._flush()
+
+    def tee(self, chunks: Iterable[Optional[str]]) -> Iterator[str]:
+        """Pass chunks through unchanged while feeding the display."""
+        for chunk in chunks:
+            self.feed(chunk)
+            if chunk:
+                yield chunk
+
+    def set_steps(self, steps: List[Dict[str, Any]]) -> None:
+        """Replace streamed steps with the final parsed (repaired) plan."""
+        if self.ndjson:
+            for i, step in enumerate(steps[len(self.steps):], start=len(self.steps)):
+                self._emit({"event": "step", "index": i, "step": step})
+        self.steps = list(steps)
+        self._final = True
+        self._flush()
+
+    # ---- output ----
+    def _flush(self) -> None:
+        self._last = time.monotonic()
+        if self.ndjson:
+            text = _partial_tag(self.text, self._text_tag)
+            if len(text) > self._text_sent:
+                self._emit({"event": "text", "section": self._text_tag, "delta": text[self._text_sent:]})
+                self._text_sent = len(text)
+        elif self._live is not None:
+            self._live.update(self._renderable(), refresh=True)
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        self.file.flush()
+
+    def _renderable(self):
+        from rich import box
+        from rich.console import Group
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
+
+        text = _partial_tag(self.text, self._text_tag)
+        tail = "\n".join(text.splitlines()[-self.log_lines:]) if text else "…"
+        table = Table(title=self.title, title_style="bold cyan", box=box.SQUARE, show_header=True,
+                      header_style="bold magenta", padding=(0, 1), width=self.width, collapse_padding=True)
+        table.add_column("Instructions", style="cyan", overflow="fold", no_wrap=False)
+        for step in self.steps:
+            for line in _step_lines(step):
+                table.add_row(line)
+        if not (self._final or self._stream.done):
+            table.add_row(Text("…", style="dim"))
+        return Group(Panel(Text(tail), title=self._text_tag, width=self.width), table)
@@ -1,8 +1,23 @@
-from typing import Any, Dict
-from src.media import b64_to_np
+import copy
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import numpy as np
+from pathlib import Path
+from src.media import publish_source, source_to_np
 from src.pipeline import AgentState 
+from src import boxes as bx
+from src.masks import SEGMENTATION_TOOLS, compact_segmentation_result
+from src import trace
+from src import pipeline as _pipeline
+from src.singleflight import SingleFlight, make_key, text_digest, tool_call_key
+from src.streamjson import ToolCallStream
+from src import shm
 
-def run_tool_call(tool_call: dict, tool_registry: dict):
+# 동시에 실행 중인 동일 tool call 공유 (process 전역)
+_TOOL_FLIGHT = SingleFlight()
+
+def run_tool_call(tool_call: dict, tool_registry: dict, verbose: bool = False):
     """
     Execute a single tool call safely.
 
@@ -33,8 +48,12 @@ def run_tool_call(tool_call: dict, tool_registry: dict):
     fn = tool_registry[tool_name]
 
     # 2) 실행 + 예외 처리
+    if verbose:
+        print(f"[tool] {tool_name}({', '.join(params)})")
     try:
-        result = fn(**params)
+        with trace.span("run_tool_call", tool=tool_name) as sp:
+            result = fn(**params)
+            sp.set("ok", True)
         return {
             "tool": tool_name,
             "ok": True,
@@ -49,6 +68,26 @@ def run_tool_call(tool_call: dict, tool_registry: dict):
             "error": repr(e),
         }
 
+def _run_tool_worker(tool_name: str, fn, params: Dict[str, Any]) -> dict:
+    """Process-pool entry: SharedImage handle을 view로 풀어서 실행."""
+    return run_tool_call({"tool": tool_name, "parameters": shm.resolve(params)}, {tool_name: fn})
+
+
+def _run_tool_in_pool(pool: Executor, tc: dict, tool_registry: dict, verbose: bool) -> dict:
+    tool_name = tc.get("tool")
+    if tool_name not in tool_registry:
+        return run_tool_call(tc, tool_registry, verbose=verbose)
+    if verbose:
+        print(f"[tool:pool] {tool_name}({', '.join(tc.get('parameters', {}))})")
+    with trace.span("run_tool_call", tool=tool_name, pool=True) as sp:
+        try:
+            result = pool.submit(_run_tool_worker, tool_name, tool_registry[tool_name], tc.get("parameters", {})).result()
+        except Exception as e:
+            # pickle 불가능한 tool/결과 등
+            result = {"tool": tool_name, "ok": False, "result": None, "error": repr(e)}
+        sp.set("ok", result["ok"])
+    return result
+
 def validate_plan(plan: dict, tools_meta: list[dict]) -> None:
     names = {t["name"] for t in tools_meta}
     mode = plan.get("mode")
@@ -60,22 +99,151 @@ def validate_plan(plan: dict, tools_meta: list[dict]) -> None:
             if tc.get("tool") not in names:
                 raise ValueError(f"Unknown tool in plan: {tc.get('tool')}")
 
+def _normalize_crop_detections(params: Dict[str, Any], image: np.ndarray) -> None:
+    """
+    detected_image_crop 입력 bbox를 한 번에 xyxy_norm으로 변환 + clip.
+    LLM이 준 bbox_format(없거나 "auto"면 값 범위로 추정)을 기준으로 한다.
+    """
+    raw = params.get("detections_json")
+    try:
+        dets = json.loads(raw) if isinstance(raw, str) else raw
+    except json.JSONDecodeError:
+        # 깨진 JSON은 그대로 tool에 넘겨서 tool이 오류를 보고하게 한다
+        return
+    if not isinstance(dets, list):
+        return
+
+    idx = [i for i, d in enumerate(dets)
+           if isinstance(d, dict) and isinstance(d.get("bbox"), (list, tuple)) and len(d["bbox"]) == 4]
+    if idx:
+        arr = bx.as_boxes([dets[i]["bbox"] for i in idx])
+        src = params.get("bbox_format") or "auto"
+        if src == "auto":
+            src = bx.infer_format(arr)
+        try:
+            norm = bx.clip(bx.convert(arr, src, "xyxy_norm", image.shape[:2]))
+        except ValueError:
+            # 알 수 없는 포맷이면 tool 쪽 검증에 맡긴다
+            return
+        for i, box in zip(idx, norm.tolist()):
+            dets[i]["bbox"] = box
+
+    params["detections_json"] = json.dumps(dets) if isinstance(raw, str) else dets
+
+
 def execute_plan(
     state: AgentState,
     plan_json: Dict[str, Any],
     verbose: bool = False,
+    coalesce: Optional[bool] = None,
+    pool: Optional[Executor] = None,
 ) -> AgentState:
+    """
+    coalesce=True면 다른 session에서 동시에 실행 중인 동일한 tool call(같은 이미지 + 같은 parameters)의
+    결과를 공유한다 (src.singleflight). None이면 Config.coalesce_calls를 따른다 (기본 꺼짐).
+    공유된 결과는 session마다 deep copy해서 넘긴다.
+    pool(ProcessPoolExecutor)이 주어지면 tool을 worker process에서 실행한다. 이미지는 plan당
+    한 번만 shared memory에 올리고 worker에는 SharedImage handle만 보낸다 (src.shm).
+    """
     tool_calls = plan_json.get("tool_calls", []) or []
 
-    for tc in tool_calls:
-        params = tc.get("parameters", {}) or {}
+    with trace.stage("execute_plan", n_calls=len(tool_calls)):
+        _execute_tool_calls(state, tool_calls, verbose, coalesce, pool)
+    return state
+
+
+def execute_plan_streaming(
+    state: AgentState,
+    chunks: Iterable[Optional[str]],
+    parse_plan: Callable[[str], Dict[str, Any]],
+    verbose: bool = False,
+    coalesce: Optional[bool] = None,
+    pool: Optional[Executor] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Planner 응답 stream을 소비하면서 tool_calls 원소가 완성될 때마다 바로 실행한다.
+    tool은 worker thread 하나에서 plan 순서대로 실행되고 (observations 순서 유지),
+    그 동안 main thread는 계속 stream을 읽는다.
+
+    stream이 끝나면 전체 텍스트를 `parse_plan`으로 파싱(repair/fix 호출 포함)하고, 이미 실행한 call을
+    최종 plan과 순서대로 (tool, parameters) 비교한다. 처음 달라지는 위치부터는 최종 plan의 call을 다시 실행하고,
+    그 뒤에 stream으로 실행했던 결과는 observations에서 빼고 all_execs에 `superseded: True`로 남긴다.
+    최종 plan이 tool_calls mode가 아니거나 파싱/검증에 실패하면 stream으로 실행한 결과 전부가 그렇게 된다.
+    Returns (raw_text, plan_json).
+    """
+    stream = ToolCallStream()
+    pending = []
+    streamed = []  # 실행 전에 떠 둔 (tool, parameters) signature: 실행 중에 parameters가 바뀐다
+    n_before = len(state.observations)
+    with trace.stage("execute_plan.streaming") as sp, \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-pipeline") as worker:
+        for chunk in chunks:
+            for tc in stream.feed(chunk):
+                streamed.append(_call_signature(tc))
+                pending.append(worker.submit(_execute_tool_calls, state, [tc], verbose, coalesce, pool))
+        sp.set("n_streamed", len(pending))
+        # 먼저 실행된 tool의 예외는 여기서 전파
+        for fut in pending:
+            fut.result()
 
-        # placeholder 치환 (LLM이 "image"라고 써둔 경우)
-        if params.get("image") == "image":
-            params["image"] = b64_to_np(state.img_b64)
+        raw = stream.text
+        try:
+            plan_json = parse_plan(raw)
+        except Exception:
+            _supersede(state, n_before, len(streamed))
+            raise
+        final = (plan_json.get("tool_calls", []) or []) if plan_json.get("mode") == "tool_calls" else []
+        keep = 0
+        while keep < min(len(streamed), len(final)) and streamed[keep] == _call_signature(final[keep]):
+            keep += 1
+        _supersede(state, n_before + keep, len(streamed) - keep)
+        rest = final[keep:]
+        if rest:
+            _execute_tool_calls(state, rest, verbose, coalesce, pool)
+        sp.set("n_reused", keep)
+        sp.set("n_calls", len(pending) + len(rest))
+    return raw, plan_json
 
-        if params.get("images") == ["image"]:
-            params["images"] = [b64_to_np(state.img_b64)]
+
+def _call_signature(tc: Any) -> str:
+    if not isinstance(tc, dict):
+        return repr(tc)
+    return json.dumps([tc.get("tool"), tc.get("parameters") or {}], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _supersede(state: AgentState, start: int, count: int) -> None:
+    """observations[start:start+count] (stream으로 실행한 결과)를 빼고 all_execs 쪽 기록에 표시."""
+    if count <= 0:
+        return
+    for ex in state.observations[start:start + count]:
+        ex["superseded"] = True
+    del state.observations[start:start + count]
+
+
+def _image_digest(state: AgentState) -> Optional[str]:
+    if state.img_path:
+        return make_key(Path(state.img_path))
+    return text_digest(state.img_b64)
+
+
+def _execute_tool_calls(state: AgentState, tool_calls: list, verbose: bool, coalesce: Optional[bool],
+                        pool: Optional[Executor] = None) -> None:
+    if coalesce is None:
+        coalesce = _pipeline.cfg.coalesce_calls
+    image_digest = _image_digest(state) if coalesce or pool is not None else None
+    leases: list = []  # 이 batch 동안 잡고 있는 shared image (끝나면 release)
+    try:
+        _run_tool_calls(state, tool_calls, verbose, coalesce, pool, image_digest, leases)
+    finally:
+        store = shm.default_store()
+        for handle in leases:
+            store.release(handle)
+
+
+def _run_tool_calls(state: AgentState, tool_calls: list, verbose: bool, coalesce: bool,
+                    pool: Optional[Executor], image_digest: Optional[str], leases: list) -> None:
+    for tc in tool_calls:
+        params = tc.get("parameters", {}) or {}
 
         # agentic_object_detection 전용 prompt 정리 (추가)
         tool_name = tc.get("tool")
@@ -89,17 +257,51 @@ def execute_plan(
                 # 공백 정리
                 params["prompt"] = prompt.strip()
 
-        # detected_image_crop 전용 보정
-        if tool_name == "detected_image_crop":
-            params["image_np"] = b64_to_np(state.img_b64)
-            params["bbox_format"] = "xyxy_norm"
-            if "full_image_path" in params:
-                params["full_image_path"] = None
-
-        tc["parameters"] = params
-
-        exec_result = run_tool_call(tc, state.tool_registry, verbose=verbose)
+        # 이미지 decode 전에 key를 만들어서, follower는 decode도 하지 않는다
+        key = tool_call_key(tool_name, params, image_digest) if coalesce else None
+        exec_result = _TOOL_FLIGHT.do(key, _prepare_and_run, state, tc, params, verbose,
+                                      pool, image_digest, leases)
+        # 공유된 결과는 다른 session과 같은 객체이므로 session마다 독립된 사본을 쓴다
+        exec_result = copy.deepcopy(exec_result) if key is not None else dict(exec_result)
         state.all_execs.append(exec_result)
         state.observations.append(exec_result)
 
-    return state
\ No newline at end of file
+
+def _prepare_and_run(state: AgentState, tc: dict, params: Dict[str, Any], verbose: bool,
+                     pool: Optional[Executor] = None, image_digest: Optional[str] = None,
+                     leases: Optional[list] = None) -> dict:
+    tool_name = tc.get("tool")
+
+    def source_image():
+        # tool 입력은 원본 해상도로 decode. pool이면 shared memory handle (plan당 한 번 decode)
+        if pool is None:
+            return source_to_np(state.img_b64, state.img_path)
+        handle = publish_source(shm.default_store(), image_digest, state.img_b64, state.img_path)
+        leases.append(handle)
+        return handle
+
+    # placeholder 치환 (LLM이 "image"라고 써둔 경우)
+    if params.get("image") == "image":
+        params["image"] = source_image()
+
+    if params.get("images") == ["image"]:
+        params["images"] = [source_image()]
+
+    # detected_image_crop 전용 보정
+    if tool_name == "detected_image_crop":
+        params["image_np"] = source_image()
+        _normalize_crop_detections(params, params["image_np"])
+        params["bbox_format"] = "xyxy_norm"
+        if "full_image_path" in params:
+            params["full_image_path"] = None
+
+    tc["parameters"] = params
+
+    if pool is None:
+        exec_result = run_tool_call(tc, state.tool_registry, verbose=verbose)
+    else:
+        exec_result = _run_tool_in_pool(pool, tc, state.tool_registry, verbose)
+    # segmentation mask는 RLE로 압축해서 보관 (접근할 때만 decode)
+    if tool_name in SEGMENTATION_TOOLS and exec_result["ok"]:
+        exec_result["result"] = compact_segmentation_result(exec_result["result"])
+    return exec_result
@@ -0,0 +1,207 @@
+# src/vision_agent/jsonrepair.py
+"""
+LLM이 낸 JSON의 흔한 결함을 로컬에서 고쳐서 파싱한다.
+
+고치는 것:
+  - ```json 코드펜스, JSON 앞뒤의 설명 텍스트
+  - // 및 /* */ 주석, trailing comma
+  - Python literal (True/False/None), 스마트 따옴표
+  - 잘린 응답: 열린 문자열/배열/객체를 닫고, 끝에 매달린 key/comma는 버림
+
+그래도 안 되면 parse_with_fallback이 짧은 "JSON 고쳐줘" 호출을 한 번 한다.
+"""
+import json
+import re
+from typing import Any, Callable, List, Optional
+
+from src.prompt import PROMPT_FIX_JSON_TEMPLATE
+
+
+class PlanParseError(ValueError):
+    pass
+
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _strip_outer(text: str) -> str:
+    text = _FENCE_RE.sub("", text.strip()).strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+    # 마지막 닫는 괄호 뒤의 설명 텍스트 제거 (잘린 응답이면 그대로 둔다)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if end >= 0 and text[end + 1:].strip() and not re.search(r"[\[{,:\"]", text[end + 1:]):
+        text = text[:end + 1]
+    return text
+
+
+def _scan(text: str) -> str:
+    """Single pass outside strings: drop comments, map literals, fix trailing commas, close truncation."""
+    out: List[str] = []
+    stack: List[str] = []
+    i, n = 0, len(text)
+    in_str = False
+    while i < n:
+        c = text[i]
+        if in_str:
+            out.append(c)
+            if c == "\\" and i + 1 < n:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if c == '"':
+                in_str = False
+            elif c == "\n":
+                # 문자열 안의 raw newline
+                out[-1] = "\\n"
+            i += 1
+            continue
+
+        if c == '"':
+            in_str = True
+            out.append(c)
+        elif text.startswith("//", i):
+            j = text.find("\n", i)
+            i = n if j < 0 else j
+            continue
+        elif text.startswith("/*", i):
+            j = text.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+            continue
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if stack and stack[-1] == c:
+                stack.pop()
+                out.append(c)
+            # 짝이 안 맞는 닫는 괄호는 버림
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    # ---- truncated input ----
+    if in_str:
+        if out and out[-1] == "\\":
+            out.pop()
+        out.append('"')
+    if stack:
+        _drop_dangling(out)
+        while stack:
+            _drop_trailing_comma(out)
+            out.append(stack.pop())
+    return "".join(out)
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j:]
+
+
+def _drop_dangling(out: List[str]) -> None:
+    """잘린 끝부분 정리: 미완성 숫자/literal, 값 없는 `"key":`, 객체 안의 `"key"`."""
+    s = "".join(out).rstrip()
+    s = re.sub(r"(\d)[.eE+-]+$", r"\1", s)                                       # 1.  1e
+    s = re.sub(r"([\[{,:])\s*(?:-|t|tr|tru|f|fa|fal|fals|n|nu|nul)$", r"\1", s)  # 미완성 literal
+    s = re.sub(r',?\s*"(?:[^"\\]|\\.)*"\s*:$', "", s)                              # "key":
+    if re.search(r"\{[^{}\[\]]*$", s):                                               # {"key"
+        s = re.sub(r',?\s*"(?:[^"\\]|\\.)*"$', "", s) if re.search(r'[{,]\s*"(?:[^"\\]|\\.)*"$', s) else s
+    out[:] = list(s)
+
+
+def repair_json(text: str) -> str:
+    return _scan(_strip_outer(text).translate(_SMART_QUOTES))
+
+
+def loads_tolerant(text: str) -> Any:
+    """json.loads, falling back to local repair. Raises PlanParseError if both fail."""
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    repaired = repair_json(text or "")
+    try:
+        return json.loads(repaired)
+    except json.JSONDecodeError as e:
+        raise PlanParseError(f"Unrepairable JSON: {e}") from e
+
+
+# ---------------------------------------------------------------------------
+# schema checks (PROMPT_PLAN_TEMPLATE / PROMPT_FINAL_PLAN_TEMPLATE)
+# ---------------------------------------------------------------------------
+
+def check_plan_json(plan: Any) -> None:
+    if not isinstance(plan, dict):
+        raise PlanParseError("plan_json must be an object")
+    mode = plan.get("mode")
+    if mode not in ("tool_calls", "final"):
+        raise PlanParseError(f"Invalid mode: {mode}")
+    if mode == "final":
+        if not isinstance(plan.get("final_answer"), str):
+            raise PlanParseError("final mode requires a string final_answer")
+        return
+    calls = plan.get("tool_calls")
+    if not isinstance(calls, list):
+        raise PlanParseError("tool_calls must be a list")
+    for tc in calls:
+        if not isinstance(tc, dict) or not isinstance(tc.get("tool"), str):
+            raise PlanParseError(f"Invalid tool call: {tc!r}")
+        if not isinstance(tc.get("parameters", {}), dict):
+            raise PlanParseError(f"parameters must be an object: {tc!r}")
+
+
+def check_code_plan(code_plan: Any) -> None:
+    if not isinstance(code_plan, list):
+        raise PlanParseError("code_plan must be a JSON array")
+    for step in code_plan:
+        if not isinstance(step, dict) or not isinstance(step.get("instruction"), str):
+            raise PlanParseError(f"Invalid code_plan step: {step!r}")
+
+
+PLAN_SCHEMA_HINT = (
+    '{"language": "ko", "mode": "tool_calls", "selected_tools": [string], '
+    '"tool_calls": [{"id": int, "tool": string, "parameters": object, "expected_result": string}], '
+    '"open_questions": [string]}  OR  {"language": "ko", "mode": "final", "final_answer": string, "open_questions": [string]}'
+)
+CODE_PLAN_SCHEMA_HINT = '[{"step": int, "instruction": string, "code_snippet": string, "explanation": string}]'
+
+
+def parse_with_fallback(
+    text: str,
+    check: Callable[[Any], None],
+    llm: Optional[Any] = None,
+    schema_hint: str = "",
+) -> Any:
+    """
+    Parse (with local repair) and validate. Only if that fails and `llm` is given,
+    ask it once with a short fix-this-JSON prompt and parse/validate the answer.
+    """
+    try:
+        obj = loads_tolerant(text)
+        check(obj)
+        return obj
+    except ValueError as e:
+        if llm is None:
+            raise
+        error = str(e)
+
+    fixed = llm.generate(PROMPT_FIX_JSON_TEMPLATE.format(schema=schema_hint, error=error, text=text))
+    obj = loads_tolerant(fixed)
+    check(obj)
+    return obj
@@ -1,5 +1,8 @@
 # src/vision_agent/lmm.py
 from __future__ import annotations
+import copy
+import string
+import threading
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Any, Iterator, Optional, Sequence, Union, TypedDict, cast
@@ -7,7 +10,11 @@ from openai import OpenAI
 import anthropic
 from anthropic.types import ImageBlockParam, MessageParam, TextBlockParam
 
-from src.media import encode_media  # 새 유틸
+from src.media import encode_media, load_pil  # 새 유틸
+from src.prompt import PROMPT_PLAN_TEMPLATE
+from src.video import expand_media
+from src import trace
+from src.batching import DynamicBatcher
 
 class Message(TypedDict, total=False):
     role: str
@@ -42,20 +49,38 @@ class OpenAILMM(LMM):
             chat[0]["media"] = media
         return self.chat(chat, **kwargs)
 
-    def chat(self, chat, **kwargs: Any):
+    def _request(self, chat, sp, kwargs: dict) -> dict:
         fixed = []
         for msg in chat:
             content = [{"type": "text", "text": msg["content"]}]
+            sp.add("bytes_uploaded", len(msg["content"].encode("utf-8")))
             if msg.get("media") and self.model_name != "o3-mini":
-                for m in msg["media"]:
+                for m in expand_media(msg["media"], max_video_frames=kwargs.get("max_video_frames", 8)):
                     encoded = encode_media(cast(str, m), resize=kwargs.get("resize", self.image_size))
+                    sp.add("bytes_uploaded", len(encoded))
                     content.append({"type": "image_base64", "image_base64": encoded, "detail": kwargs.get("image_detail", self.image_detail)})
             fixed.append({"role": msg["role"], "content": content})
         tmp = self.kwargs | kwargs
-        resp = self.client.chat.completions.create(model=self.model_name, messages=fixed, **tmp)
-        if tmp.get("stream"):
-            return (chunk.choices[0].delta.content for chunk in resp)
-        return resp.choices[0].message.content
+        tmp.pop("max_video_frames", None)
+        return {"model": self.model_name, "messages": fixed, **tmp}
+
+    def batch_request(self, chat, **kwargs: Any) -> dict:
+        """chat()이 보낼 것과 같은 request body (batch API용)."""
+        return self._request(chat, trace.NOOP_SPAN, kwargs)
+
+    def chat(self, chat, **kwargs: Any):
+        with trace.span("llm.chat", provider="openai", model=self.model_name) as sp:
+            req = self._request(chat, sp, kwargs)
+            resp = self.client.chat.completions.create(**req)
+            if req.get("stream"):
+                return (chunk.choices[0].delta.content for chunk in resp)
+            usage = getattr(resp, "usage", None)
+            if usage is not None:
+                sp.set("prompt_tokens", usage.prompt_tokens)
+                sp.set("response_tokens", usage.completion_tokens)
+                cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+                sp.set("cache_hit", cached > 0)
+            return resp.choices[0].message.content
 
 class AnthropicLMM(LMM):
     def __init__(self, api_key=None, model_name="claude-sonnet-4-5-20250929", max_tokens=4096, image_size=768, **kwargs: Any):
@@ -73,22 +98,298 @@ class AnthropicLMM(LMM):
         return self.chat(chat, **kwargs)
 
     def chat(self, chat, **kwargs: Any):
+        with trace.span("llm.chat", provider="anthropic", model=self.model_name) as sp:
+            return self._chat(chat, sp, **kwargs)
+
+    def _request(self, chat, sp, kwargs: dict) -> dict:
         tmp = self.kwargs | kwargs
-        thinking_enabled = tmp.get("thinking", {}).get("type") == "enabled"
-        if thinking_enabled:
+        tmp.pop("max_video_frames", None)
+        if tmp.get("thinking", {}).get("type") == "enabled":
             tmp["temperature"] = 1.0
 
         msgs: list[MessageParam] = []
         for msg in chat:
             content: list[TextBlockParam | ImageBlockParam] = [TextBlockParam(type="text", text=cast(str, msg["content"]))]
-            for m in msg.get("media", []) or []:
+            sp.add("bytes_uploaded", len(cast(str, msg["content"]).encode("utf-8")))
+            for m in expand_media(msg.get("media", []) or [], max_video_frames=kwargs.get("max_video_frames", 8)):
                 encoded = encode_media(cast(str, m), resize=kwargs.get("resize", self.image_size))
+                sp.add("bytes_uploaded", len(encoded))
                 content.append(ImageBlockParam(type="image", source={"type": "base64", "media_type": "image/png", "data": encoded}))
             msgs.append({"role": msg["role"], "content": content})
+        return {"model": self.model_name, "messages": msgs, **tmp}
 
-        resp = self.client.messages.create(model=self.model_name, messages=msgs, **tmp)
+    def batch_request(self, chat, **kwargs: Any) -> dict:
+        """chat()이 보낼 것과 같은 request params (Message Batches API용)."""
+        return self._request(chat, trace.NOOP_SPAN, kwargs)
+
+    def _chat(self, chat, sp, **kwargs: Any):
+        req = self._request(chat, sp, kwargs)
+        thinking_enabled = req.get("thinking", {}).get("type") == "enabled"
+        if req.get("stream"):
+            resp = self.client.messages.create(**req)
+            return (event.delta.text for event in resp
+                    if event.type == "content_block_delta" and getattr(event.delta, "type", "") == "text_delta")
+        resp = self.client.messages.create(**req)
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            sp.set("prompt_tokens", usage.input_tokens)
+            sp.set("response_tokens", usage.output_tokens)
+            sp.set("cache_hit", bool(getattr(usage, "cache_read_input_tokens", 0)))
         if thinking_enabled:
             return "".join(block.text for block in resp.content if hasattr(block, "text"))
         return "".join(block.text for block in resp.content if hasattr(block, "text"))
 
-AnthropicLLMClient = AnthropicLMM
\ No newline at end of file
+AnthropicLLMClient = AnthropicLMM
+
+class _LocalRequest:
+    __slots__ = ("text", "images", "gen_kwargs")
+
+    def __init__(self, text: str, images: list, gen_kwargs: dict):
+        self.text = text
+        self.images = images
+        self.gen_kwargs = gen_kwargs
+
+
+def _static_prefix(template: str) -> str:
+    """Literal text before the first format field of a prompt template."""
+    # parse()는 "{{"/"}}" 이스케이프마다 literal을 끊어서 (field_name=None으로) 돌려주므로 첫 field까지 이어 붙인다
+    parts = []
+    for literal, field_name, _, _ in string.Formatter().parse(template):
+        parts.append(literal)
+        if field_name is not None:
+            break
+    return "".join(parts)
+
+
+class LocalLMM(LMM):
+    """
+    CPU에서 도는 로컬 Qwen-VL 계열 모델 (network 불필요).
+
+    - 동시에 호출된 generate/chat은 DynamicBatcher(src.batching)가 모아서 한 번의 batched generate로 처리
+    - 요청 text가 `prefix_templates`(기본: PROMPT_PLAN_TEMPLATE)의 공통 prefix로 시작하면 text를 image보다
+      앞에 두고, 그 prefix의 KV cache를 한 번만 계산해 두고 batch의 row마다 복사해서 재사용 (image 요청 포함).
+      batch 안에서는 padding을 prefix와 나머지 사이로 옮겨 모든 row의 prefix 위치를 맞추고,
+      M-RoPE position은 전체 sequence로 계산한다. `stats["prefix_hits"]`로 재사용 횟수를 볼 수 있다.
+    - torch/transformers는 첫 호출 때 import/로드
+    """
+
+    def __init__(
+        self,
+        model_name: str = "Qwen/Qwen2-VL-2B-Instruct",
+        max_new_tokens: int = 1024,
+        image_size: int = 768,
+        temperature: float = 0.0,
+        max_batch_size: int = 4,
+        max_wait_ms: float = 20.0,
+        num_threads: Optional[int] = None,
+        torch_dtype: str = "float32",
+        prefix_templates: Sequence[str] = (PROMPT_PLAN_TEMPLATE,),
+        **kwargs: Any,
+    ):
+        self.model_name = model_name
+        self.image_size = image_size
+        self.num_threads = num_threads
+        self.torch_dtype = torch_dtype
+        self.kwargs = {"max_new_tokens": max_new_tokens, "temperature": temperature} | kwargs
+        self.prefixes = [p for p in (_static_prefix(t) for t in prefix_templates) if p.strip()]
+        self._model = None
+        self._processor = None
+        self._load_lock = threading.Lock()
+        self._prefix_texts: list[str] = []
+        self._prefix_kv: dict = {}
+        self.stats = {"requests": 0, "prefix_hits": 0}
+        # generation 설정이 같은 요청끼리만 한 batch로 묶는다
+        self._batcher = DynamicBatcher(self._run_batch, max_batch_size, max_wait_ms / 1e3, name="local-lmm-batcher",
+                                       group_key=lambda req: tuple(sorted(req.gen_kwargs.items())))
+
+    # ---- LMM interface ----
+    def generate(self, prompt: str, media=None, **kwargs: Any):
+        chat = [{"role": "user", "content": prompt}]
+        if media:
+            chat[0]["media"] = media
+        return self.chat(chat, **kwargs)
+
+    def chat(self, chat, **kwargs: Any):
+        with trace.span("llm.chat", provider="local", model=self.model_name) as sp:
+            self._ensure_loaded()
+            tmp = self.kwargs | kwargs
+            stream = tmp.pop("stream", False)
+            resize = tmp.pop("resize", self.image_size)
+            max_video_frames = tmp.pop("max_video_frames", 8)
+
+            messages, images = [], []
+            for msg in chat:
+                text_part = {"type": "text", "text": cast(str, msg["content"])}
+                # prefix template으로 시작하는 text는 image 앞에 둬야 prefix KV를 image token 앞에서 재사용할 수 있다
+                text_first = any(text_part["text"].startswith(p) for p in self.prefixes)
+                content = [text_part] if text_first else []
+                for m in expand_media(msg.get("media", []) or [], max_video_frames=max_video_frames):
+                    images.append(load_pil(m, resize=resize))
+                    content.append({"type": "image"})
+                if not text_first:
+                    content.append(text_part)
+                messages.append({"role": msg["role"], "content": content})
+            text = self._processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+            gen_kwargs = {"max_new_tokens": int(tmp.get("max_new_tokens", tmp.get("max_tokens", 1024)))}
+            temperature = float(tmp.get("temperature", 0.0))
+            if temperature > 0:
+                gen_kwargs |= {"do_sample": True, "temperature": temperature}
+
+            out, prompt_tokens, response_tokens, prefix_hit = self._batcher.submit(
+                _LocalRequest(text, images, gen_kwargs)).result()
+            sp.set("prompt_tokens", prompt_tokens)
+            sp.set("response_tokens", response_tokens)
+            sp.set("cache_hit", prefix_hit)
+        return iter([out]) if stream else out
+
+    # ---- model ----
+    def _ensure_loaded(self) -> None:
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModelForImageTextToText, AutoProcessor
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            processor = AutoProcessor.from_pretrained(self.model_name)
+            processor.tokenizer.padding_side = "left"  # batched generate는 left padding
+            model = AutoModelForImageTextToText.from_pretrained(
+                self.model_name, torch_dtype=getattr(torch, self.torch_dtype), device_map="cpu")
+            model.eval()
+
+            # chat template을 씌운 prefix (sentinel 앞까지)
+            sentinel = "\x00PREFIX_END\x00"
+            self._prefix_texts = []
+            for prefix in self.prefixes:
+                rendered = processor.apply_chat_template(
+                    [{"role": "user", "content": [{"type": "text", "text": prefix + sentinel}]}],
+                    tokenize=False, add_generation_prompt=False)
+                self._prefix_texts.append(rendered.split(sentinel, 1)[0])
+            self._processor, self._model = processor, model
+
+    def _run_batch(self, reqs: list) -> list:
+        # 같은 prefix로 시작하는 요청끼리 묶어서 prefix KV를 재사용하고, 나머지는 일반 batched generate
+        groups: dict = {}
+        for i, req in enumerate(reqs):
+            prefix = next((p for p in self._prefix_texts if req.text.startswith(p)), None)
+            groups.setdefault(prefix, []).append(i)
+        results: list = [None] * len(reqs)
+        for prefix, idx in groups.items():
+            group = [reqs[i] for i in idx]
+            outs = self._generate_with_prefix(group, prefix) if prefix is not None else None
+            if outs is None:
+                outs = self._generate_batch(group)
+            for i, out in zip(idx, outs):
+                results[i] = out
+        self.stats["requests"] += len(reqs)
+        self.stats["prefix_hits"] += sum(1 for out in results if out[3])
+        return results
+
+    def _generate_batch(self, reqs: list) -> list:
+        import torch
+
+        images = [img for r in reqs for img in r.images] or None
+        inputs = self._processor(text=[r.text for r in reqs], images=images, padding=True, return_tensors="pt")
+        self._reset_rope_deltas()
+        with torch.inference_mode():
+            out = self._model.generate(**inputs, **reqs[0].gen_kwargs)
+        n_in = inputs["input_ids"].shape[1]
+        new_tokens = out[:, n_in:]
+        texts = self._processor.batch_decode(new_tokens, skip_special_tokens=True)
+        pad_id = self._processor.tokenizer.pad_token_id
+        prompt_lens = inputs["attention_mask"].sum(dim=1).tolist()
+        resp_lens = (new_tokens != pad_id).sum(dim=1).tolist()
+        return [(t, int(p), int(r), False) for t, p, r in zip(texts, prompt_lens, resp_lens)]
+
+    def _prefix_cache(self, prefix_text: str):
+        import torch
+        from transformers import DynamicCache
+
+        entry = self._prefix_kv.get(prefix_text)
+        if entry is None:
+            ids = self._processor.tokenizer(prefix_text, return_tensors="pt", add_special_tokens=False).input_ids
+            # 경계 토큰은 뒤 텍스트와 합쳐져 다르게 토크나이즈될 수 있으므로 제외
+            ids = ids[:, :-1]
+            cache = DynamicCache()
+            self._reset_rope_deltas()
+            with torch.inference_mode():
+                self._model(input_ids=ids, attention_mask=torch.ones_like(ids), past_key_values=cache, use_cache=True)
+            entry = self._prefix_kv[prefix_text] = (ids, cache)
+        return entry
+
+    def _generate_with_prefix(self, reqs: list, prefix_text: str) -> Optional[list]:
+        """
+        Batched generate reusing the cached prefix KV for every row. Returns None when a row's tokens
+        do not start with the cached prefix (caller falls back to _generate_batch).
+        """
+        import torch
+
+        prefix_ids, prefix_cache = self._prefix_cache(prefix_text)
+        n = prefix_ids.shape[1]
+        images = [img for r in reqs for img in r.images] or None
+        inputs = self._processor(text=[r.text for r in reqs], images=images, padding=True, return_tensors="pt")
+        rows = [row[m.bool()] for row, m in zip(inputs["input_ids"], inputs["attention_mask"])]
+        # 마지막 token 하나는 generate가 처리하도록 남기므로 prefix 뒤에 최소 2개가 있어야 한다
+        if any(len(r) < n + 2 or not torch.equal(r[:n], prefix_ids[0]) for r in rows):
+            return None
+
+        # [prefix | padding | 나머지]: 모든 row의 prefix가 cache와 같은 위치(0..n-1)에 오도록 padding을 가운데로
+        width = max(len(r) for r in rows)
+        input_ids = torch.full((len(rows), width), self._processor.tokenizer.pad_token_id, dtype=rows[0].dtype)
+        attention_mask = torch.zeros((len(rows), width), dtype=inputs["attention_mask"].dtype)
+        for i, r in enumerate(rows):
+            input_ids[i, :n], input_ids[i, width - (len(r) - n):] = r[:n], r[n:]
+            attention_mask[i, :n] = 1
+            attention_mask[i, width - (len(r) - n):] = 1
+        extra = {k: v for k, v in inputs.items() if k not in ("input_ids", "attention_mask")}  # pixel_values 등
+        position_ids, rope_deltas = self._rope_owner().get_rope_index(
+            input_ids=input_ids, image_grid_thw=extra.get("image_grid_thw"), attention_mask=attention_mask)
+
+        cache = copy.deepcopy(prefix_cache)
+        if len(rows) > 1:
+            cache.batch_repeat_interleave(len(rows))
+        self._reset_rope_deltas()
+        with torch.inference_mode():
+            # prefix 이후 ~ 마지막 직전까지 prefill (image token 포함). position은 전체 sequence 기준
+            self._model(input_ids=input_ids[:, n:-1], attention_mask=attention_mask[:, :-1],
+                        position_ids=position_ids[:, :, n:-1], past_key_values=cache,
+                        cache_position=torch.arange(n, width - 1), use_cache=True, **extra)
+            # decode step은 cache 길이 + rope_deltas로 position을 잡는다
+            self._rope_owner().rope_deltas = rope_deltas
+            out = self._model.generate(input_ids=input_ids, attention_mask=attention_mask, past_key_values=cache,
+                                       **reqs[0].gen_kwargs)
+        new_tokens = out[:, width:]
+        texts = self._processor.batch_decode(new_tokens, skip_special_tokens=True)
+        resp_lens = (new_tokens != self._processor.tokenizer.pad_token_id).sum(dim=1).tolist()
+        return [(t, len(r), int(k), True) for t, r, k in zip(texts, rows, resp_lens)]
+
+    def _rope_owner(self):
+        # get_rope_index/rope_deltas는 transformers 버전에 따라 model.model 또는 model에 있다
+        inner = getattr(self._model, "model", None)
+        return inner if inner is not None and hasattr(inner, "get_rope_index") else self._model
+
+    def _reset_rope_deltas(self) -> None:
+        # Qwen-VL은 M-RoPE delta를 model에 들고 있어서, 이전 요청 값이 남지 않도록 초기화
+        owner = self._rope_owner()
+        if hasattr(owner, "rope_deltas"):
+            owner.rope_deltas = None
+
+
+_local_instances: dict = {}
+_local_lock = threading.Lock()
+
+
+def shared_local_lmm(**kwargs: Any) -> LocalLMM:
+    """
+    Process-wide LocalLMM per settings. Model load는 무겁고 batching은 같은 batcher를 거쳐야 의미가 있으므로
+    Config는 reuse_clients와 무관하게 이것을 쓴다 (같은 kwargs → 같은 instance).
+    """
+    key = repr(sorted(kwargs.items()))
+    with _local_lock:
+        if key not in _local_instances:
+            _local_instances[key] = LocalLMM(**kwargs)
+        return _local_instances[key]
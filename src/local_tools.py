@@ -0,0 +1,166 @@
+# src/vision_agent/local_tools.py
+"""
+Local CPU detection tool (torchvision) with dynamic cross-session batching.
+
+    registry = register_local_tools({})          # {"local_object_detection": fn}
+    run_agent(state, llm, tool_desc=LOCAL_TOOL_DESC, tool_registry=registry)
+
+- 원격 agentic_object_detection/countgd_object_detection 대신 쓸 수 있는 offline 경로.
+- 동시에 들어온 호출(서로 다른 session/thread 포함)은 DynamicBatcher(src.batching)가 모아서 한 번의 forward로 돌린다.
+  첫 요청이 들어온 뒤 `max_wait_s`까지 또는 `max_batch`개가 찰 때까지 기다린다.
+- torch 연산 thread 수는 `intra_op_threads`로 고정한다 (기본: CPU 수). batch 하나를 여러 core로
+  나눠 돌리는 편이 요청마다 1-core forward를 동시에 여러 개 돌리는 것보다 처리량이 높다.
+- tool 함수는 module 수준이라 process pool(worker마다 자기 detector/batcher)에서도 쓸 수 있다.
+
+결과는 다른 detection tool과 같은 모양: [{"label": str, "score": float, "bbox": [x1, y1, x2, y2]}] (xyxy_norm)
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.batching import DynamicBatcher
+from src.media import load_pil
+from src.shm import SharedImage
+
+try:
+    import torch
+    import torchvision
+except ImportError:  # pragma: no cover - local tool은 torch/torchvision이 있을 때만 등록
+    torch = None
+    torchvision = None
+
+LOCAL_TOOLS_META = [{
+    "name": "local_object_detection",
+    "description": "Detect COCO-category objects on CPU without a remote call. "
+                   "prompt: comma-separated category names (e.g. 'person, car'); empty → all categories.",
+    "parameters": {"prompt": "str", "image": "image", "box_threshold": "float (default 0.3)"},
+}]
+
+LOCAL_TOOL_DESC = """\
+local_object_detection(prompt: str, image: np.ndarray, box_threshold: float = 0.3) -> List[Dict]
+    Runs a local torchvision detector (COCO categories) on CPU.
+    prompt is a comma-separated list of category names, e.g. "person, bicycle". Empty prompt returns every category.
+    Returns [{"label": str, "score": float, "bbox": [x1, y1, x2, y2]}] with bbox normalized to [0, 1].
+"""
+
+
+# ---------------------------------------------------------------------------
+# detector
+# ---------------------------------------------------------------------------
+
+def _to_rgb_np(image: Union[np.ndarray, SharedImage, str, Path, Any]) -> np.ndarray:
+    if isinstance(image, SharedImage):
+        image = image.array()
+    if isinstance(image, np.ndarray) and image.ndim == 3 and image.shape[2] == 3 and image.dtype == np.uint8:
+        return image
+    return np.asarray(load_pil(image))
+
+
+def _match(labels: Sequence[str], wanted: Sequence[str]) -> np.ndarray:
+    if not wanted:
+        return np.ones(len(labels), dtype=bool)
+    return np.array([l in wanted or f"{l}s" in wanted or f"{l}es" in wanted for l in labels], dtype=bool)
+
+
+class LocalDetector:
+    """torchvision detector on CPU; calls go through a shared DynamicBatcher."""
+
+    def __init__(self, model_name: str = "fasterrcnn_mobilenet_v3_large_320_fpn", weights: Optional[str] = "DEFAULT",
+                 weights_path: Optional[Union[str, Path]] = None, intra_op_threads: Optional[int] = None,
+                 max_batch: int = 8, max_wait_s: float = 0.01, min_score: float = 0.05):
+        if torch is None:
+            raise ImportError("local detection tool requires torch and torchvision")
+        self.model_name = model_name
+        self.weights = weights
+        self.weights_path = weights_path
+        self.intra_op_threads = intra_op_threads or os.cpu_count() or 1
+        self.min_score = min_score
+        self.categories: List[str] = []
+        self._model = None
+        self._load_lock = threading.Lock()
+        self.batcher: DynamicBatcher = DynamicBatcher(self._forward, max_batch=max_batch, max_wait_s=max_wait_s,
+                                                      name="local-detector")
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return self._model
+            torch.set_num_threads(self.intra_op_threads)
+            weights = None if self.weights_path else self.weights
+            model = torchvision.models.get_model(self.model_name, weights=weights, box_score_thresh=self.min_score)
+            if self.weights_path:
+                model.load_state_dict(torch.load(self.weights_path, map_location="cpu", weights_only=True))
+            w = torchvision.models.get_model_weights(self.model_name).DEFAULT
+            self.categories = [c.lower() for c in w.meta["categories"]]
+            self._model = model.eval()
+            return self._model
+
+    def _forward(self, images: List[np.ndarray]) -> List[Dict[str, np.ndarray]]:
+        """One forward pass over the whole batch (images may differ in size)."""
+        model = self._load()
+        tensors = [torch.from_numpy(np.ascontiguousarray(im)).permute(2, 0, 1).float().div_(255.0) for im in images]
+        with torch.inference_mode():
+            outputs = model(tensors)
+        return [{k: v.numpy() for k, v in out.items()} for out in outputs]
+
+    def detect(self, image: Any, prompt: str = "", box_threshold: float = 0.3) -> List[Dict[str, Any]]:
+        arr = _to_rgb_np(image)
+        out = self.batcher(arr)
+        self._load()
+        h, w = arr.shape[:2]
+        labels = [self.categories[i] if i < len(self.categories) else str(i) for i in out["labels"].tolist()]
+        wanted = [p.strip().lower() for p in (prompt or "").split(",") if p.strip()]
+        keep = (out["scores"] >= box_threshold) & _match(labels, wanted)
+        boxes = np.clip(out["boxes"][keep] / np.array([w, h, w, h], dtype=np.float32), 0.0, 1.0)
+        return [{"label": labels[i], "score": round(float(s), 4), "bbox": [round(float(v), 4) for v in b]}
+                for i, s, b in zip(np.flatnonzero(keep), out["scores"][keep], boxes)]
+
+    def close(self) -> None:
+        self.batcher.close()
+
+
+_detector: Optional[LocalDetector] = None
+_detector_kwargs: Dict[str, Any] = {}
+_detector_lock = threading.Lock()
+
+
+def configure(**kwargs: Any) -> None:
+    """Set LocalDetector kwargs for this process (before the first call)."""
+    global _detector
+    with _detector_lock:
+        _detector_kwargs.clear()
+        _detector_kwargs.update(kwargs)
+        if _detector is not None:
+            _detector.close()
+            _detector = None
+
+
+def default_detector() -> LocalDetector:
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = LocalDetector(**_detector_kwargs)
+        return _detector
+
+
+def local_object_detection(prompt: str = "", image: Any = None, box_threshold: float = 0.3) -> List[Dict[str, Any]]:
+    if image is None:
+        raise ValueError("local_object_detection requires an image")
+    return default_detector().detect(image, prompt=prompt, box_threshold=box_threshold)
+
+
+def available() -> bool:
+    return torch is not None
+
+
+def register_local_tools(registry: Dict[str, Any], **detector_kwargs: Any) -> Dict[str, Any]:
+    """Add the local tools to `registry` (in place) and return it. Raises ImportError without torch."""
+    if torch is None:
+        raise ImportError("local detection tool requires torch and torchvision")
+    if detector_kwargs:
+        configure(**detector_kwargs)
+    registry["local_object_detection"] = local_object_detection
+    return registry
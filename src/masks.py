@@ -0,0 +1,193 @@
+# src/vision_agent/masks.py
+"""
+Segmentation mask를 compact하게 들고 있기 위한 표현.
+
+- RLEMask    : COCO RLE (pycocotools). area/bbox는 decode 없이 계산.
+- PackedMask : pycocotools가 없을 때 쓰는 row 단위 np.packbits fallback.
+
+둘 다 `.mask` / `np.asarray(m)`로 접근할 때만 (H, W) bool 배열로 decode한다.
+"""
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+try:
+    from pycocotools import mask as mask_utils
+except ImportError:  # pragma: no cover - pycocotools는 기본 의존성
+    mask_utils = None
+
+# 결과에 per-instance mask가 들어오는 tool들
+SEGMENTATION_TOOLS = {"agentic_sam2_instance_segmentation"}
+
+# popcount lookup (uint8 → set bit 수)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+class RLEMask:
+    """COCO RLE mask with lazy decode."""
+    __slots__ = ("rle",)
+
+    def __init__(self, rle: Dict[str, Any]):
+        self.rle = rle
+
+    @classmethod
+    def encode(cls, mask: np.ndarray) -> "RLEMask":
+        return cls(mask_utils.encode(np.asfortranarray(mask, dtype=np.uint8)))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        h, w = self.rle["size"]
+        return int(h), int(w)
+
+    @property
+    def area(self) -> int:
+        return int(mask_utils.area(self.rle))
+
+    @property
+    def bbox(self) -> List[float]:
+        """Pixel xyxy bbox computed from the RLE runs."""
+        x, y, w, h = mask_utils.toBbox(self.rle).tolist()
+        return [x, y, x + w, y + h]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.rle["counts"])
+
+    def decode(self) -> np.ndarray:
+        return mask_utils.decode(self.rle).astype(bool)
+
+    mask = property(decode)
+
+    def __array__(self, dtype=None, copy=None):
+        m = self.decode()
+        return m if dtype is None else m.astype(dtype)
+
+    def to_json(self) -> Dict[str, Any]:
+        counts = self.rle["counts"]
+        return {"size": list(self.size), "counts": counts.decode("ascii") if isinstance(counts, bytes) else counts}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "RLEMask":
+        counts = data["counts"]
+        return cls({"size": list(data["size"]), "counts": counts.encode("ascii") if isinstance(counts, str) else counts})
+
+    def __repr__(self) -> str:
+        return f"RLEMask(size={self.size}, nbytes={self.nbytes})"
+
+
+class PackedMask:
+    """Bit-packed (row-major, per row) mask; fallback when pycocotools is unavailable."""
+    __slots__ = ("bits", "shape")
+
+    def __init__(self, bits: np.ndarray, shape: Tuple[int, int]):
+        self.bits = bits
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @classmethod
+    def encode(cls, mask: np.ndarray) -> "PackedMask":
+        mask = np.asarray(mask, dtype=bool)
+        return cls(np.packbits(mask, axis=1), mask.shape)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.shape
+
+    @property
+    def area(self) -> int:
+        return int(_POPCOUNT[self.bits].sum())
+
+    @property
+    def bbox(self) -> List[float]:
+        rows = np.flatnonzero(self.bits.any(axis=1))
+        if rows.size == 0:
+            return [0.0, 0.0, 0.0, 0.0]
+        # 모든 row를 OR해서 한 줄만 unpack
+        cols = np.flatnonzero(np.unpackbits(np.bitwise_or.reduce(self.bits, axis=0))[: self.shape[1]])
+        return [float(cols[0]), float(rows[0]), float(cols[-1] + 1), float(rows[-1] + 1)]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes)
+
+    def decode(self) -> np.ndarray:
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
+
+    mask = property(decode)
+
+    def __array__(self, dtype=None, copy=None):
+        m = self.decode()
+        return m if dtype is None else m.astype(dtype)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"size": list(self.shape), "packed": self.bits.tobytes().hex()}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "PackedMask":
+        h, w = data["size"]
+        bits = np.frombuffer(bytes.fromhex(data["packed"]), dtype=np.uint8).reshape(h, (w + 7) // 8)
+        return cls(bits.copy(), (h, w))
+
+    def __repr__(self) -> str:
+        return f"PackedMask(size={self.shape}, nbytes={self.nbytes})"
+
+
+CompactMask = RLEMask | PackedMask
+
+
+def compact_mask(mask: Any) -> Any:
+    """Dense (H, W) mask → RLEMask (or PackedMask without pycocotools). Others pass through."""
+    if isinstance(mask, (RLEMask, PackedMask)):
+        return mask
+    arr = np.asarray(mask)
+    if arr.ndim != 2:
+        return mask
+    return RLEMask.encode(arr) if mask_utils is not None else PackedMask.encode(arr)
+
+
+def compact_masks(masks: Sequence[np.ndarray]) -> List[Any]:
+    """Encode many same-sized masks in one pycocotools call."""
+    if mask_utils is None or not len(masks):
+        return [compact_mask(m) for m in masks]
+    stack = np.stack([np.asarray(m, dtype=np.uint8) for m in masks], axis=-1)
+    return [RLEMask(rle) for rle in mask_utils.encode(np.asfortranarray(stack))]
+
+
+def compact_segmentation_result(result: Any) -> Any:
+    """
+    Replace dense per-instance masks in a segmentation tool result
+    (list of {"mask", "bbox", "label", "score"}) with compact masks.
+    """
+    if not isinstance(result, list):
+        return result
+    idx = [i for i, r in enumerate(result)
+           if isinstance(r, dict) and isinstance(r.get("mask"), np.ndarray) and r["mask"].ndim == 2]
+    if not idx:
+        return result
+    # 크기가 같은 mask끼리 한 번에 encode
+    by_shape: Dict[Tuple[int, int], List[int]] = {}
+    for i in idx:
+        by_shape.setdefault(result[i]["mask"].shape, []).append(i)
+    out = list(result)
+    for ids in by_shape.values():
+        for i, m in zip(ids, compact_masks([result[i]["mask"] for i in ids])):
+            out[i] = {**result[i], "mask": m}
+    return out
+
+
+def decode_masks(masks: Sequence[Any]) -> np.ndarray:
+    """Decode a sequence of compact or dense masks to an (N, H, W) bool array."""
+    return np.stack([np.asarray(m, dtype=bool) for m in masks]) if len(masks) else np.zeros((0, 0, 0), dtype=bool)
+
+
+def mask_from_json(data: Dict[str, Any]) -> Any:
+    return PackedMask.from_json(data) if "packed" in data else RLEMask.from_json(data)
+
+
+def json_default(obj: Any) -> Any:
+    """`json.dumps(default=...)` hook: summarize masks/arrays instead of failing."""
+    if isinstance(obj, (RLEMask, PackedMask)):
+        return {"mask_area": obj.area, "mask_bbox": obj.bbox, "size": list(obj.size)}
+    if isinstance(obj, np.ndarray):
+        return obj.tolist() if obj.size <= 16 else f"<ndarray shape={obj.shape} dtype={obj.dtype}>"
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
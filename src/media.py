@@ -4,6 +4,28 @@ from io import BytesIO
 from pathlib import Path
 from typing import Optional, Union
 from PIL import Image
+from src import trace
+from src.shm import SharedImage
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+def open_image(src: Union[str, Path, bytes], max_side: Optional[int] = None) -> Image.Image:
+    """
+    Path / bytes → RGB PIL image.
+    max_side가 있으면 긴 변을 max_side로 줄인다. JPEG는 draft(DCT scaling)로 그 크기 이상인
+    가장 작은 1/2, 1/4, 1/8 스케일로 바로 decode한 뒤 thumbnail하므로 원본 전체를 decode하지 않는다.
+    """
+    img = Image.open(BytesIO(src) if isinstance(src, (bytes, bytearray)) else src)
+    if max_side is not None:
+        w, h = img.size
+        r = max_side / max(w, h)
+        if r < 1:
+            img.draft("RGB", (max(1, int(w * r + 0.999)), max(1, int(h * r + 0.999))))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max_side is not None:
+        img.thumbnail((max_side, max_side))
+    return img
 
 def image_to_base64(image: Image.Image, resize: Optional[int] = None) -> str:
     if resize is not None:
@@ -13,24 +35,70 @@ def image_to_base64(image: Image.Image, resize: Optional[int] = None) -> str:
     return base64.b64encode(buf.getvalue()).decode("utf-8")
 
 def encode_media(media: Union[str, Path, np.ndarray, Image.Image], resize: Optional[int] = None) -> str:
+    with trace.span("encode_media") as sp:
+        encoded = _encode_media(media, resize)
+        sp.set("bytes_out", len(encoded))
+        return encoded
+
+def _encode_media(media: Union[str, Path, np.ndarray, Image.Image, SharedImage], resize: Optional[int] = None) -> str:
+    if isinstance(media, SharedImage):
+        media = media.array()
     if isinstance(media, np.ndarray):
         return image_to_base64(Image.fromarray(media), resize)
     if isinstance(media, Image.Image):
         return image_to_base64(media, resize)
     if isinstance(media, (str, Path)):
         path = Path(media)
-        if path.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp", ".bmp"}:
-            return image_to_base64(Image.open(path), resize)
+        if path.suffix.lower() in IMAGE_SUFFIXES:
+            return image_to_base64(open_image(path, resize))
+        if path.suffix.lower() in {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}:
+            raise ValueError(f"Video must be expanded to frames first (src.video.expand_media): {media}")
     raise ValueError(f"Unsupported media type: {media}")
 
-def b64_to_np(b64: str) -> np.ndarray:
-    return np.array(Image.open(BytesIO(base64.b64decode(b64))))
+def load_pil(media: Union[str, Path, np.ndarray, Image.Image], resize: Optional[int] = None) -> Image.Image:
+    """media(path / ndarray / PIL) → RGB PIL image, thumbnail to `resize` if given (input is not modified)."""
+    if isinstance(media, (str, Path)) and Path(media).suffix.lower() in IMAGE_SUFFIXES:
+        return open_image(media, resize)
+    if isinstance(media, SharedImage):
+        media = media.array()
+    if isinstance(media, np.ndarray):
+        img = Image.fromarray(media)
+    elif isinstance(media, Image.Image):
+        img = media.copy()
+    else:
+        raise ValueError(f"Unsupported media type: {media}")
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if resize is not None:
+        img.thumbnail((resize, resize))
+    return img
+
+def b64_to_np(b64: str, max_side: Optional[int] = None) -> np.ndarray:
+    with trace.span("b64_to_np", bytes_in=len(b64)):
+        return np.array(open_image(base64.b64decode(b64), max_side))
 
 def np_to_b64(arr: np.ndarray) -> str:
     return image_to_base64(Image.fromarray(arr))
 
-def load_image(path: str) -> np.ndarray:
-    img = Image.open(path)
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-    return np.array(img)
+def load_image(path: Union[str, Path], max_side: Optional[int] = None) -> np.ndarray:
+    """max_side=None이면 원본 해상도 (full resolution이 필요한 tool용)."""
+    with trace.span("load_image"):
+        return np.array(open_image(path, max_side))
+
+def publish_source(store, key: Optional[str], img_b64: Optional[str] = None,
+                   img_path: Optional[Union[str, Path]] = None) -> SharedImage:
+    """
+    source_to_np의 shared-memory 버전: 같은 key(이미지 digest)는 한 번만 decode해서 올리고
+    이후에는 refcount만 올린다. 다 쓰면 store.release(handle).
+    """
+    handle = store.get(key) if key is not None else None
+    return handle or store.publish(source_to_np(img_b64, img_path), key=key)
+
+def source_to_np(img_b64: Optional[str] = None, img_path: Optional[Union[str, Path]] = None,
+                 max_side: Optional[int] = None) -> np.ndarray:
+    """AgentState의 이미지 입력(파일 경로 우선, 없으면 base64) → ndarray."""
+    if img_path:
+        return load_image(img_path, max_side)
+    if img_b64:
+        return b64_to_np(img_b64, max_side)
+    raise ValueError("No image: neither img_path nor img_b64 is set")
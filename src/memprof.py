@@ -0,0 +1,226 @@
+# src/vision_agent/memprof.py
+"""
+Opt-in memory profiling per pipeline stage (tracemalloc + RSS sampling).
+
+    from src import memprof
+    with memprof.profiling() as prof:
+        run_agent(...)
+    print(prof.report_text())
+    prof.to_json("mem.json")
+
+trace.stage()로 표시된 구간(run_agent, stage.vqa/plan/code, execute_plan, generate_code)마다:
+  - py_peak_kb:  stage 동안 Python heap(tracemalloc) peak - 시작 시점
+  - py_net_kb:   stage 종료 시점 - 시작 시점 (남은 할당: observations, 이미지 등)
+  - rss_peak_mb: stage 동안 샘플링한 RSS 최댓값 - 시작 시점 (numpy/SDK의 C 할당 포함)
+  - top:         시작/종료 snapshot 차이 기준 상위 할당 위치
+
+snapshot(take_snapshot/compare_to)에 드는 할당은 바깥 stage의 py_peak/py_net에서 뺀다: 찍는 동안의 peak는
+reset하고, stage가 끝날 때까지 들고 있는 시작 snapshot 크기는 overhead로 따로 세어 차감한다.
+(rss_peak_mb에는 여전히 포함된다.)
+
+tracemalloc/RSS는 process 전역이라 동시에 여러 요청이 돌면 겹치는 stage끼리 값이 섞인다.
+worker 크기 산정은 단일 요청으로 측정할 것.
+"""
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from src import trace
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """Current RSS (Linux /proc), falling back to peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        ru = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return ru if os.uname().sysname == "Darwin" else ru * 1024
+
+
+@dataclass
+class StageMemory:
+    name: str
+    count: int = 0
+    py_peak_kb: float = 0.0
+    py_net_kb: float = 0.0
+    rss_peak_mb: float = 0.0
+    total_ms: float = 0.0
+    top: List[str] = field(default_factory=list)
+
+
+class _Active:
+    __slots__ = ("name", "t0", "py_start", "py_peak", "rss_start", "rss_peak", "snapshot", "snapshot_bytes")
+
+    def __init__(self, name: str, py_start: int, rss_start: int, snapshot, snapshot_bytes: int = 0):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.py_start = py_start
+        self.py_peak = py_start
+        self.rss_start = rss_start
+        self.rss_peak = rss_start
+        self.snapshot = snapshot
+        self.snapshot_bytes = snapshot_bytes
+
+
+class MemoryProfiler:
+    def __init__(self, interval_s: float = 0.01, nframes: int = 8, top_n: int = 10, snapshots: bool = True):
+        self.interval_s = interval_s
+        self.nframes = nframes
+        self.top_n = top_n
+        self.snapshots = snapshots
+        self.stages: Dict[str, StageMemory] = {}
+        self.rss_start = 0
+        self.rss_peak = 0
+        self._active: List[_Active] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+        self._overhead = 0  # 열린 stage들이 들고 있는 시작 snapshot의 traced bytes
+
+    # ---- lifecycle ----
+    def start(self) -> "MemoryProfiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            self._started_tracemalloc = True
+        self.rss_start = self.rss_peak = rss_bytes()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name="memprof-rss", daemon=True)
+        self._sampler.start()
+        trace.add_stage_hook(self.stage)
+        return self
+
+    def stop(self) -> None:
+        trace.remove_stage_hook(self.stage)
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            rss = rss_bytes()
+            with self._lock:
+                self.rss_peak = max(self.rss_peak, rss)
+                for a in self._active:
+                    a.rss_peak = max(a.rss_peak, rss)
+
+    # ---- stages ----
+    def _traced(self) -> Tuple[int, int]:
+        """(current, peak) traced bytes minus snapshots held by open stages."""
+        current, peak = tracemalloc.get_traced_memory()
+        return current - self._overhead, peak - self._overhead
+
+    def _fold_peak(self) -> None:
+        """tracemalloc peak를 열린 stage 모두에 반영하고 peak를 reset (중첩 stage 지원)."""
+        _, peak = self._traced()
+        for a in self._active:
+            a.py_peak = max(a.py_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _snapshot(self):
+        """take_snapshot() whose transient allocations do not reach open stages' peaks. Returns (snap, held bytes)."""
+        with self._lock:
+            self._fold_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            snap = tracemalloc.take_snapshot()
+            after, _ = tracemalloc.get_traced_memory()
+            self._overhead += after - before
+            tracemalloc.reset_peak()
+        return snap, after - before
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not tracemalloc.is_tracing():
+            yield
+            return
+        snap, held = self._snapshot() if self.snapshots else (None, 0)
+        rss = rss_bytes()
+        with self._lock:
+            self._fold_peak()
+            current, _ = self._traced()
+            active = _Active(name, current, rss, snap, held)
+            self._active.append(active)
+        try:
+            yield
+        finally:
+            rss = rss_bytes()
+            with self._lock:
+                self._fold_peak()
+                current, _ = self._traced()
+                self._active.remove(active)
+                active.rss_peak = max(active.rss_peak, rss)
+            self._record(active, current)
+
+    def _diff_top(self, a: _Active) -> List[str]:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        with self._lock:
+            self._fold_peak()
+            end = tracemalloc.take_snapshot().filter_traces(filters)
+            diffs = end.compare_to(a.snapshot.filter_traces(filters), "lineno")
+            top = [f"{d.size_diff / 1024:+.1f} KB ({d.count_diff:+d}) {d.traceback[0].filename}:{d.traceback[0].lineno}"
+                   for d in diffs[:self.top_n] if d.size_diff]
+            del end, diffs
+            a.snapshot = None
+            self._overhead -= a.snapshot_bytes
+            tracemalloc.reset_peak()  # 비교에 쓴 할당은 바깥 stage peak에 넣지 않는다
+        return top
+
+    def _record(self, a: _Active, py_end: int) -> None:
+        top = self._diff_top(a) if a.snapshot is not None else []
+        peak_kb = (a.py_peak - a.py_start) / 1024
+        with self._lock:
+            row = self.stages.setdefault(a.name, StageMemory(a.name))
+            row.count += 1
+            row.total_ms += (time.perf_counter() - a.t0) * 1e3
+            if top and (not row.top or peak_kb >= row.py_peak_kb):
+                row.top = top  # 여러 번 호출된 stage는 peak가 가장 큰 호출의 top을 남긴다
+            row.py_peak_kb = max(row.py_peak_kb, peak_kb)
+            row.py_net_kb = max(row.py_net_kb, (py_end - a.py_start) / 1024)
+            row.rss_peak_mb = max(row.rss_peak_mb, (a.rss_peak - a.rss_start) / 2**20)
+
+    # ---- report ----
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rss_start_mb": round(self.rss_start / 2**20, 1),
+            "rss_peak_mb": round(self.rss_peak / 2**20, 1),
+            "stages": {name: asdict(s) for name, s in self.stages.items()},
+        }
+
+    def report_text(self) -> str:
+        lines = [f"RSS start {self.rss_start / 2**20:.1f} MB, peak {self.rss_peak / 2**20:.1f} MB",
+                 f"{'stage':<28}{'count':>6}{'py peak KB':>12}{'py net KB':>12}{'rss +MB':>10}{'ms':>10}"]
+        for s in self.stages.values():
+            lines.append(f"{s.name:<28}{s.count:>6}{s.py_peak_kb:>12.1f}{s.py_net_kb:>12.1f}"
+                         f"{s.rss_peak_mb:>10.1f}{s.total_ms:>10.1f}")
+        for s in self.stages.values():
+            if s.top:
+                lines.append(f"\n[{s.name}] top allocations")
+                lines += [f"  {t}" for t in s.top]
+        return "\n".join(lines)
+
+    def to_json(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def profiling(**kwargs: Any) -> Iterator[MemoryProfiler]:
+    prof = MemoryProfiler(**kwargs).start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
@@ -0,0 +1,113 @@
+# src/vision_agent/phash.py
+"""
+Perceptual hash 유틸 (near-duplicate 판정용).
+
+dhash: 인접 픽셀 밝기 차이 기반, 64bit int. 계산이 매우 싸서 video frame 필터에 사용.
+"""
+from typing import Union
+import numpy as np
+from PIL import Image
+
+
+def _gray_small(image: Union[np.ndarray, Image.Image], size: tuple) -> np.ndarray:
+    img = image if isinstance(image, Image.Image) else Image.fromarray(image)
+    # draft/reduce 없이도 작은 크기라 BOX resample이면 충분
+    return np.asarray(img.convert("L").resize(size, Image.Resampling.BOX), dtype=np.int16)
+
+
+def dhash(image: Union[np.ndarray, Image.Image], hash_size: int = 8) -> int:
+    """Difference hash: hash_size*hash_size bits as a Python int."""
+    px = _gray_small(image, (hash_size + 1, hash_size))
+    bits = (px[:, 1:] > px[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+    m[0] *= 1 / np.sqrt(2)
+    return m * np.sqrt(2 / n)
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(image: Union[np.ndarray, Image.Image], hash_size: int = 8) -> int:
+    """DCT hash: low-frequency 8x8 DCT coefficients vs their median (64 bits). 조명/압축 변화에 dhash보다 강함."""
+    px = _gray_small(image, (32, 32)).astype(np.float64)
+    coeffs = (_DCT32 @ px @ _DCT32.T)[:hash_size, :hash_size]
+    bits = (coeffs > np.median(coeffs.ravel()[1:])).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+HASHES = {"dhash": dhash, "phash": phash}
+
+
+def open_for_hash(data) -> Image.Image:
+    """Decode image bytes (or a path) cheaply for hashing (JPEG는 draft mode로 1/8 크기까지 축소 decode)."""
+    from io import BytesIO
+
+    img = Image.open(BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+    img.draft("L", (64, 64))
+    return img
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance: radius search without scanning every hash.
+    """
+    __slots__ = ("_root", "_size")
+
+    def __init__(self):
+        # node: [hash, values(list), children(dict distance -> node)]
+        self._root = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, h: int, value=None) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [h, [value], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [value], {}]
+                return
+            node = child
+
+    def search(self, h: int, radius: int) -> list:
+        """All (distance, hash, value) within `radius`, nearest first."""
+        if self._root is None:
+            return []
+        out = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.extend((d, node[0], v) for v in node[1])
+            for cd, child in node[2].items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        out.sort(key=lambda x: x[0])
+        return out
+
+    def items(self):
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            for v in node[1]:
+                yield node[0], v
+            stack.extend(node[2].values())
@@ -1,35 +1,109 @@
 from .types import AgentState
+import threading
 from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 from .planner import render_prompt, plan_once, generate_final_plan
 from .codegen import generate_code
 from .config import Config
+from .checkpoint import Checkpointer
+from . import planner as _planner
+from . import trace
+from .reuse import ReuseIndex
+from .codecache import CodeCache
 cfg = Config()
 
 
+class Cancelled(Exception):
+    """Raised between stages when the caller's cancel event is set (e.g. server deadline)."""
 
-def run_agent(state: AgentState, llm, tool_desc: str, tool_registry: Dict[str, Any]) -> AgentState:
+
+def _check_cancel(cancel: Optional[threading.Event], stage: str) -> None:
+    if cancel is not None and cancel.is_set():
+        raise Cancelled(f"cancelled before {stage}")
+
+
+def set_config(new_cfg: Config) -> None:
+    """planner/pipeline이 공유하는 Config 교체 (서비스, 벤치마크에서 사용)."""
+    global cfg
+    cfg = new_cfg
+    _planner.cfg = new_cfg
+
+
+def run_vqa(state: AgentState) -> AgentState:
+    # VQA 로직이 필요하면 여기에 추가
+    # 현재는 기본값으로 설정
+    state.vqa_struct = {"task_type": "detection", "target": "semi-ripe tomato"}
+    state.vqa_log = "VQA analysis completed"
+    return state
+
+
+def run_agent(state: AgentState, llm, tool_desc: str, tool_registry: Dict[str, Any],
+              checkpointer: Optional[Checkpointer] = None,
+              reuse_index: Optional[ReuseIndex] = None,
+              cancel: Optional[threading.Event] = None) -> AgentState:
     """
     에이전트 실행 - VQA 및 플래닝 수행
+    checkpointer가 있으면 각 단계가 끝날 때마다 state를 저장하고,
+    이미 채워진 단계(resume)는 건너뛴다.
+    reuse_index가 있으면 near-duplicate 이미지 + 같은 요청의 VQA/plan 결과를 재사용한다.
+    cancel이 set되면 다음 단계로 넘어가기 전에 Cancelled를 던진다 (진행 중인 LLM 호출은 끝까지 간다).
     """
-    # VQA 단계 (필요한 경우)
-    if not state.vqa_struct:
-        # VQA 로직이 필요하면 여기에 추가
-        # 현재는 기본값으로 설정
-        state.vqa_struct = {"task_type": "detection", "target": "semi-ripe tomato"}
-        state.vqa_log = "VQA analysis completed"
-    
-    # 플래닝 단계
-    if not state.tool_desc:
-        state.tool_desc = tool_desc
-    
-    # 최종 계획 생성
-    final_plan_result = generate_final_plan(state)
-    state.code_plan = final_plan_result["code_plan"]
+    if tool_registry and not state.tool_registry:
+        state.tool_registry = tool_registry
+
+    img_hash = None
+    if reuse_index is not None and (state.img_b64 or state.img_path) and not state.vqa_struct:
+        with trace.span("reuse.lookup") as sp:
+            img_hash = reuse_index.hash_image(state.img_b64, state.img_path)
+            entry = reuse_index.lookup(img_hash, state.user_request)
+            sp.set("cache_hit", entry is not None)
+        if entry is not None:
+            reuse_index.apply(state, entry)
+            img_hash = None  # 재사용한 결과는 다시 등록하지 않는다
+            if checkpointer:
+                checkpointer.save(state, "plan" if state.code_plan is not None else "vqa")
+
+    with trace.stage("run_agent"):
+        # VQA 단계 (필요한 경우)
+        if not state.vqa_struct:
+            _check_cancel(cancel, "vqa")
+            with trace.stage("stage.vqa"):
+                run_vqa(state)
+            if checkpointer:
+                checkpointer.save(state, "vqa")
+        
+        # 플래닝 단계
+        if not state.tool_desc:
+            state.tool_desc = tool_desc
+        
+        # 최종 계획 생성
+        if state.code_plan is None:
+            _check_cancel(cancel, "plan")
+            with trace.stage("stage.plan"):
+                final_plan_result = generate_final_plan(state)
+                state.code_plan = final_plan_result["code_plan"]
+            if checkpointer:
+                checkpointer.save(state, "plan")
+
+    if img_hash is not None:
+        reuse_index.add(img_hash, state)
     
     return state  # 중요: state를 반환해야 함
 
-def run_coder_after_final_plan(state: AgentState, llm, out_filename: str = "extract_code.py"):
+def run_coder_after_final_plan(state: AgentState, llm, out_filename: str = "extract_code.py",
+                               checkpointer: Optional[Checkpointer] = None,
+                               code_cache: Optional[CodeCache] = None,
+                               cancel: Optional[threading.Event] = None):
+    _check_cancel(cancel, "code")
     llm_code = cfg.create_coder()
-    return generate_code(llm_code, instruction=state.user_request, img_b64=state.img_b64,
-                         tool_desc="", out_filename=out_filename)
\ No newline at end of file
+    with trace.stage("stage.code"):
+        result = generate_code(llm_code, instruction=state.user_request, img_b64=state.img_b64,
+                               img_path=state.img_path,
+                               tool_desc="", out_filename=out_filename,
+                               code_plan=state.code_plan, tools=(state.tool_registry or {}).keys(),
+                               target=(state.vqa_struct or {}).get("target"), cache=code_cache,
+                               candidates=cfg.codegen_candidates, timeout_s=cfg.codegen_timeout_s)
+    state.code_result = result
+    if checkpointer:
+        checkpointer.save(state, "code")
+    return result
@@ -4,7 +4,12 @@ from src.media import b64_to_np
 from src.config import Config 
 from src.prompt import PROMPT_PLAN_TEMPLATE, PROMPT_FINAL_PLAN_TEMPLATE
 from .types import AgentState
-from src.display import print_code_plan
+from src.display import LivePlanDisplay, print_code_plan
+from src.masks import json_default
+from src import trace
+from src.jsonrepair import (
+    CODE_PLAN_SCHEMA_HINT, PLAN_SCHEMA_HINT, check_code_plan, check_plan_json, parse_with_fallback,
+)
 
 cfg = Config()
 
@@ -15,66 +20,150 @@ def render_prompt(
     tool_desc: str, 
     observations: Optional[List] = None  # 매개변수로 추가
 ) -> str:
-    vqa_struct_json = json.dumps(vqa_struct, ensure_ascii=False, indent=2)
+    with trace.span("render_prompt") as sp:
+        vqa_struct_json = json.dumps(vqa_struct, ensure_ascii=False, indent=2)
 
-    # observations 매개변수 사용
-    if observations:
-        obs_text = json.dumps(observations, ensure_ascii=False, indent=2)
-    else:
-        obs_text = "(none)"
+        # observations 매개변수 사용
+        if observations:
+            obs_text = json.dumps(observations, ensure_ascii=False, indent=2, default=json_default)
+        else:
+            obs_text = "(none)"
 
-    return PROMPT_PLAN_TEMPLATE.format(
-        user_request=user_request,
-        vqa_log=vqa_log,
-        vqa_struct_json=vqa_struct_json,
-        tool_desc=tool_desc,
-        observations=obs_text,
-    )
+        prompt = PROMPT_PLAN_TEMPLATE.format(
+            user_request=user_request,
+            vqa_log=vqa_log,
+            vqa_struct_json=vqa_struct_json,
+            tool_desc=tool_desc,
+            observations=obs_text,
+        )
+        sp.set("bytes_out", len(prompt))
+        return prompt
 
 
 def _extract_tag(text: str, tag: str) -> str:
     m = re.search(rf"<{tag}>(.*?)</{tag}>", text, re.DOTALL | re.IGNORECASE)
+    if m:
+        return m.group(1).strip()
+    # 응답이 잘려 닫는 태그가 없으면 여는 태그 뒤 전부 (jsonrepair가 닫아준다)
+    m = re.search(rf"<{tag}>(.*)\Z", text, re.DOTALL | re.IGNORECASE)
     return m.group(1).strip() if m else ""
 
+
+def _llm_media(img_b64: Optional[str], img_path: Optional[str] = None) -> Optional[List[Any]]:
+    # 경로는 그대로 넘겨서 LMM client가 encode_media(resize)로 draft decode하게 한다
+    if img_path:
+        return [img_path]
+    return [b64_to_np(img_b64)] if img_b64 else None
+
+
+def _plan_check(tools_meta: Optional[List[Dict[str, Any]]]):
+    def check(plan: Any) -> None:
+        check_plan_json(plan)
+        if tools_meta:
+            from src.executor import validate_plan  # executor → pipeline → planner 순환 import 회피
+            validate_plan(plan, tools_meta)
+    return check
+
 def plan_once(
     user_request: str, 
     vqa_log: str, 
     vqa_struct: dict, 
     tool_desc: str, 
     img_b64: Optional[str],
-    observations: Optional[List] = None  # 매개변수로 추가
+    observations: Optional[List] = None,  # 매개변수로 추가
+    tools_meta: Optional[List[Dict[str, Any]]] = None,
+    img_path: Optional[str] = None,
 ):
     llm = cfg.create_planner()
     prompt_text = render_prompt(user_request, vqa_log, vqa_struct, tool_desc, observations)  # observations 전달
-    media = [b64_to_np(img_b64)] if img_b64 else None
+    media = _llm_media(img_b64, img_path)
     raw = llm.generate(prompt_text, media=media)
 
-    analysis_log = _extract_tag(raw, "analysis_log")
-    plan_str = _extract_tag(raw, "plan_json")
-    plan_json = json.loads(plan_str)
+    with trace.span("parse_plan", bytes_in=len(raw)):
+        analysis_log = _extract_tag(raw, "analysis_log")
+        plan_str = _extract_tag(raw, "plan_json")
+        # 로컬 repair로 안 되면 짧은 fix 호출 한 번 (전체 planner 재호출 대신)
+        plan_json = parse_with_fallback(plan_str, _plan_check(tools_meta), llm=llm, schema_hint=PLAN_SCHEMA_HINT)
     return analysis_log, plan_json
 
+def plan_once_streaming(
+    state: AgentState,
+    tools_meta: Optional[List[Dict[str, Any]]] = None,
+    verbose: bool = False,
+    coalesce: Optional[bool] = None,
+):
+    """
+    plan_once + execute_plan을 겹쳐서 실행: planner 응답을 stream으로 받으며
+    tool call 객체가 완성되는 즉시 executor에 넘긴다. 결과는 state.observations에 쌓인다.
+    """
+    from src.executor import execute_plan_streaming  # executor → pipeline → planner 순환 import 회피
+
+    llm = cfg.create_planner()
+    prompt_text = render_prompt(state.user_request, state.vqa_log, state.vqa_struct, state.tool_desc, state.observations)
+    media = _llm_media(state.img_b64, state.img_path)
+    chunks = llm.generate(prompt_text, media=media, stream=True)
+    if isinstance(chunks, str):
+        # stream을 지원하지 않는 client
+        chunks = [chunks]
+    live = LivePlanDisplay(kind="tool_calls", title="Tool calls").start() if cfg.live_display else None
+    if live is not None:
+        chunks = live.tee(chunks)
+
+    def parse(raw: str) -> Dict[str, Any]:
+        with trace.span("parse_plan", bytes_in=len(raw)):
+            return parse_with_fallback(_extract_tag(raw, "plan_json"), _plan_check(tools_meta),
+                                       llm=llm, schema_hint=PLAN_SCHEMA_HINT)
+
+    try:
+        raw, plan_json = execute_plan_streaming(state, chunks, parse, verbose=verbose, coalesce=coalesce)
+        if live is not None:
+            live.set_steps(plan_json.get("tool_calls", []) or [])
+    finally:
+        if live is not None:
+            live.close()
+    return _extract_tag(raw, "analysis_log"), plan_json
+
 def generate_final_plan(
     state: AgentState,
     prompt_template: str = PROMPT_FINAL_PLAN_TEMPLATE,
 ) -> Dict[str, Any]:
     llm = cfg.create_planner()
-    prompt = prompt_template.format(
-        user_request=state.user_request,
-        vqa_log=state.vqa_log,
-        vqa_struct_json=json.dumps(state.vqa_struct, ensure_ascii=False, indent=2),
-        observations=json.dumps(state.observations, ensure_ascii=False, indent=2) if state.observations else "(none)",
-        tool_desc=state.tool_desc,
-    )
-    media = [b64_to_np(state.img_b64)] if state.img_b64 else None
-    raw = llm.generate(prompt, media=media)
-
-    final_answer = _extract_tag(raw, "final_answer")
-    code_plan_str = _extract_tag(raw, "code_plan")
-    code_plan = json.loads(code_plan_str)
-    
+    prompt, media = render_final_plan_prompt(state, prompt_template)
+    if cfg.live_display:
+        chunks = llm.generate(prompt, media=media, stream=True)
+        if not isinstance(chunks, str):
+            with LivePlanDisplay(kind="code_plan") as live:
+                result = parse_final_plan("".join(live.tee(chunks)), llm)
+                live.set_steps(result["code_plan"] or [])
+            return result
+        raw = chunks  # stream을 지원하지 않는 client
+    else:
+        raw = llm.generate(prompt, media=media)
+    result = parse_final_plan(raw, llm)
+
     # 코드 플랜 출력 추가
-    if code_plan:
-        print_code_plan(code_plan)
-    
+    if result["code_plan"]:
+        with trace.span("print_code_plan"):
+            print_code_plan(result["code_plan"])
+
+    return result
+
+def render_final_plan_prompt(state: AgentState, prompt_template: str = PROMPT_FINAL_PLAN_TEMPLATE):
+    """Returns (prompt, media) for the final-plan call (bulk mode에서도 그대로 사용)."""
+    with trace.span("render_prompt") as sp:
+        prompt = prompt_template.format(
+            user_request=state.user_request,
+            vqa_log=state.vqa_log,
+            vqa_struct_json=json.dumps(state.vqa_struct, ensure_ascii=False, indent=2),
+            observations=json.dumps(state.observations, ensure_ascii=False, indent=2, default=json_default) if state.observations else "(none)",
+            tool_desc=state.tool_desc,
+        )
+        sp.set("bytes_out", len(prompt))
+    return prompt, _llm_media(state.img_b64, state.img_path)
+
+def parse_final_plan(raw: str, llm=None) -> Dict[str, Any]:
+    with trace.span("parse_plan", bytes_in=len(raw)):
+        final_answer = _extract_tag(raw, "final_answer")
+        code_plan_str = _extract_tag(raw, "code_plan")
+        code_plan = parse_with_fallback(code_plan_str, check_code_plan, llm=llm, schema_hint=CODE_PLAN_SCHEMA_HINT)
     return {"final_answer": final_answer, "code_plan": code_plan, "raw": raw}
\ No newline at end of file
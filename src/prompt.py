@@ -222,7 +222,31 @@ Do NOT output anything outside the two tags.
 """
 
 
-def build_codegen_prompt(instruction: str, tool_desc: str = "", has_image: bool = False) -> str:
+PROMPT_FIX_JSON_TEMPLATE = """
+The JSON below is malformed or does not match the schema.
+Return ONLY the corrected JSON (no tags, no markdown, no explanation). Keep all content; change only what is needed.
+
+Schema:
+{schema}
+
+Error:
+{error}
+
+JSON:
+{text}
+"""
+
+def build_codegen_prompt(instruction: str, tool_desc: str = "", has_image: bool = False,
+                         image_arg: bool = False) -> str:
+    """image_arg=True: 생성된 스크립트를 입력 이미지로 실행해 검증하는 경우 (codegen 후보)."""
+    main_note = (
+        "- Include a __main__ block that reads the image path from sys.argv[1] "
+        "(falling back to the IMAGE_PATH environment variable), calls run() on it and prints "
+        "the returned dict with json.dumps(..., default=str) as the LAST line of stdout.\n"
+        "- If anything fails, run() must return a dict with an \"error\" key; never hide failures.\n"
+        if image_arg else
+        "- Include a __main__ block that calls run(\"image.png\") by default.\n"
+    )
     img_note = (
         "- An image is provided via base64 (img_b64). Use it ONLY if your environment supports it.\n"
         if has_image else
@@ -243,8 +267,7 @@ Hard requirements:
 - Output ONLY valid Python code (no markdown, no explanations).
 - The file must be executable as a script.
 - Provide: run(image_path: str) -> dict
-- Include a __main__ block that calls run("image.png") by default.
-{img_note}
+{main_note}{img_note}
 - Include needed imports explicitly.
 - Make it robust: basic error handling and clear variable names.
 - Do NOT print the whole image or base64. Only print summary results.
@@ -0,0 +1,233 @@
+# src/vision_agent/render.py
+"""
+Detection 시각화 렌더러.
+
+한 이미지에 대한 모든 box/label/score/mask를 한 번의 copy 위에 그리고,
+라벨 텍스트는 미리 렌더링한 sprite를 붙여 넣는다.
+디렉터리 단위 렌더링은 process pool에서 이미지별로 읽기 → 그리기 → 쓰기를 스트리밍한다.
+"""
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src import boxes as bx
+from src.masks import decode_masks
+
+Color = Tuple[int, int, int]
+
+# RGB 팔레트 (label별로 고정 색상)
+PALETTE: Tuple[Color, ...] = (
+    (0, 255, 0), (255, 56, 56), (255, 157, 151), (255, 112, 31), (255, 178, 29),
+    (207, 210, 49), (72, 249, 10), (146, 204, 23), (61, 219, 134), (26, 147, 52),
+    (0, 212, 187), (44, 153, 168), (0, 194, 255), (52, 69, 147), (100, 115, 255),
+    (0, 24, 236), (132, 56, 255), (82, 0, 133), (203, 56, 255), (255, 149, 200),
+)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def color_for(label: str) -> Color:
+    # hash()는 프로세스마다 달라지므로 worker 간 색이 같도록 직접 계산
+    return PALETTE[sum(label.encode("utf-8")) % len(PALETTE)]
+
+
+@dataclass
+class SpriteCache:
+    """Pre-rendered label sprites (text on a filled background), keyed by text/color."""
+    font_scale: float = 0.6
+    thickness: int = 1
+    pad: int = 4
+    _sprites: Dict[Tuple[str, Color], np.ndarray] = field(default_factory=dict)
+
+    def get(self, text: str, color: Color) -> np.ndarray:
+        key = (text, color)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._render(text, color)
+            self._sprites[key] = sprite
+        return sprite
+
+    def _render(self, text: str, color: Color) -> np.ndarray:
+        import cv2
+
+        (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.thickness)
+        h, w = th + baseline + 2 * self.pad, tw + 2 * self.pad
+        sprite = np.empty((h, w, 3), dtype=np.uint8)
+        sprite[:] = color
+        # 밝은 배경이면 검은 글씨, 어두우면 흰 글씨
+        fg = (0, 0, 0) if sum(color) > 382 else (255, 255, 255)
+        cv2.putText(sprite, text, (self.pad, self.pad + th), cv2.FONT_HERSHEY_SIMPLEX,
+                    self.font_scale, fg, self.thickness, cv2.LINE_AA)
+        return sprite
+
+
+_DEFAULT_SPRITES = SpriteCache()
+
+
+def _format_label(label: Optional[str], score: Optional[float]) -> str:
+    if label is None:
+        return "" if score is None else f"{score:.2f}"
+    return label if score is None else f"{label} ({score:.2f})"
+
+
+def _paste(dst: np.ndarray, sprite: np.ndarray, x: int, y: int) -> None:
+    """Paste `sprite` with its top-left at (x, y), clipped to `dst`."""
+    h, w = dst.shape[:2]
+    sh, sw = sprite.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sw, w), min(y + sh, h)
+    if x1 <= x0 or y1 <= y0:
+        return
+    dst[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def _blend_masks(out: np.ndarray, masks, colors: List[Color], alpha: float) -> None:
+    """Blend all instance masks in one pass (later instances win on overlap)."""
+    stack = np.asarray(masks, dtype=bool) if isinstance(masks, np.ndarray) else decode_masks(masks)
+    if stack.ndim == 2:
+        stack = stack[None]
+    if stack.size == 0:
+        return
+    covered = stack.any(axis=0)
+    if not covered.any():
+        return
+    # 겹치는 영역은 마지막 instance 색으로
+    owner = stack.shape[0] - 1 - np.argmax(stack[::-1], axis=0)
+    layer = np.asarray(colors, dtype=np.float32)[owner[covered]]
+    region = out[covered].astype(np.float32)
+    out[covered] = (region * (1.0 - alpha) + layer * alpha).astype(np.uint8)
+
+
+def render_detections(
+    image: np.ndarray,
+    boxes,
+    labels: Optional[Sequence[str]] = None,
+    scores: Optional[Sequence[float]] = None,
+    masks=None,
+    box_format: str = "xyxy",
+    thickness: int = 2,
+    mask_alpha: float = 0.4,
+    bgr: bool = False,
+    sprites: Optional[SpriteCache] = None,
+) -> np.ndarray:
+    """
+    Draw every detection on a single copy of `image` and return it.
+
+    Inputs:
+      - image: (H, W, 3) uint8, RGB (or BGR with bgr=True)
+      - boxes: (N, 4) in `box_format` (see src.boxes)
+      - labels / scores: optional, length N
+      - masks: optional (N, H, W) bool array or sequence of masks (dense or src.masks compact)
+    """
+    import cv2
+
+    sprites = sprites or _DEFAULT_SPRITES
+    out = np.ascontiguousarray(image[..., :3]).copy()
+    px = bx.to_int_pixels(boxes, out.shape[:2], box_format)
+    n = len(px)
+
+    names = [str(labels[i]) if labels is not None and i < len(labels) else None for i in range(n)]
+    colors = [color_for(name or "") for name in names]
+    if bgr:
+        colors = [c[::-1] for c in colors]
+
+    if masks is not None and len(masks):
+        _blend_masks(out, masks, colors, mask_alpha)
+
+    for (x1, y1, x2, y2), color in zip(px.tolist(), colors):
+        cv2.rectangle(out, (x1, y1), (x2, y2), color, thickness)
+
+    for i, (x1, y1, _, _) in enumerate(px.tolist()):
+        score = float(scores[i]) if scores is not None and i < len(scores) else None
+        text = _format_label(names[i], score)
+        if not text:
+            continue
+        sprite = sprites.get(text, colors[i])
+        # 박스 위쪽에 붙이되, 이미지 밖이면 박스 안쪽으로
+        y = y1 - sprite.shape[0] if y1 - sprite.shape[0] >= 0 else y1
+        _paste(out, sprite, x1, y)
+    return out
+
+
+def render_tool_detections(image: np.ndarray, detections: Sequence[dict], **kwargs) -> np.ndarray:
+    """Render a tool's detection list ([{"bbox", "label", "score", "mask"?}, ...])."""
+    boxes = bx.boxes_from_detections(detections) if detections else np.zeros((0, 4))
+    labels = [d.get("label", "") for d in detections]
+    scores = [d["score"] for d in detections] if detections and all("score" in d for d in detections) else None
+    masks = [d["mask"] for d in detections] if detections and all("mask" in d for d in detections) else None
+    if "box_format" not in kwargs:
+        kwargs["box_format"] = bx.infer_format(boxes)
+    return render_detections(image, boxes, labels, scores, masks, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# directory rendering
+# ---------------------------------------------------------------------------
+
+def _render_file(image_path: str, result_path: str, out_path: str) -> str:
+    import cv2
+
+    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"Failed to read image: {image_path}")
+    with open(result_path, encoding="utf-8") as f:
+        detections = json.load(f)
+    if isinstance(detections, dict):
+        detections = detections.get("detections", [])
+    rendered = render_tool_detections(img, detections, bgr=True)
+    if not cv2.imwrite(out_path, rendered):
+        raise OSError(f"Failed to write image: {out_path}")
+    return out_path
+
+
+def find_render_jobs(results_dir: Union[str, Path], out_dir: Union[str, Path]) -> List[Tuple[str, str, str]]:
+    """
+    Pair each image in `results_dir` with its `<stem>.json` detection file.
+    Returns (image_path, result_path, out_path) triples.
+    """
+    results_dir, out_dir = Path(results_dir), Path(out_dir)
+    jobs = []
+    for img_path in sorted(results_dir.iterdir()):
+        if img_path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        result_path = img_path.with_suffix(".json")
+        if result_path.exists():
+            jobs.append((str(img_path), str(result_path), str(out_dir / img_path.name)))
+    return jobs
+
+
+def iter_render_directory(
+    results_dir: Union[str, Path],
+    out_dir: Union[str, Path],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Render every image/result pair in `results_dir` into `out_dir` using a process pool.
+    Workers read, draw and write their own file; at most `max_in_flight` images are
+    decoded at once. Yields output paths as they are written (completion order).
+    """
+    jobs = find_render_jobs(results_dir, out_dir)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            pending.add(pool.submit(_render_file, *job))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        for fut in as_completed(pending):
+            yield fut.result()
+
+
+def render_directory(results_dir: Union[str, Path], out_dir: Union[str, Path], workers: Optional[int] = None) -> List[str]:
+    return list(iter_render_directory(results_dir, out_dir, workers=workers))
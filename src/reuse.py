@@ -0,0 +1,100 @@
+# src/vision_agent/reuse.py
+"""
+Near-duplicate 이미지 결과 재사용.
+
+같은 줄/같은 카메라에서 몇 초 간격으로 찍은 사진은 거의 동일하므로,
+perceptual hash가 `max_distance` 이내이고 (정규화한) 요청이 같으면
+이전 이미지의 VQA 결과와 code plan을 그대로 가져다 쓰고 LLM 호출을 건너뛴다.
+"""
+import base64
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from src.phash import HASHES, BKTree, open_for_hash
+from src.types import AgentState
+
+
+def normalize_request(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class ReuseIndex:
+    """
+    Perceptual-hash index of processed images → reusable pipeline results.
+
+    - method: "dhash" | "phash"
+    - max_distance: Hamming radius (out of 64 bits) treated as "same scene"; 0 = exact hash only
+    """
+
+    def __init__(self, method: str = "phash", max_distance: int = 6, path: Optional[Union[str, Path]] = None):
+        if method not in HASHES:
+            raise ValueError(f"Unknown hash method: {method}")
+        self.method = method
+        self.max_distance = max_distance
+        self.path = Path(path) if path else None
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        if self.path and self.path.exists():
+            self.load(self.path)
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def hash_b64(self, img_b64: str) -> int:
+        return HASHES[self.method](open_for_hash(base64.b64decode(img_b64)))
+
+    def hash_image(self, img_b64: Optional[str] = None, img_path: Optional[str] = None) -> int:
+        return HASHES[self.method](open_for_hash(img_path)) if img_path else self.hash_b64(img_b64)
+
+    def lookup(self, img_hash: int, user_request: str) -> Optional[Dict[str, Any]]:
+        """Nearest entry for the same request within max_distance (adds "distance")."""
+        req = normalize_request(user_request)
+        with self._lock:
+            matches = self._tree.search(img_hash, self.max_distance)
+        for d, _, entry in matches:
+            if entry["request"] == req:
+                self.stats["hits"] += 1
+                return {**entry, "distance": d}
+        self.stats["misses"] += 1
+        return None
+
+    def add(self, img_hash: int, state: AgentState) -> None:
+        entry = {
+            "request": normalize_request(state.user_request),
+            "vqa_struct": state.vqa_struct,
+            "vqa_log": state.vqa_log,
+            "code_plan": state.code_plan,
+        }
+        with self._lock:
+            self._tree.add(img_hash, entry)
+
+    def apply(self, state: AgentState, entry: Dict[str, Any]) -> AgentState:
+        state.vqa_struct = entry["vqa_struct"]
+        state.vqa_log = entry["vqa_log"]
+        if entry.get("code_plan") is not None:
+            state.code_plan = entry["code_plan"]
+        return state
+
+    # ---- persistence (batch job 간 공유) ----
+    def save(self, path: Optional[Union[str, Path]] = None) -> Path:
+        path = Path(path or self.path)
+        with self._lock:
+            rows = [{"hash": f"{h:016x}", **entry} for h, entry in self._tree.items()]
+        data = {"method": self.method, "entries": rows}
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+    def load(self, path: Union[str, Path]) -> None:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("method") != self.method:
+            raise ValueError(f"Index at {path} uses {data.get('method')}, expected {self.method}")
+        with self._lock:
+            for row in data["entries"]:
+                h = int(row.pop("hash"), 16)
+                self._tree.add(h, row)
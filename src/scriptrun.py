@@ -0,0 +1,114 @@
+# src/vision_agent/scriptrun.py
+"""
+생성된 스크립트 검사/실행 (codegen 후보 검증용).
+
+격리 환경이 아니다: 스크립트는 현재 사용자 권한으로 돌고 네트워크/파일시스템에 그대로 접근할 수 있다.
+신뢰할 수 없는 코드를 막는 용도로 쓰지 말 것.
+
+- static_check: 파싱 + 흔한 위험 호출(프로세스/네트워크/파일 삭제)을 거르는 lint.
+  `from subprocess import run`, `__import__` 등으로 쉽게 우회되므로 보안 장치가 아니다.
+- run_script: 후보마다 별도 임시 디렉터리에서 별도 python 프로세스로 실행.
+  환경변수는 최소한(PATH, MPLBACKEND, IMAGE_PATH)만 넘긴다 — API 키 등은 물려주지 않는다.
+  입력 이미지 경로는 argv[1]과 IMAGE_PATH 환경변수로 넘긴다.
+  `cancel` Event가 set되면 실행 중인 프로세스를 종료한다.
+"""
+import ast
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+_BANNED_CALLS = {
+    "os.system", "os.remove", "os.unlink", "os.rmdir", "os.kill",
+    "shutil.rmtree", "subprocess.run", "subprocess.Popen", "subprocess.call",
+    "subprocess.check_call", "subprocess.check_output",
+}
+_BANNED_IMPORTS = {"socket", "requests", "urllib", "http"}
+
+
+@dataclass
+class ScriptResult:
+    ok: bool
+    returncode: Optional[int]
+    stdout: str = ""
+    stderr: str = ""
+    elapsed_s: float = 0.0
+    cancelled: bool = False
+    timed_out: bool = False
+
+
+def _dotted(node: ast.AST) -> str:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def static_check(code: str) -> Optional[str]:
+    """None if the script looks runnable, otherwise the reason."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"SyntaxError: {e.msg} (line {e.lineno})"
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and _dotted(node.func) in _BANNED_CALLS:
+            return f"banned call: {_dotted(node.func)}"
+        if isinstance(node, ast.Import):
+            names = [a.name.split(".")[0] for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [(node.module or "").split(".")[0]]
+        else:
+            continue
+        bad = [n for n in names if n in _BANNED_IMPORTS]
+        if bad:
+            return f"banned import: {bad[0]}"
+    return None
+
+
+def run_script(
+    script: Union[str, Path],
+    image_path: Optional[Union[str, Path]] = None,
+    timeout_s: float = 60.0,
+    cancel: Optional[threading.Event] = None,
+    poll_s: float = 0.05,
+) -> ScriptResult:
+    script = Path(script).absolute()
+    cmd = [sys.executable, str(script)] + ([str(image_path)] if image_path else [])
+    env = {"PATH": os.environ.get("PATH", os.defpath), "MPLBACKEND": "Agg", "PYTHONDONTWRITEBYTECODE": "1"}
+    if image_path:
+        env["IMAGE_PATH"] = str(image_path)
+
+    t0 = time.monotonic()
+    proc = subprocess.Popen(cmd, cwd=script.parent, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    cancelled = timed_out = False
+    while True:
+        try:
+            stdout, stderr = proc.communicate(timeout=poll_s)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+            elif time.monotonic() - t0 > timeout_s:
+                timed_out = True
+            else:
+                continue
+            proc.kill()
+            stdout, stderr = proc.communicate()
+            break
+    return ScriptResult(
+        ok=proc.returncode == 0 and not (cancelled or timed_out),
+        returncode=proc.returncode,
+        stdout=stdout[-4000:],
+        stderr=stderr[-4000:],
+        elapsed_s=time.monotonic() - t0,
+        cancelled=cancelled,
+        timed_out=timed_out,
+    )
@@ -0,0 +1,298 @@
+# src/vision_agent/server.py
+"""
+Long-running agent service (stdlib asyncio, 의존성 추가 없음).
+
+  POST /v1/agent   {"request": str, "image_b64"?: str, "image_path"?: str, "deadline_s"?: float}
+                   image_path는 ServerConfig.image_root 아래 파일만 허용 (image_root가 없으면 거부)
+                   → 200 {"job_id", "code_plan", "code", "file", "elapsed_ms"}
+                   → 429 queue full (Retry-After), 504 deadline exceeded, 400/500 on errors
+  GET  /healthz    → 200 {"status": "ok"}
+  GET  /metrics    → 200 queue/in-flight/counters/latency percentiles
+
+Pipeline은 sync 코드이므로 worker task가 ThreadPoolExecutor에서 실행한다.
+deadline이 지나면 504를 바로 돌려주고 job의 cancel event를 set한다. pipeline은 다음 단계 전에 멈추며,
+그 thread가 실제로 끝날 때까지 worker slot과 in_flight는 반납하지 않는다 (backpressure가 실제 부하를 반영).
+Config(reuse_clients=True, coalesce_calls=True)로 LMM client를 프로세스 수명 동안 재사용하고
+동시에 들어온 동일한 LMM 호출은 하나로 합친다.
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src import pipeline
+from src.config import Config
+from src.types import AgentState
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+            503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+@dataclass
+class Job:
+    job_id: str
+    payload: Dict[str, Any]
+    deadline: float  # loop.time() 기준
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.monotonic)
+    cancel: threading.Event = field(default_factory=threading.Event)
+    img_path: Optional[str] = None
+
+
+@dataclass
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    workers: int = 4
+    queue_size: int = 32
+    default_deadline_s: float = 300.0
+    max_deadline_s: float = 900.0
+    workdir: Path = Path(".agent_jobs")
+    # 요청의 image_path는 이 디렉터리 아래만 허용. None이면 image_path 입력을 받지 않는다
+    image_root: Optional[Path] = None
+
+
+class Metrics:
+    def __init__(self, window: int = 1024):
+        self.counters: Dict[str, int] = {"accepted": 0, "rejected": 0, "completed": 0,
+                                         "failed": 0, "timed_out": 0}
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.started = time.time()
+
+    def snapshot(self, queue_depth: int, in_flight: int) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+
+        def pct(q: float) -> Optional[float]:
+            return round(lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+
+        return {"uptime_s": round(time.time() - self.started, 1), "queue_depth": queue_depth,
+                "in_flight": in_flight, **self.counters,
+                "latency_ms": {"p50": pct(0.5), "p90": pct(0.9), "p99": pct(0.99)}}
+
+
+class AgentService:
+    def __init__(self, config: Optional[ServerConfig] = None, agent_config: Optional[Config] = None,
+                 tool_registry: Optional[Dict[str, Any]] = None, tool_desc: str = ""):
+        self.config = config or ServerConfig()
+        self.agent_config = agent_config or Config(reuse_clients=True, coalesce_calls=True)
+        self.tool_registry = tool_registry or {}
+        self.tool_desc = tool_desc
+        self.metrics = Metrics()
+        self.in_flight = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix="agent")
+        self._workers: list = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ---- lifecycle ----
+    async def start(self) -> None:
+        pipeline.set_config(self.agent_config)
+        # client를 미리 만들어서 첫 요청에 생성 비용이 붙지 않게
+        self.agent_config.create_planner()
+        self.agent_config.create_coder()
+        self.config.workdir.mkdir(parents=True, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.config.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.config.workers)]
+        self._server = await asyncio.start_server(self._handle_conn, self.config.host, self.config.port)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- admission / workers ----
+    def submit(self, payload: Dict[str, Any]) -> Job:
+        if not isinstance(payload.get("request"), str) or not payload["request"].strip():
+            raise HTTPError(400, "'request' (non-empty string) is required")
+        if payload.get("image_b64") is not None and not isinstance(payload["image_b64"], str):
+            raise HTTPError(400, "'image_b64' must be a string")
+        img_path = self._resolve_image_path(payload.get("image_path")) if not payload.get("image_b64") else None
+        loop = asyncio.get_running_loop()
+        job = Job(uuid.uuid4().hex[:12], payload, loop.time() + self._deadline_s(payload.get("deadline_s")),
+                  loop.create_future(), img_path=img_path)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.metrics.counters["rejected"] += 1
+            # 대략적인 대기 시간 힌트
+            p50 = self.metrics.snapshot(0, 0)["latency_ms"]["p50"] or 1000.0
+            retry = max(1, int(p50 / 1000 * self._queue.qsize() / max(self.config.workers, 1)))
+            raise HTTPError(429, "queue full", {"Retry-After": str(retry)})
+        self.metrics.counters["accepted"] += 1
+        return job
+
+    def _deadline_s(self, value: Any) -> float:
+        if value is None:
+            return self.config.default_deadline_s
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+            raise HTTPError(400, "'deadline_s' must be a positive number")
+        return min(float(value), self.config.max_deadline_s)
+
+    def _resolve_image_path(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        if not isinstance(value, str) or not value:
+            raise HTTPError(400, "'image_path' must be a non-empty string")
+        if self.config.image_root is None:
+            raise HTTPError(400, "'image_path' is not enabled on this server; send image_b64")
+        root = self.config.image_root.resolve()
+        path = (root / value).resolve()
+        if not path.is_relative_to(root):
+            raise HTTPError(400, "'image_path' must be inside the server's image root")
+        if not path.is_file():
+            raise HTTPError(400, f"image_path not found: {value}")
+        return str(path)
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job: Job = await self._queue.get()
+            try:
+                remaining = job.deadline - loop.time()
+                if remaining <= 0:
+                    # 대기열에서 이미 deadline이 지난 요청은 실행하지 않는다
+                    raise asyncio.TimeoutError
+                self.in_flight += 1
+                fut = loop.run_in_executor(self._executor, self._run_job, job)
+                try:
+                    # shield: timeout이 나도 thread의 결과를 끝까지 기다릴 수 있게
+                    result = await asyncio.wait_for(asyncio.shield(fut), timeout=remaining)
+                except asyncio.TimeoutError:
+                    job.cancel.set()
+                    if not job.future.done():
+                        job.future.set_exception(HTTPError(504, "deadline exceeded"))
+                    # pipeline은 다음 단계 전에 멈춘다. 그때까지 slot을 잡고 있는다
+                    await asyncio.gather(fut, return_exceptions=True)
+                    raise
+                finally:
+                    self.in_flight -= 1
+                self.metrics.counters["completed"] += 1
+                self.metrics.latencies_ms.append((time.monotonic() - job.enqueued) * 1e3)
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.TimeoutError:
+                self.metrics.counters["timed_out"] += 1
+                if not job.future.done():
+                    job.future.set_exception(HTTPError(504, "deadline exceeded"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.counters["failed"] += 1
+                if not job.future.done():
+                    job.future.set_exception(e if isinstance(e, HTTPError) else HTTPError(500, repr(e)))
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job: Job) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        payload = job.payload
+        img_b64 = payload.get("image_b64")
+        img_path = job.img_path
+
+        out_file = self.config.workdir / job.job_id / "extract_code.py"
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        state = AgentState(user_request=payload["request"], img_b64=img_b64, img_path=img_path)
+        state = pipeline.run_agent(state, None, tool_desc=self.tool_desc, tool_registry=self.tool_registry,
+                                   cancel=job.cancel)
+        result = pipeline.run_coder_after_final_plan(state, None, out_filename=str(out_file), cancel=job.cancel)
+        return {
+            "job_id": job.job_id,
+            "code_plan": state.code_plan,
+            "code": Path(result["file"]).read_text(encoding="utf-8"),
+            "file": result["file"],
+            "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 1),
+        }
+
+    # ---- HTTP ----
+    async def _handle_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, body, headers = await self._dispatch(reader)
+        except HTTPError as e:
+            status, body, headers = e.status, {"error": str(e)}, e.headers
+        except Exception as e:
+            status, body, headers = 500, {"error": repr(e)}, {}
+        data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(data)}", "Connection: close"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, Any, Dict[str, str]]:
+        method, path, headers = await _read_head(reader)
+        if path == "/healthz":
+            return 200, {"status": "ok"}, {}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot(self._queue.qsize(), self.in_flight), {}
+        if path != "/v1/agent":
+            raise HTTPError(404, f"no route: {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "body too large")
+        try:
+            payload = json.loads(await reader.readexactly(length)) if length else {}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise HTTPError(400, f"invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+
+        job = self.submit(payload)
+        return 200, await job.future, {}
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str]]:
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise HTTPError(400, "malformed request")
+    lines = raw.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    return parts[0].upper(), parts[1].split("?", 1)[0], headers
+
+
+def serve(config: Optional[ServerConfig] = None, **kwargs: Any) -> None:
+    asyncio.run(AgentService(config, **kwargs).serve_forever())
@@ -0,0 +1,205 @@
+# src/vision_agent/shm.py
+"""
+Shared-memory image transport for process pools.
+
+이미지를 한 번만 shared memory에 올리고 worker에는 작은 handle(SharedImage)만 pickle해서 보낸다.
+
+    store = ImageStore()
+    h = store.publish(image, key=digest)     # 같은 key면 다시 올리지 않고 refcount만 +1
+    pool.submit(fn, h)                       # worker: h.array() → 복사 없는 read-only view
+    store.release(h)                         # refcount 0이면 unlink
+
+- refcount는 publish한 process(ImageStore)가 관리한다. worker는 attach만 하고 unlink하지 않는다.
+- worker 쪽 attach는 process별로 캐시한다 (같은 이미지로 여러 task가 와도 mmap 한 번).
+- 프로세스 종료 시 default store의 남은 segment는 atexit에서 정리된다.
+"""
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def array(self) -> np.ndarray:
+        return attach(self)
+
+
+# ---------------------------------------------------------------------------
+# worker side
+# ---------------------------------------------------------------------------
+
+# publisher가 unlink해도 attach된 mapping은 worker가 close해야 메모리가 풀리므로 최근 것만 유지
+MAX_ATTACHED = 8
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+_attach_lock = threading.Lock()
+
+
+def attach(handle: SharedImage) -> np.ndarray:
+    """Read-only ndarray view on the shared segment (no copy)."""
+    with _attach_lock:
+        shm = _attached.get(handle.name)
+        if shm is None:
+            # multiprocessing으로 만든 worker는 publisher와 resource tracker를 공유하므로
+            # attach 시의 register는 no-op이고 unlink 책임은 publisher에만 남는다
+            shm = shared_memory.SharedMemory(name=handle.name)
+            _attached[handle.name] = shm
+            for name in list(_attached)[:-MAX_ATTACHED]:
+                try:
+                    _attached[name].close()
+                except BufferError:
+                    continue  # 아직 쓰는 view가 있으면 다음에
+                del _attached[name]
+        else:
+            _attached.move_to_end(handle.name)
+    arr = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=shm.buf)
+    arr.flags.writeable = False
+    return arr
+
+
+def detach(name: str) -> None:
+    with _attach_lock:
+        shm = _attached.pop(name, None)
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # 남은 view가 GC되면 mapping도 해제된다
+
+
+def resolve(obj: Any) -> Any:
+    """Replace SharedImage handles inside params (dict/list/tuple) with arrays."""
+    if isinstance(obj, SharedImage):
+        return obj.array()
+    if isinstance(obj, dict):
+        return {k: resolve(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(resolve(v) for v in obj)
+    return obj
+
+
+# ---------------------------------------------------------------------------
+# publisher side
+# ---------------------------------------------------------------------------
+
+class ImageStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._refs: Dict[str, int] = {}
+        self._handles: Dict[str, SharedImage] = {}
+        self._by_key: Dict[str, str] = {}
+        self.stats = {"published": 0, "reused": 0, "bytes": 0}
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def get(self, key: str) -> Optional[SharedImage]:
+        """Existing handle for `key` with refcount +1, or None."""
+        with self._lock:
+            name = self._by_key.get(key)
+            if name is None:
+                return None
+            self._refs[name] += 1
+            self.stats["reused"] += 1
+            return self._handles[name]
+
+    def publish(self, arr: np.ndarray, key: Optional[str] = None) -> SharedImage:
+        if key is not None:
+            handle = self.get(key)
+            if handle is not None:
+                return handle
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        handle = SharedImage(shm.name, tuple(arr.shape), arr.dtype.str)
+        with self._lock:
+            if key is not None and key in self._by_key:
+                # 동시에 같은 key로 publish한 경우: 먼저 올라간 것을 쓴다
+                shm.close()
+                shm.unlink()
+                name = self._by_key[key]
+                self._refs[name] += 1
+                self.stats["reused"] += 1
+                return self._handles[name]
+            self._segments[shm.name] = shm
+            self._refs[shm.name] = 1
+            self._handles[shm.name] = handle
+            if key is not None:
+                self._by_key[key] = shm.name
+            self.stats["published"] += 1
+            self.stats["bytes"] += arr.nbytes
+        return handle
+
+    def acquire(self, handle: SharedImage) -> SharedImage:
+        with self._lock:
+            if handle.name not in self._refs:
+                raise ValueError(f"Unknown or released shared image: {handle.name}")
+            self._refs[handle.name] += 1
+        return handle
+
+    def release(self, handle: SharedImage) -> None:
+        with self._lock:
+            n = self._refs.get(handle.name)
+            if n is None:
+                return
+            if n > 1:
+                self._refs[handle.name] = n - 1
+                return
+            shm = self._drop(handle.name)
+        detach(handle.name)
+        shm.close()
+        shm.unlink()
+
+    def _drop(self, name: str) -> shared_memory.SharedMemory:
+        self._refs.pop(name)
+        self._handles.pop(name)
+        self._by_key = {k: v for k, v in self._by_key.items() if v != name}
+        return self._segments.pop(name)
+
+    @contextmanager
+    def lease(self, arr: np.ndarray, key: Optional[str] = None) -> Iterator[SharedImage]:
+        handle = self.publish(arr, key)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def close(self) -> None:
+        """Unlink every segment regardless of refcount."""
+        with self._lock:
+            names = list(self._segments)
+            segments = [self._drop(n) for n in names]
+        for name, shm in zip(names, segments):
+            detach(name)
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_default_store: Optional[ImageStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> ImageStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ImageStore()
+            atexit.register(_default_store.close)
+        return _default_store
@@ -0,0 +1,176 @@
+# src/vision_agent/singleflight.py
+"""
+Single-flight: 동시에 들어온 동일한 호출은 하나만 실행하고 나머지는 그 결과를 공유한다.
+
+- 결과는 완료되는 순간 key에서 빠진다 (cache가 아님). 완료 이후의 재사용은 cache의 몫.
+- sync(`do`)와 async(`do_async`) 경로가 같은 in-flight 테이블(concurrent.futures.Future)을 공유한다.
+- 공유된 결과 객체는 모든 caller가 같이 보므로 caller는 결과를 변경하지 말 것.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from src.llm import LMM
+
+
+# ---------------------------------------------------------------------------
+# keys
+# ---------------------------------------------------------------------------
+
+def _digest_value(v: Any) -> Any:
+    if isinstance(v, np.ndarray):
+        arr = np.ascontiguousarray(v)
+        return {"ndarray": hashlib.blake2b(arr.data, digest_size=16).hexdigest(),
+                "shape": list(arr.shape), "dtype": arr.dtype.str}
+    if isinstance(v, (bytes, bytearray)):
+        return {"bytes": hashlib.blake2b(v, digest_size=16).hexdigest()}
+    if isinstance(v, Path):
+        try:
+            st = v.stat()
+            return {"path": str(v.resolve()), "mtime": st.st_mtime_ns, "size": st.st_size}
+        except OSError:
+            return {"path": str(v)}
+    if isinstance(v, dict):
+        return {str(k): _digest_value(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_digest_value(x) for x in v]
+    if hasattr(v, "tobytes") and hasattr(v, "size") and hasattr(v, "mode"):  # PIL.Image
+        return {"pil": hashlib.blake2b(v.tobytes(), digest_size=16).hexdigest(), "size": list(v.size), "mode": v.mode}
+    return v
+
+
+def make_key(*parts: Any) -> str:
+    """Stable digest of JSON-able parts; arrays/bytes/paths are replaced by content digests."""
+    payload = json.dumps(_digest_value(list(parts)), sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def text_digest(text: Optional[str]) -> Optional[str]:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest() if text else None
+
+
+def llm_call_key(lmm: Any, chat: Sequence[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    messages = []
+    for msg in chat:
+        media = [Path(m) if isinstance(m, str) else m for m in msg.get("media", []) or []]
+        messages.append({"role": msg.get("role"), "content": msg.get("content"), "media": media})
+    return make_key("llm", type(lmm).__name__, getattr(lmm, "model_name", None),
+                    getattr(lmm, "kwargs", {}), kwargs, messages)
+
+
+def tool_call_key(tool: str, params: Dict[str, Any], image_digest: Optional[str] = None) -> str:
+    """
+    Tool call key. `image_digest` identifies the session image when `params` still holds
+    the "image" placeholder, so the key can be computed before decoding.
+    """
+    return make_key("tool", tool, params, image_digest)
+
+
+# ---------------------------------------------------------------------------
+# single-flight
+# ---------------------------------------------------------------------------
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def _join(self, key: str):
+        """Returns (future, is_leader)."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.stats["shared"] += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            self.stats["leaders"] += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future, result: Any = None, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Optional[str], fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn` once per in-flight `key`; concurrent callers block on the leader's result."""
+        if key is None:
+            return fn(*args, **kwargs)
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, fut, exc=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    async def do_async(self, key: Optional[str], fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Async variant. `fn` may be a coroutine function or a plain callable
+        (plain callables run in the default executor so the loop is not blocked).
+        """
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(*args, **kwargs)
+            return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+        if key is None:
+            return await call()
+        fut, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            result = await call()
+        except BaseException as e:
+            # leader가 cancel되면 follower에게도 CancelledError가 전달된다
+            self._finish(key, fut, exc=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+
+class CoalescingLMM(LMM):
+    """LMM wrapper: identical concurrent generate/chat calls share one request."""
+
+    def __init__(self, inner: LMM, flight: Optional[SingleFlight] = None):
+        self.inner = inner
+        self.flight = flight or SingleFlight()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def generate(self, prompt: str, media=None, **kwargs: Any):
+        chat = [{"role": "user", "content": prompt}]
+        if media:
+            chat[0]["media"] = media
+        return self.chat(chat, **kwargs)
+
+    def chat(self, chat, **kwargs: Any):
+        if kwargs.get("stream") or getattr(self.inner, "kwargs", {}).get("stream"):
+            # generator는 공유할 수 없다
+            return self.inner.chat(chat, **kwargs)
+        key = llm_call_key(self.inner, chat, kwargs)
+        return self.flight.do(key, self.inner.chat, chat, **kwargs)
+
+    async def achat(self, chat, **kwargs: Any):
+        key = llm_call_key(self.inner, chat, kwargs)
+        return await self.flight.do_async(key, self.inner.chat, chat, **kwargs)
@@ -0,0 +1,146 @@
+# src/vision_agent/streamjson.py
+"""
+LMM 응답 stream에서 태그 안 JSON 배열의 원소를 완성되는 즉시 꺼낸다.
+
+  - ToolCallStream: `<plan_json>`의 "tool_calls" 배열 원소 (executor dispatch)
+  - CodePlanStream: `<code_plan>` 최상위 배열의 step 원소 (live display)
+
+    stream = ToolCallStream()
+    for chunk in llm.generate(prompt, stream=True):
+        for tc in stream.feed(chunk):
+            ...            # tool call 객체 하나가 닫히는 순간 dispatch
+    raw = stream.text      # 전체 응답 (최종 parse/repair용)
+
+문자열/escape 상태와 괄호 depth만 추적하는 단순 scanner이고, 각 chunk는 한 번만 훑는다.
+완성된 원소 하나는 jsonrepair.loads_tolerant로 파싱한다 (trailing comma 등 허용).
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from src.jsonrepair import PlanParseError, loads_tolerant
+
+
+class JsonArrayStream:
+    """Elements of the array under `key` (None: the top-level array) inside `<tag>`."""
+
+    def __init__(self, tag: str, key: Optional[str] = None):
+        self._key = re.compile(rf'"{re.escape(key)}"\s*:\s*$') if key else None
+        self._open_tag = re.compile(rf"<{tag}>", re.IGNORECASE)
+        self._parts: List[str] = []
+        self._buf = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._array_depth: Optional[int] = None  # 대상 배열 안쪽의 depth
+        self._obj_start: Optional[int] = None
+        self.done = False
+        self.emitted = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: Optional[str]) -> List[Dict[str, Any]]:
+        """Consume a chunk; returns the elements completed by it (in order)."""
+        if not chunk:
+            return []
+        self._parts.append(chunk)
+        if self.done:
+            return []
+        self._buf += chunk
+
+        if not self._started:
+            m = self._open_tag.search(self._buf)
+            if m is None:
+                # 태그가 chunk 경계에 걸칠 수 있으니 꼬리만 남긴다
+                self._buf = self._buf[-32:]
+                return []
+            self._started = True
+            self._buf = self._buf[m.end():]
+            self._pos = 0
+        return self._scan()
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+            elif c == '"':
+                self._in_str = True
+            elif c in "{[":
+                self._depth += 1
+                if c == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._obj_start = i
+                elif c == "[" and self._array_depth is None and self._is_array_start(buf, i):
+                    self._array_depth = self._depth
+            elif c in "}]":
+                self._depth -= 1
+                if c == "}" and self._obj_start is not None and self._depth == self._array_depth:
+                    tc = self._parse(buf[self._obj_start:i + 1])
+                    self._obj_start = None
+                    if tc is None:
+                        # 이후 원소는 최종 parse에 맡긴다 (원소 index가 어긋나지 않도록)
+                        self.done = True
+                        break
+                    out.append(tc)
+                elif c == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self.done = True
+                    break
+                if self._depth <= 0:
+                    self.done = True
+                    break
+            elif c == "<" and self._depth == 0:
+                # JSON이 시작되기 전에 닫는 태그가 나오면 포기
+                self.done = True
+                break
+            i += 1
+
+        # 진행 중인 원소 이전 부분은 버려서 buf가 커지지 않게 한다
+        keep = self._obj_start if self._obj_start is not None else max(0, i - 64)
+        self._buf = buf[keep:]
+        self._pos = i - keep
+        if self._obj_start is not None:
+            self._obj_start = 0
+        if self.done:
+            self._buf = ""
+        self.emitted += len(out)
+        return out
+
+    def _is_array_start(self, buf: str, i: int) -> bool:
+        if self._key is None:
+            return self._depth == 1
+        return self._depth == 2 and self._key.search(buf, max(0, i - 64), i) is not None
+
+    def _parse(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = loads_tolerant(text)
+        except PlanParseError:
+            return None
+        return obj if isinstance(obj, dict) and self._accept(obj) else None
+
+    def _accept(self, obj: Dict[str, Any]) -> bool:
+        return True
+
+
+class ToolCallStream(JsonArrayStream):
+    def __init__(self, tag: str = "plan_json"):
+        super().__init__(tag, key="tool_calls")
+
+    def _accept(self, obj: Dict[str, Any]) -> bool:
+        return isinstance(obj.get("tool"), str)
+
+
+class CodePlanStream(JsonArrayStream):
+    def __init__(self, tag: str = "code_plan"):
+        super().__init__(tag, key=None)
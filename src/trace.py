@@ -0,0 +1,257 @@
+# src/vision_agent/trace.py
+"""
+Lightweight per-stage tracing.
+
+    from src import trace
+    with trace.tracing() as tracer:
+        run_agent(...)
+    tracer.to_jsonl("trace.jsonl")
+    tracer.to_chrome_trace("trace.json")   # chrome://tracing / Perfetto
+
+꺼져 있을 때(default) span()은 공용 no-op 객체를 돌려주므로 비용은 flag 확인 한 번뿐이다.
+
+stage()는 pipeline 단계(stage.vqa/plan/code, execute_plan, generate_code)용 span으로,
+등록된 stage hook(src.memprof 등)도 같은 구간에 걸어준다.
+
+Span attributes used across the pipeline:
+  bytes_uploaded, bytes_in, bytes_out, prompt_tokens, response_tokens, cache_hit, model, tool, ok
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Union
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "span_id", "parent_id", "start_ns", "end_ns", "tid", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = 0
+        self.parent_id: Optional[int] = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.tid = 0
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+
+    def add(self, key: str, value: Union[int, float]) -> None:
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        parent = _current.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = self.tracer._next_id()
+        self.tid = threading.get_ident()
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current.reset(self._token)
+        self.tracer._record(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "start_ms": (self.start_ns - self.tracer.origin_ns) / 1e6,
+            "duration_ms": self.duration_ms,
+            "tid": self.tid,
+            **({"attrs": self.attrs} if self.attrs else {}),
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add(self, key: str, value: Union[int, float]) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self):
+        self.origin_ns = time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per span name: count, total/max duration (ms) and summed numeric attrs."""
+        out: Dict[str, Dict[str, float]] = {}
+        for s in list(self.spans):
+            row = out.setdefault(s.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            row["count"] += 1
+            row["total_ms"] += s.duration_ms
+            row["max_ms"] = max(row["max_ms"], s.duration_ms)
+            for k, v in s.attrs.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    row[k] = row.get(k, 0) + v
+                elif isinstance(v, bool):
+                    row[k] = row.get(k, 0) + int(v)
+        return out
+
+    def to_jsonl(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        with path.open("w", encoding="utf-8") as f:
+            for s in sorted(self.spans, key=lambda s: s.start_ns):
+                f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+        return path
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        pid = os.getpid()
+        return [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": (s.start_ns - self.origin_ns) / 1e3,
+                "dur": (s.end_ns - s.start_ns) / 1e3,
+                "pid": pid,
+                "tid": s.tid,
+                "args": {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                         for k, v in s.attrs.items()},
+            }
+            for s in sorted(self.spans, key=lambda s: s.start_ns)
+        ]
+
+    def to_chrome_trace(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}), encoding="utf-8")
+        return path
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(tracer: Optional[Tracer] = None) -> Tracer:
+    global _tracer
+    _tracer = tracer or Tracer()
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **attrs: Any):
+    """Context manager timing a block; a shared no-op when tracing is disabled."""
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return Span(tracer, name, attrs)
+
+
+_stage_hooks: List[Callable[[str], ContextManager]] = []
+
+
+def add_stage_hook(hook: Callable[[str], ContextManager]) -> None:
+    """`hook(stage_name)` returns a context manager entered around every stage()."""
+    if hook not in _stage_hooks:
+        _stage_hooks.append(hook)
+
+
+def remove_stage_hook(hook: Callable[[str], ContextManager]) -> None:
+    if hook in _stage_hooks:
+        _stage_hooks.remove(hook)
+
+
+def stage(name: str, **attrs: Any):
+    """span() for pipeline stages; also runs registered stage hooks."""
+    if not _stage_hooks:
+        return span(name, **attrs)
+    return _hooked_stage(name, attrs)
+
+
+@contextmanager
+def _hooked_stage(name: str, attrs: Dict[str, Any]):
+    with span(name, **attrs) as sp, ExitStack() as stack:
+        for hook in list(_stage_hooks):
+            stack.enter_context(hook(name))
+        yield sp
+
+
+def current_span():
+    """The innermost active span (or the no-op span), for attaching attrs from deeper code."""
+    if _tracer is None:
+        return NOOP_SPAN
+    return _current.get() or NOOP_SPAN
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of span()."""
+    def deco(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """Enable tracing for the block and restore the previous tracer afterwards."""
+    global _tracer
+    prev = _tracer
+    t = enable(tracer)
+    try:
+        yield t
+    finally:
+        _tracer = prev
@@ -1,12 +1,21 @@
 from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
-@dataclass
+@dataclass(slots=True)
 class AgentState:
     user_request: str
     img_b64: Optional[str] = None
+    # 파일 입력이면 base64 대신 경로만 들고 다닌다 (필요한 해상도로 그때그때 decode)
+    img_path: Optional[str] = None
     vqa_struct: dict = field(default_factory=dict)
     vqa_log: str = ""
     tool_desc: str = ""
     observations: list = field(default_factory=list)
-    code_plan: Optional[list] = None
\ No newline at end of file
+    code_plan: Optional[list] = None
+
+    # 실행 환경 (checkpoint에는 저장하지 않음)
+    tool_registry: Dict[str, Any] = field(default_factory=dict)
+
+    # 기록(리플레이/디버깅)
+    all_execs: list = field(default_factory=list)
+    code_result: Optional[dict] = None
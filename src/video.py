@@ -0,0 +1,152 @@
+# src/vision_agent/video.py
+"""
+Video 입력 처리 (PyAV).
+
+- 프레임은 stream으로 decode하고, 샘플링된 프레임만 ndarray로 변환 → clip 전체를 메모리에 올리지 않는다
+- target fps에 맞춰 timestamp 기준으로 샘플링. max_frames가 있으면 간격을 stream 길이/max_frames 이상으로
+  늘려서 앞부분만이 아니라 clip 전체에 고르게 분포시킨다
+- 직전에 남긴 프레임과 dhash Hamming 거리가 `max_distance` 이하면 near-duplicate로 버린다
+- 남은 프레임은 `batch_size` 단위 batch로 LMM/tool에 넘긴다 (메모리 상한 = batch_size 프레임)
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src import trace
+from src.phash import dhash, hamming
+
+VIDEO_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+
+
+@dataclass
+class VideoFrame:
+    index: int          # decode 순서 기준 frame 번호
+    time: float         # 초
+    image: np.ndarray   # (H, W, 3) RGB
+    hash: int
+
+
+def is_video(media: Any) -> bool:
+    return isinstance(media, (str, Path)) and Path(media).suffix.lower() in VIDEO_SUFFIXES
+
+
+def iter_frames(
+    path: Union[str, Path],
+    fps: float = 1.0,
+    max_side: Optional[int] = 768,
+    max_distance: int = 4,
+    max_frames: Optional[int] = None,
+) -> Iterator[VideoFrame]:
+    """
+    Stream sampled, de-duplicated frames from a video file.
+
+    - fps: target sampling rate (frames per second of video time); <= 0 keeps every frame
+    - max_side: downscale so the longer side is at most this (None keeps decode size)
+    - max_distance: dhash Hamming distance at or below which a frame counts as a duplicate (-1 disables)
+    - max_frames: cap on yielded frames; the sampling interval is widened to span the whole duration
+    """
+    import av
+
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        interval = 1.0 / fps if fps > 0 else 0.0
+        duration = _duration_s(container, stream)
+        if max_frames and duration:
+            interval = max(interval, duration / max_frames)
+        next_t = 0.0
+        last_hash: Optional[int] = None
+        kept = 0
+
+        for i, frame in enumerate(container.decode(stream)):
+            t = float(frame.time) if frame.time is not None else i / float(stream.average_rate or 1)
+            if t + 1e-6 < next_t:
+                continue
+            next_t = t + interval
+
+            with trace.span("video.frame") as sp:
+                if max_side and max(frame.width, frame.height) > max_side:
+                    scale = max_side / max(frame.width, frame.height)
+                    frame = frame.reformat(width=max(2, int(frame.width * scale)) // 2 * 2,
+                                           height=max(2, int(frame.height * scale)) // 2 * 2)
+                image = frame.to_ndarray(format="rgb24")
+                h = dhash(image)
+                duplicate = last_hash is not None and max_distance >= 0 and hamming(h, last_hash) <= max_distance
+                sp.set("duplicate", duplicate)
+            if duplicate:
+                continue
+            last_hash = h
+            yield VideoFrame(index=i, time=t, image=image, hash=h)
+            kept += 1
+            if max_frames is not None and kept >= max_frames:
+                return
+
+
+def _duration_s(container: Any, stream: Any) -> Optional[float]:
+    if stream.duration is not None and stream.time_base is not None:
+        return float(stream.duration * stream.time_base)
+    if container.duration is not None:
+        import av
+
+        return container.duration / av.time_base
+    return None
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_frame_batches(path: Union[str, Path], batch_size: int = 8, **kwargs: Any) -> Iterator[List[VideoFrame]]:
+    return batched(iter_frames(path, **kwargs), batch_size)
+
+
+def run_tool_on_video(
+    tool: Callable[..., Any],
+    path: Union[str, Path],
+    params: Optional[dict] = None,
+    image_param: str = "image",
+    **frame_kwargs: Any,
+) -> Iterator[dict]:
+    """Run an image tool on every surviving frame; yields {"index", "time", "result"}."""
+    params = params or {}
+    for frame in iter_frames(path, **frame_kwargs):
+        yield {"index": frame.index, "time": frame.time, "result": tool(**{**params, image_param: frame.image})}
+
+
+def ask_video(
+    lmm: Any,
+    prompt: str,
+    path: Union[str, Path],
+    batch_size: int = 8,
+    **frame_kwargs: Any,
+) -> List[dict]:
+    """
+    One LMM call per batch of surviving frames.
+    Returns [{"start", "end", "frames", "response"}] in video order.
+    """
+    out = []
+    for batch in iter_frame_batches(path, batch_size=batch_size, **frame_kwargs):
+        header = f"[video frames t={batch[0].time:.1f}s..{batch[-1].time:.1f}s, {len(batch)} frames]\n"
+        response = lmm.generate(header + prompt, media=[f.image for f in batch])
+        out.append({"start": batch[0].time, "end": batch[-1].time,
+                    "frames": [f.index for f in batch], "response": response})
+    return out
+
+
+def expand_media(media: Sequence[Any], max_video_frames: int = 8, **frame_kwargs: Any) -> Iterator[Any]:
+    """Pass still images through; replace each video with up to `max_video_frames` frames spread over the clip."""
+    for m in media:
+        if is_video(m):
+            for frame in iter_frames(m, max_frames=max_video_frames, **frame_kwargs):
+                yield frame.image
+        else:
+            yield m